@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+⏱️ Микробенчмарки горячих путей с порогом регрессии относительно базовой линии
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime
+from typing import Optional, Callable, List, Dict, Any, Tuple
+
+import numpy as np
+
+import config
+from config import (
+    BENCHMARK_BASELINE_FILE, BENCHMARK_THRESHOLD, BENCHMARK_MIN_DELTA, BENCHMARK_ROUNDS,
+    BENCHMARK_MIN_ROUND_TIME, BENCHMARK_HISTORY_SIZES
+)
+from corpus import synthetic_captcha
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('Benchmark')
+
+# Логгеры модулей, которые пишут на каждый вызов
+QUIET_LOGGERS = ['ScreenSolver', 'MouseController', 'ImageProcessor', 'InputBackend']
+
+def synthetic_stats(sessions: int, seed: int = 0) -> Dict[str, Any]:
+    """Статистика с историей из заданного числа сессий"""
+    rng = random.Random(seed)
+    history = []
+    for _ in range(sessions):
+        solved = rng.randint(0, 500)
+        errors = rng.randint(0, 20)
+        history.append({
+            'start': datetime(2024, 1, 1).isoformat(),
+            'end': datetime(2024, 1, 2).isoformat(),
+            'solved': solved,
+            'errors': errors,
+            'duration': rng.uniform(60, 36000)
+        })
+    
+    return {
+        'total_solved': sum(s['solved'] for s in history),
+        'total_errors': sum(s['errors'] for s in history),
+        'session_solved': 0,
+        'session_errors': 0,
+        'last_solution': 'AB12C',
+        'last_error': None,
+        'start_time': None,
+        'sessions': history
+    }
+
+@contextlib.contextmanager
+def fixture_paths(directory: str):
+    """Перенаправить файлы данных и скриншотов во временную директорию"""
+    import image_processor
+    import screen_solver
+    
+    data_dir = os.path.join(directory, 'data')
+    screenshots_dir = os.path.join(directory, 'screenshots')
+    os.makedirs(data_dir, exist_ok=True)
+    
+    patches = [
+        (config, 'DATA_DIR', data_dir),
+        (config, 'COORDINATES_FILE', os.path.join(data_dir, 'coordinates.json')),
+        (config, 'SETTINGS_FILE', os.path.join(data_dir, 'settings.json')),
+        (screen_solver, 'DATA_DIR', data_dir),
+        (screen_solver, 'STATS_FILE', os.path.join(data_dir, 'stats.json')),
+        (image_processor, 'SCREENSHOTS_DIR', screenshots_dir)
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    
+    for module, name, value in patches:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+def build_benchmarks() -> List[Tuple[str, Optional[Callable[[], Any]], str]]:
+    """
+    Список (имя, функция, причина пропуска). Фикстуры создаются
+    заранее, замеряется только сам вызов
+    """
+    from image_processor import ImageProcessor, tesseract_available
+    from input_backend import NullBackend
+    from mouse_controller import MouseController
+    from screen_solver import ScreenCaptchaSolver
+    
+    processor = ImageProcessor()
+    captcha = synthetic_captcha('K7XM4', seed=1)
+    frame = np.asarray(captcha)
+    processed = processor.preprocess_image(captcha)
+    has_tesseract = tesseract_available()
+    no_tesseract = '' if has_tesseract else 'tesseract не установлен'
+    
+    benchmarks = [
+        ('preprocess_image', lambda: processor.preprocess_image(captcha), ''),
+        # Путь решателя: RGB кадр захвата -> буфер предобработки
+        ('preprocess_array', lambda: processor.preprocess_array(frame), ''),
+        ('recognize_text',
+         (lambda: processor.recognize_text(processed)) if has_tesseract else None, no_tesseract),
+        ('process_and_recognize',
+         (lambda: processor.process_and_recognize(captcha)) if has_tesseract else None, no_tesseract),
+        ('_save_debug_images',
+         lambda: processor._save_debug_images(captcha, processed, 'K7XM4'), '')
+    ]
+    
+    # Цена выбора модели: auto без алфавита сайта может сделать второй проход,
+    # combined всегда ищет по обеим моделям
+    for lang_mode in ('auto', 'combined'):
+        mode_processor = ImageProcessor()
+        mode_processor.lang_mode = lang_mode
+        mode_processor.site_languages = []
+        benchmarks.append((
+            f'recognize_text[{lang_mode}]',
+            (lambda p=mode_processor: p.recognize_text(processed)) if has_tesseract else None,
+            no_tesseract
+        ))
+    
+    # Коррекция путаниц: алфавит сайта и неуверенные символы
+    from text_corrector import TextCorrector
+    from corpus import CAPTCHA_ALPHABET
+    corrector = TextCorrector(charset=CAPTCHA_ALPHABET)
+    benchmarks.append((
+        'TextCorrector.correct',
+        lambda: corrector.correct('K7XM4O5', [91.0, 85.0, 40.0, 95.0, 62.0, 35.0, 80.0]),
+        ''
+    ))
+    
+    # Статистика разного размера
+    solver = ScreenCaptchaSolver(
+        mouse_controller=MouseController(backend=NullBackend()),
+        persist=False
+    )
+    solver.persist = True
+    for size in BENCHMARK_HISTORY_SIZES:
+        def save_stats(stats=synthetic_stats(size)):
+            solver.stats = stats
+            solver._save_stats()
+        benchmarks.append((f'_save_stats[{size}]', save_stats, ''))
+    
+    # Конфигурация из файлов-фикстур
+    config.save_coordinates(config.load_coordinates())
+    config.save_settings(config.load_settings())
+    benchmarks.append(('load_coordinates', config.load_coordinates, ''))
+    benchmarks.append(('load_settings', config.load_settings, ''))
+    
+    # Кривая Безье с фиксированными контрольными точками
+    mouse = MouseController(backend=NullBackend())
+    control_points = [(700.0, 300.0), (1100.0, 700.0)]
+    benchmarks.append((
+        '_generate_bezier_curve',
+        lambda: mouse._generate_bezier_curve((100.0, 100.0), (1500.0, 900.0), control_points, steps=80),
+        ''
+    ))
+    # Прежняя реализация (точка за точкой) для сравнения
+    benchmarks.append((
+        '_bezier_point[80]',
+        lambda: [mouse._bezier_point(i / 80, (100.0, 100.0), (1500.0, 900.0), control_points)
+                 for i in range(81)],
+        ''
+    ))
+    
+    return benchmarks
+
+def measure(func: Callable[[], Any], rounds: int = BENCHMARK_ROUNDS,
+            min_round_time: float = BENCHMARK_MIN_ROUND_TIME) -> float:
+    """Лучшее время одного вызова из нескольких повторов (секунды)"""
+    # Прогрев и подбор числа вызовов на повтор
+    started = time.perf_counter()
+    func()
+    single = time.perf_counter() - started
+    number = max(1, int(min_round_time / single)) if single > 0 else 1000
+    
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    
+    # Минимум меньше всего зависит от фоновой нагрузки
+    return min(timings)
+
+def measure_peak(func: Callable[[], Any]) -> int:
+    """
+    Пик аллокаций одного вызова (байты, tracemalloc). Видны аллокации
+    Python и numpy/OpenCV; внутренние буферы PIL и Tesseract не учитываются
+    """
+    func()  # Прогрев: буферы и кэши, создаваемые один раз
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def check_pytesseract_path() -> List[str]:
+    """
+    Разбор ответа pytesseract (установка по умолчанию, без tesserocr):
+    без уверенности символов фильтр не должен терять текст. Tesseract
+    подменяется готовым ответом, поэтому проверка работает и без него.
+    Возвращает список ошибок
+    """
+    from unittest import mock
+    import image_processor
+    
+    image = synthetic_captcha('AB12C', seed=1)
+    data = {'text': ['', 'AB', '-12C'], 'conf': ['-1', '91', '87']}
+    errors = []
+    
+    with mock.patch.object(image_processor, 'tesserocr', None), \
+            mock.patch.object(image_processor.pytesseract, 'image_to_string', return_value=' AB-12C\n'), \
+            mock.patch.object(image_processor.pytesseract, 'image_to_data', return_value=data):
+        processor = image_processor.ImageProcessor()
+        processor.corrector = None
+        
+        # fixed без коррекции - image_to_string, auto с двумя моделями - image_to_data
+        for lang_mode, languages in (('fixed', []), ('auto', ['eng', 'rus'])):
+            processor.lang_mode = lang_mode
+            processor.site_languages = languages
+            text = processor.recognize_text(image)
+            if text != 'AB12C':
+                errors.append(f"pytesseract[{lang_mode}]: '{text}' вместо 'AB12C'")
+    
+    return errors
+
+def run_benchmarks(only: Optional[List[str]] = None) -> Dict[str, float]:
+    """Прогон бенчмарков на фикстурах во временной директории"""
+    levels = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    # screen_solver пишет лог в logs/ относительно рабочей директории
+    os.makedirs('logs', exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='captcha_bench_')
+    results = {}
+    
+    try:
+        with fixture_paths(directory):
+            for name, func, reason in build_benchmarks():
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                if func is None:
+                    print(f"  {name:<28} пропущен ({reason})")
+                    continue
+                
+                results[name] = measure(func)
+                peak = measure_peak(func)
+                print(f"  {name:<28} {results[name] * 1000:>10.3f} мс   пик {peak / 1024:>9.1f} КБ")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+    
+    return results
+
+def load_baseline(path: str = BENCHMARK_BASELINE_FILE) -> Dict[str, Any]:
+    """Загрузка базовой линии"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки базовой линии: {e}")
+    
+    return {}
+
+def save_baseline(results: Dict[str, float], path: str = BENCHMARK_BASELINE_FILE) -> bool:
+    """Сохранение результатов как новой базовой линии (уже записанные замеры сохраняются)"""
+    baseline = load_baseline(path)
+    timings = baseline.get('results', {})
+    timings.update({name: round(value, 9) for name, value in results.items()})
+    
+    baseline = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': dict(sorted(timings.items()))
+    }
+    
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка сохранения базовой линии: {e}")
+        return False
+
+def compare(results: Dict[str, float], baseline: Dict[str, Any],
+            threshold: float = BENCHMARK_THRESHOLD,
+            min_delta: float = BENCHMARK_MIN_DELTA) -> List[str]:
+    """
+    Сравнение с базовой линией; возвращает имена регрессировавших функций.
+    Регрессия - замедление больше threshold процентов и больше min_delta секунд
+    """
+    reference = baseline.get('results', {})
+    regressions = []
+    
+    print(f"\n📏 Сравнение с базовой линией (порог +{threshold:.0f}% "
+          f"и +{min_delta * 1000:.2f} мс):")
+    for name, value in results.items():
+        if name not in reference:
+            print(f"  {name:<28} нет базовой линии")
+            continue
+        
+        change = (value / reference[name] - 1) * 100 if reference[name] else 0.0
+        status = "✅"
+        if change > threshold and value - reference[name] > min_delta:
+            status = "❌"
+            regressions.append(name)
+        print(f"  {status} {name:<26} {reference[name] * 1000:>9.3f} -> "
+              f"{value * 1000:>9.3f} мс ({change:+.1f}%)")
+    
+    return regressions
+
+def replay(path: str) -> int:
+    """
+    Повторный прогон кадров из дампа самописца: предобработка и OCR
+    сейчас против записанных текста и длительности этапа ocr. Кадры
+    в дампе уменьшены, поэтому расхождение текста - повод посмотреть
+    кадр, а не доказательство регрессии
+    """
+    from flight_recorder import load_dump, restore_frame
+    from image_processor import ImageProcessor, tesseract_available
+    
+    dump = load_dump(path)
+    processor = ImageProcessor()
+    has_tesseract = tesseract_available()
+    
+    print(f"📼 {os.path.basename(path)}: {dump['meta'].get('reason')}, циклов: {len(dump['cycles'])}")
+    if not has_tesseract:
+        print("⚠️ Tesseract не установлен: замеряется только предобработка")
+    print(f"\n  {'исход':<19} {'записано':<12} {'сейчас':<12} {'ocr было':>9} {'сейчас':>9}")
+    
+    recorded, replayed, same, compared = [], [], 0, 0
+    for index, cycle in enumerate(dump['cycles']):
+        frame = restore_frame(dump, index)
+        if frame is None:
+            continue
+        
+        started = time.perf_counter()
+        processed = processor.preprocess_array(frame)
+        text = (processor.recognize_text(processed) or '') if has_tesseract else ''
+        elapsed = time.perf_counter() - started
+        
+        before = cycle['stages'].get('ocr')
+        if before is not None:
+            recorded.append(before)
+            replayed.append(elapsed)
+        if has_tesseract and cycle['text']:
+            compared += 1
+            same += text == cycle['text']
+        
+        print(f"  {cycle['outcome']:<19} {cycle['text']:<12} {text:<12} "
+              f"{(before or 0) * 1000:>7.1f}мс {elapsed * 1000:>7.1f}мс")
+    
+    if recorded:
+        print(f"\n⏱️ Медиана ocr: записано {np.median(recorded) * 1000:.1f} мс, "
+              f"сейчас {np.median(replayed) * 1000:.1f} мс")
+    if compared:
+        print(f"📝 Тот же текст: {same}/{compared}")
+    return 0
+
+def main(argv: List[str]) -> int:
+    """
+    python3 benchmark.py [--save-baseline] [--threshold N] [имя ...]
+    python3 benchmark.py --replay ДАМП   - прогон кадров из дампа самописца
+    Код выхода 1 при регрессии сверх порога
+    """
+    save = '--save-baseline' in argv
+    threshold = BENCHMARK_THRESHOLD
+    only = []
+    
+    args = iter(argv)
+    for arg in args:
+        if arg == '--threshold':
+            threshold = float(next(args))
+        elif arg == '--replay':
+            return replay(next(args))
+        elif not arg.startswith('--'):
+            only.append(arg)
+    
+    print("\n" + "="*60)
+    print("⏱️ БЕНЧМАРКИ ГОРЯЧИХ ПУТЕЙ")
+    print("="*60)
+    
+    errors = check_pytesseract_path()
+    for error in errors:
+        print(f"  ❌ {error}")
+    if errors:
+        return 1
+    
+    results = run_benchmarks(only or None)
+    
+    if save:
+        if save_baseline(results):
+            print(f"\n💾 Базовая линия сохранена: {BENCHMARK_BASELINE_FILE}")
+        return 0
+    
+    baseline = load_baseline()
+    if not baseline:
+        print("\n⚠️ Базовая линия не найдена, запустите с --save-baseline")
+        return 0
+    
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"\n❌ Регрессия: {', '.join(regressions)}")
+        return 1
+    
+    print("\n✅ Регрессий нет")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
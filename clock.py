@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+⏰ Часы решателя: реальное время или виртуальное для симуляции
+"""
+
+import time
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+class Clock:
+    """Реальные часы: обертка над time и datetime"""
+    
+    def time(self) -> float:
+        return time.time()
+    
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+    
+    def now(self) -> datetime:
+        return datetime.now()
+    
+    def sleep(self, seconds: float, category: str = 'other') -> None:
+        """Пауза; category - назначение паузы (для отчета симуляции)"""
+        time.sleep(seconds)
+    
+    async def sleep_async(self, seconds: float, category: str = 'other') -> None:
+        """Пауза без блокировки цикла событий"""
+        await asyncio.sleep(max(0.0, seconds))
+
+class VirtualClock(Clock):
+    """
+    Виртуальные часы: sleep мгновенно двигает время вперед
+    и учитывает простой по категориям
+    """
+    
+    def __init__(self, start: Optional[float] = None):
+        self._now = time.time() if start is None else start
+        self.start = self._now
+        self.idle: Dict[str, float] = defaultdict(float)
+        self.work: Dict[str, float] = defaultdict(float)
+    
+    def time(self) -> float:
+        return self._now
+    
+    def perf_counter(self) -> float:
+        return self._now
+    
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._now)
+    
+    def sleep(self, seconds: float, category: str = 'other') -> None:
+        seconds = max(0.0, seconds)
+        self._now += seconds
+        self.idle[category] += seconds
+    
+    async def sleep_async(self, seconds: float, category: str = 'other') -> None:
+        # Время двигается мгновенно, но цикл событий получает управление
+        self.sleep(seconds, category)
+        await asyncio.sleep(0)
+    
+    def advance(self, seconds: float, category: str = 'work') -> None:
+        """Смоделированная работа (скриншот, распознавание)"""
+        seconds = max(0.0, seconds)
+        self._now += seconds
+        self.work[category] += seconds
+    
+    @property
+    def elapsed(self) -> float:
+        return self._now - self.start
+
+# Часы по умолчанию
+REAL_CLOCK = Clock()
@@ -22,6 +22,10 @@ SCREENSHOTS_DIR = os.path.join(BASE_DIR, "screenshots")
 COORDINATES_FILE = os.path.join(DATA_DIR, "coordinates.json")
 STATS_FILE = os.path.join(DATA_DIR, "stats.json")
 SETTINGS_FILE = os.path.join(DATA_DIR, "settings.json")
+ROLLUPS_FILE = os.path.join(DATA_DIR, "rollups.json")
+SESSIONS_FILE = os.path.join(DATA_DIR, "sessions.jsonl")  # Полная история сессий
+CORPUS_DIR = os.path.join(DATA_DIR, "corpus")              # Размеченные капчи для настройки OCR
+TEMPLATES_DIR = os.path.join(DATA_DIR, "templates")
 
 # ============================================
 # КООРДИНАТЫ ПО УМОЛЧАНИЮ
@@ -36,22 +40,136 @@ DEFAULT_INPUT_COORDS: Tuple[int, int] = (982, 597)
 # Координаты кнопки "следующая" (x, y)
 DEFAULT_BUTTON_COORDS: Tuple[int, int] = (1137, 650)
 
+# ============================================
+# АВТОКАЛИБРОВКА ПО ШАБЛОНАМ
+# ============================================
+
+# Размер эталонных фрагментов вокруг точек клика (ширина, высота)
+TEMPLATE_PATCH_SIZE: Dict[str, Tuple[int, int]] = {
+    'input': (360, 60),
+    'button': (160, 50)
+}
+
+# Грубый поиск на уменьшенном экране (1920x1080 -> 480x270)
+CALIBRATION_DOWNSCALE = 0.25
+# Проверяемые масштабы шаблонов (изменение масштаба страницы)
+CALIBRATION_SCALES = (0.8, 0.9, 1.0, 1.1, 1.25)
+# Минимальная схожесть (TM_CCOEFF_NORMED) для принятия совпадения
+CALIBRATION_MIN_SCORE = 0.7
+# Запас окна уточнения в полном разрешении (пиксели)
+CALIBRATION_REFINE_MARGIN = 8
+# Сколько лучших кандидатов грубого поиска уточнять на каждом масштабе
+CALIBRATION_CANDIDATES = 3
+
+# ============================================
+# ОТСЛЕЖИВАНИЕ СДВИГА ОКНА
+# ============================================
+
+# Размер опорного фрагмента вокруг кнопки (ширина, высота)
+ANCHOR_SIZE: Tuple[int, int] = (64, 32)
+# Проверять сдвиг каждые N капч (и всегда после ошибки)
+DRIFT_CHECK_EVERY = 10
+# Окно поиска вокруг прежнего положения (пиксели с каждой стороны)
+DRIFT_SEARCH_MARGIN = 40
+# Минимальная схожесть опорного фрагмента
+DRIFT_MIN_SCORE = 0.8
+
 # ============================================
 # НАСТРОЙКИ РАСПОЗНАВАНИЯ
 # ============================================
 
 # Tesseract OCR настройки
 TESSERACT_CONFIG = r'--oem 3 --psm 8'
-TESSERACT_LANG = 'eng'  # 'eng+rus' для русских капч
+# Модель по умолчанию (известная кодировка сайта); дообученная - по имени, например 'captcha'
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+
+# Выбор языковой модели:
+#   fixed    - всегда TESSERACT_LANG
+#   auto     - модель на каждую капчу: сначала самая удачная в последнее время,
+#              следующая - только при низкой уверенности или чужих символах
+#              (худший случай - два прохода). С OCR_SITE_CHARSET из одного
+#              алфавита модель выбирается заранее и проход всегда один
+#   combined - все модели сразу ('eng+rus'), вдвое дороже
+OCR_LANG_MODE = os.getenv("OCR_LANG_MODE", "fixed")
+OCR_LANGUAGES = ('eng', 'rus')   # Модели для auto и combined
+OCR_MIN_CONFIDENCE = 60          # Уверенность Tesseract (0-100), ниже - пробуем следующую модель
+OCR_LANG_DECAY = 0.95            # Затухание счетчиков удачных моделей
+
+# Символы, которые может выдать модель (цифры разрешены всем)
+OCR_LANG_CHARSETS = {
+    'eng': 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz',
+    'rus': 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+}
 
 # Обработка изображения
 PREPROCESS_CONFIG = {
     'contrast': 2.0,      # Увеличение контраста
     'threshold': 150,     # Порог бинаризации
     'denoise': True,      # Убрать шум
-    'sharpen': True       # Увеличить резкость
+    'sharpen': True,      # Увеличить резкость
+    'crop_text': False,   # Обрезать до области текста (включать по итогам corpus.py tune)
+    'text_height': 36     # Высота текста после масштабирования (пиксели, подбирается corpus.py tune)
 }
 
+# Обрезка и масштабирование текста
+TEXT_ROI_PADDING = 8          # Поля вокруг текста (пиксели)
+TEXT_ROI_MIN_INK = 2          # Минимум темных пикселей в строке/столбце текста
+TEXT_ROI_INK_RATIO = 0.2      # Доля от максимума проекции для строк/столбцов текста
+TEXT_SCALE_MIN = 0.5          # Пределы масштаба
+TEXT_SCALE_MAX = 4.0
+TEXT_SCALE_HISTORY = 16       # Замеров высоты на размер области
+TEXT_SCALE_CACHE_SIZE = 8     # Размеров области в кэше масштабов
+
+# Высоты текста для подбора по корпусу (corpus.py tune)
+TEXT_HEIGHT_CANDIDATES = (24, 30, 36, 44, 52)
+
+# Допустимая длина распознанного текста (мин, макс)
+OCR_TEXT_LENGTH = (3, 10)
+
+# Коррекция распознанного текста по модели путаниц (text_corrector.py);
+# работает только после text_corrector.py build
+OCR_CORRECTION = True
+CONFUSION_MODEL_FILE = os.path.join(DATA_DIR, "confusion_model.json")
+OCR_SITE_CHARSET = os.getenv("OCR_SITE_CHARSET", "")  # Символы капч сайта (пусто - по разметке корпуса)
+# Символы, которые Tesseract путает между собой (плюс строчная/заглавная буква)
+OCR_CONFUSION_GROUPS = ('0OQD', '1lI7', '5S', '2Z', '8B', '6G', '9g', 'UV', 'CG')
+CORRECTION_SEED_WEIGHT = 1.0     # Псевдо-счетчик известной путаницы
+CORRECTION_SELF_WEIGHT = 20.0    # Псевдо-счетчик верного распознавания символа
+CORRECTION_DELETE_WEIGHT = 0.05  # Вероятность лишнего символа при нулевой уверенности
+CORRECTION_MEAN_CONFIDENCE = 80.0  # Типичная уверенность Tesseract в символе (0-100)
+CORRECTION_CANDIDATES = 3        # Вариантов символа на позицию
+
+# ============================================
+# ДООБУЧЕНИЕ МОДЕЛИ TESSERACT
+# ============================================
+
+TRAINING_DIR = os.path.join(DATA_DIR, "training")   # Пары изображение + .gt.txt для tesstrain
+TRAINING_MODEL_NAME = os.getenv("TRAINING_MODEL_NAME", "captcha")
+TRAINING_BASE_LANG = 'eng'       # Исходная модель для дообучения и сравнения
+TRAINING_EVAL_SHARE = 0.1        # Доля капч в проверочной выборке
+TRAINING_WORKERS = 0             # Процессов подготовки (0 - по числу ядер)
+
+# ============================================
+# ПУЛ ПРОЦЕССОВ OCR
+# ============================================
+
+# Процессов OCR у решателя с прогретым движком (0 - OCR в потоках решателя)
+OCR_POOL_WORKERS = int(os.getenv("OCR_POOL_WORKERS", "1"))
+OCR_BATCH_WORKERS = 0            # Процессов для пакетной оценки (0 - по числу ядер)
+OCR_POOL_QUEUE_SIZE = 16         # Задач в очереди; дальше submit ждет
+OCR_POOL_TASK_TIMEOUT = 15.0     # Предел одной задачи (секунды); зависший процесс перезапускается
+OCR_POOL_START_TIMEOUT = 60.0    # Ожидание загрузки движков при запуске пула
+
+# ============================================
+# БОРТОВОЙ САМОПИСЕЦ
+# ============================================
+
+FLIGHT_DIR = os.path.join(DATA_DIR, "flight")   # Дампы последних циклов
+FLIGHT_RECORDER_SIZE = 256       # Циклов в кольцевом буфере
+FLIGHT_FRAME_SIZE = (160, 64)    # Размер уменьшенного кадра (ширина, высота), grayscale
+FLIGHT_TEXT_LENGTH = 16          # Символов распознанного текста в записи
+FLIGHT_KEEP_DUMPS = 20           # Хранить последних дампов
+
 # ============================================
 # НАСТРОЙКИ ПОВЕДЕНИЯ
 # ============================================
@@ -69,6 +187,175 @@ MOUSE_MOVE_DURATION_MIN = 0.3
 MOUSE_MOVE_DURATION_MAX = 0.8
 MOUSE_ACCURACY = 5  # +/- пикселей для клика
 
+# Бэкенд ввода: 'pyautogui' или 'xtest' (прямой XTest без пауз pyautogui.PAUSE)
+INPUT_BACKEND = os.getenv("INPUT_BACKEND", "pyautogui")
+
+# ============================================
+# АСИНХРОННЫЙ ЦИКЛ РЕШАТЕЛЯ
+# ============================================
+
+# Потоки для скриншота, OCR и ввода (паузы цикла - asyncio.sleep)
+SOLVER_EXECUTOR_WORKERS = 2
+
+# Запуск решателя командой /run в процессе Telegram бота (нужен доступ к экрану)
+SOLVER_IN_BOT = os.getenv("SOLVER_IN_BOT", "false").lower() == "true"
+
+# ============================================
+# РЕЖИМ РАБОТЫ TELEGRAM БОТА
+# ============================================
+
+# 'polling' - long-poll (по умолчанию), 'webhook' - локальный HTTP сервер
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling").lower()
+
+# Публичный адрес бота (на Railway берется из RAILWAY_PUBLIC_DOMAIN)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "") or (
+    f"https://{os.environ['RAILWAY_PUBLIC_DOMAIN']}"
+    if os.getenv("RAILWAY_PUBLIC_DOMAIN") else ""
+)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token. Без переменной
+# окружения генерируется один раз и хранится в файле (нужен для --replay)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_SECRET_FILE = os.path.join(DATA_DIR, "webhook_secret")
+
+# Сколько обновлений обрабатывать одновременно
+TELEGRAM_CONCURRENT_UPDATES = 8
+
+# ============================================
+# УВЕДОМЛЕНИЯ TELEGRAM
+# ============================================
+
+# Чат для статусного сообщения (пусто - уведомления выключены)
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+
+# Период отправки дайджеста (секунды)
+NOTIFY_DIGEST_INTERVAL = 15.0
+NOTIFY_DIGEST_INTERVAL_MAX = 120.0  # Предел растяжения при флуд-контроле
+
+# Лимиты Telegram: запросов в секунду (token bucket)
+NOTIFY_CHAT_RATE = 1.0 / 3       # Правок одного сообщения в чате
+NOTIFY_CHAT_BURST = 1
+NOTIFY_GLOBAL_RATE = 25.0        # Всего запросов бота
+NOTIFY_GLOBAL_BURST = 25
+
+# Деградация при отставании
+NOTIFY_MAX_BACKLOG = 200         # Максимум событий в очереди
+NOTIFY_DIGEST_LINES = 8          # Строк событий в дайджесте
+
+# ============================================
+# ГАЛЕРЕЯ КАПЧ В TELEGRAM
+# ============================================
+
+# Превью скриншотов
+THUMBS_DIR = os.path.join(SCREENSHOTS_DIR, "thumbs")
+THUMB_SIZE: Tuple[int, int] = (320, 120)   # Максимальный размер превью
+THUMB_QUALITY = 70                         # Качество JPEG
+THUMB_CACHE_MAX_BYTES = 4 * 1024 * 1024    # Лимит кэша превью в памяти
+THUMB_DISK_MAX_FILES = 500                 # Лимит превью на диске
+THUMB_PRUNE_EVERY = 50                     # Чистка диска через каждые N новых превью
+
+# Сколько капч показывать (Telegram разрешает до 10 в альбоме)
+GALLERY_DEFAULT_COUNT = 5
+GALLERY_MAX_COUNT = 10
+
+# ============================================
+# ГРАФИКИ ПРОИЗВОДИТЕЛЬНОСТИ (/perf)
+# ============================================
+
+# Окно: (размер корзины в секундах, количество корзин)
+ROLLUP_WINDOWS: Dict[str, Tuple[int, int]] = {
+    'hour': (60, 60),       # Час по минутам
+    'day': (900, 96),       # Сутки по 15 минут
+    'week': (3600, 168)     # Неделя по часам
+}
+
+PERF_CHART_SIZE: Tuple[int, int] = (720, 360)
+PERF_CHART_REFRESH = 30.0   # Не перерисовывать график чаще (секунды)
+
+# ============================================
+# БЕНЧМАРКИ ГОРЯЧИХ ПУТЕЙ
+# ============================================
+
+# Базовая линия хранится в репозитории
+BENCHMARK_BASELINE_FILE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+# Допустимое замедление относительно базовой линии (проценты)
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "25"))
+# Абсолютный порог (секунды): у функций короче 0.1 мс шум замера сам
+# дает десятки процентов, замедление меньше 0.05 мс регрессией не считается
+BENCHMARK_MIN_DELTA = 0.00005
+
+BENCHMARK_ROUNDS = 7              # Повторов замера (берется лучший)
+BENCHMARK_MIN_ROUND_TIME = 0.1    # Минимальная длительность одного повтора (секунды)
+BENCHMARK_HISTORY_SIZES = (100, 1000, 10000)  # Размеры истории сессий для _save_stats
+
+# ============================================
+# ПРОФИЛИРОВАНИЕ (debug_mode)
+# ============================================
+
+PROFILES_DIR = LOGS_DIR          # Профили и сводки пишутся в logs/
+PROFILE_WINDOW = 50              # Капч в одном окне профилирования
+PROFILE_TOP = 25                 # Функций в сводке
+
+# ============================================
+# КОНТРОЛЬ ПАМЯТИ
+# ============================================
+
+MEMORY_CHECK_INTERVAL = 300.0    # Замер RSS и tracemalloc (секунды)
+MEMORY_GROWTH_WARN_MB = 100.0    # Предупреждение при росте RSS с начала сессии
+MEMORY_TRACE_FRAMES = 1          # Глубина стека tracemalloc (0 - выключить)
+MEMORY_TOP_ALLOCATORS = 10       # Строк в сводке по аллокациям
+SESSIONS_KEEP_IN_MEMORY = 50     # Последних сессий в stats.json, остальные в sessions.jsonl
+
+# ============================================
+# ФОНОВЫЙ ЗАХВАТ ЭКРАНА
+# ============================================
+
+CAPTURE_FPS = 10.0               # Кадров в секунду
+CAPTURE_RING_SIZE = 4            # Кадров в кольцевом буфере
+CAPTURE_CHANGE_THRESHOLD = 2.0   # Средняя разница яркости, после которой кадр считается измененным
+CAPTURE_WAIT_TIMEOUT = 3.0       # Ожидание новой стабильной капчи (секунды)
+
+# ============================================
+# ПРОВЕРКА РЕЗУЛЬТАТА ОТПРАВКИ
+# ============================================
+
+OUTCOMES_FILE = os.path.join(DATA_DIR, "outcomes.jsonl")            # Исход каждой отправки
+OUTCOME_ERROR_TEMPLATE = os.path.join(TEMPLATES_DIR, "error.png")   # Сообщение сайта об ошибке (необязательно)
+OUTCOME_POLL_INTERVAL = 0.25     # Период проверки области после клика (секунды)
+OUTCOME_TIMEOUT = 2.0            # Ожидание смены капчи или сообщения об ошибке
+OUTCOME_CHANGE_THRESHOLD = 8.0   # Средняя разница яркости, после которой капча считается новой
+OUTCOME_ERROR_MATCH = 0.8        # Минимальная схожесть с шаблоном ошибки
+# Сайт оставляет ту же капчу при неверном ответе: смена кадра = принят.
+# Иначе без шаблона ошибки смена кадра - нейтральное 'changed'
+OUTCOME_CHANGE_MEANS_ACCEPTED = os.getenv("OUTCOME_CHANGE_MEANS_ACCEPTED", "false").lower() == "true"
+
+# ============================================
+# SLO: ДЕГРАДАЦИЯ В СКОЛЬЗЯЩЕМ ОКНЕ
+# ============================================
+
+SLO_WINDOW = 3600.0              # Скользящее окно (секунды)
+SLO_MIN_SAMPLES = 20             # Минимум капч в окне для оценки
+SLO_MIN_SPAN = 600.0             # Минимальная длительность наблюдения для решений в час
+SLO_CHECK_EVERY = 10             # Проверка правил каждые N капч
+SLO_ALERT_COOLDOWN = 900.0       # Повтор действия по тому же правилу не чаще (секунды)
+SLO_PAUSE_SECONDS = 300.0        # Длительность паузы для действия 'pause'
+
+# metric: 'latency_p95:<этап>' (секунды), 'error_rate', 'reject_rate' (доли), 'solves_per_hour'
+# Граница 'max' или 'min'; action: 'alert', 'pause', 'recalibrate' или 'stop'.
+# verdicts (для reject_rate): какие ответы сайта считаются отказом. 'unchanged'
+# бывает и при медленной загрузке страницы, поэтому по умолчанию не учитывается
+SLO_RULES = [
+    {'name': 'ocr_latency', 'metric': 'latency_p95:ocr', 'max': 2.0, 'action': 'alert'},
+    {'name': 'capture_latency', 'metric': 'latency_p95:capture', 'max': 1.0, 'action': 'alert'},
+    {'name': 'error_rate', 'metric': 'error_rate', 'max': 0.3, 'action': 'recalibrate'},
+    {'name': 'reject_rate', 'metric': 'reject_rate', 'max': 0.5, 'action': 'pause', 'verdicts': ('rejected',)},
+    {'name': 'solves_per_hour', 'metric': 'solves_per_hour', 'min': 60, 'action': 'alert'}
+]
+
 # ============================================
 # ФУНКЦИИ РАБОТЫ С КОНФИГУРАЦИЕЙ
 # ============================================
@@ -121,6 +408,13 @@ def load_settings() -> Dict[str, Any]:
         'save_screenshots': True,
         'debug_mode': False,
         'max_errors_before_stop': 10,
+        'drift_tracking': True,
+        'memory_watchdog': True,
+        'capture_thread': False,
+        'verify_outcome': True,
+        'slo_watchdog': True,
+        'slo_notify': True,
+        'flight_recorder': True,
         'created_at': datetime.now().isoformat()
     }
 
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+🏷️ Размеченный корпус капч: сбор, синтетика и подбор параметров OCR
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import difflib
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from config import (
+    CORPUS_DIR, TEXT_HEIGHT_CANDIDATES,
+    DEFAULT_CAPTCHA_REGION
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('Corpus')
+
+CAPTCHA_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+LABELS_FILE = "labels.json"
+
+def synthetic_captcha(text: str, seed: int = 0,
+                      size: Tuple[int, int] = DEFAULT_CAPTCHA_REGION[2:]) -> Image.Image:
+    """Синтетическая капча: текст, шумовые линии и точки на светлом фоне"""
+    rng = random.Random(seed)
+    width, height = size
+    
+    # Текст рисуем мелко и растягиваем до размеров капчи
+    small = Image.new('L', (width // 4, height // 4), 255)
+    draw = ImageDraw.Draw(small)
+    draw.text((4 + rng.randint(0, 6), 6 + rng.randint(0, 4)), text,
+              fill=rng.randint(0, 60), font=ImageFont.load_default())
+    image = small.resize(size, Image.BICUBIC).convert('RGB')
+    
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        draw.line(
+            [(rng.randint(0, width), rng.randint(0, height)),
+             (rng.randint(0, width), rng.randint(0, height))],
+            fill=tuple(rng.randint(80, 200) for _ in range(3)), width=2
+        )
+    for _ in range(width * height // 50):
+        image.putpixel((rng.randrange(width), rng.randrange(height)),
+                       tuple(rng.randint(0, 255) for _ in range(3)))
+    
+    return image
+
+def load_labels(directory: str = CORPUS_DIR) -> Dict[str, str]:
+    """Разметка корпуса: {имя файла: текст}"""
+    path = os.path.join(directory, LABELS_FILE)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки разметки: {e}")
+    return {}
+
+def save_labels(labels: Dict[str, str], directory: str = CORPUS_DIR) -> bool:
+    """Сохранение разметки корпуса"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LABELS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(labels.items())), f, indent=2, ensure_ascii=False)
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка сохранения разметки: {e}")
+        return False
+
+def load_corpus(directory: str = CORPUS_DIR) -> List[Tuple[str, str]]:
+    """Список (путь, текст) для размеченных файлов"""
+    return [
+        (os.path.join(directory, name), text)
+        for name, text in load_labels(directory).items()
+        if os.path.exists(os.path.join(directory, name))
+    ]
+
+def import_screenshots(source: Optional[str] = None, directory: str = CORPUS_DIR) -> int:
+    """
+    Копирование успешных скриншотов в корпус. Текст берется из имени
+    файла (результат OCR) - разметку стоит проверить вручную в labels.json.
+    Отклоненные сайтом ответы пропускаются
+    """
+    from thumbnail_cache import list_captures
+    from outcome_detector import load_outcomes
+    
+    kwargs = {'directory': source} if source else {}
+    labels = load_labels(directory)
+    # Ответы, отклоненные сайтом, - заведомо неверная разметка
+    outcomes = load_outcomes()
+    os.makedirs(directory, exist_ok=True)
+    
+    added = 0
+    for capture in list_captures(kind='success', limit=10 ** 6, **kwargs):
+        name = os.path.basename(capture['path'])
+        if name in labels or outcomes.get(name) == 'rejected':
+            continue
+        shutil.copy2(capture['path'], os.path.join(directory, name))
+        labels[name] = capture['text']
+        added += 1
+    
+    save_labels(labels, directory)
+    return added
+
+def synthesize(count: int, seed: int = 0, directory: str = CORPUS_DIR) -> int:
+    """Синтетические размеченные капчи (когда реальных мало)"""
+    rng = random.Random(seed)
+    labels = load_labels(directory)
+    os.makedirs(directory, exist_ok=True)
+    
+    for i in range(count):
+        text = ''.join(rng.choice(CAPTCHA_ALPHABET) for _ in range(rng.randint(4, 6)))
+        name = f"synthetic_{seed}_{i:04d}.png"
+        synthetic_captcha(text, seed=seed * 100000 + i).save(os.path.join(directory, name))
+        labels[name] = text
+    
+    save_labels(labels, directory)
+    return count
+
+def evaluate(samples: List[Tuple[str, str]], overrides: Optional[Dict[str, Any]] = None,
+             lang_mode: Optional[str] = None, lang: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Точность и время OCR на корпусе с заданными параметрами предобработки.
+    Капчи распознаются пулом процессов; mean_ms - время одной капчи
+    в процессе, wall_s - весь прогон
+    """
+    from ocr_pool import OcrPool
+    
+    exact = 0
+    char_score = 0.0
+    elapsed = 0.0
+    languages: Dict[str, int] = {}
+    
+    with OcrPool(config=overrides, lang_mode=lang_mode, lang=lang) as pool:
+        started = time.perf_counter()
+        for (path, label), result in zip(samples, pool.map(path for path, _ in samples)):
+            text = result['text'] or ''
+            elapsed += result['seconds'] or 0.0
+            if result['lang']:
+                languages[result['lang']] = languages.get(result['lang'], 0) + 1
+        
+            exact += text.upper() == label.upper()
+            char_score += difflib.SequenceMatcher(None, text.upper(), label.upper()).ratio()
+        wall = time.perf_counter() - started
+    
+    total = max(len(samples), 1)
+    return {
+        'samples': len(samples),
+        'accuracy': exact / total,
+        'char_accuracy': char_score / total,
+        'mean_ms': elapsed / total * 1000,
+        'wall_s': wall,
+        'languages': languages
+    }
+
+def tune(samples: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Сравнение без обрезки и с обрезкой при разных высотах текста"""
+    variants = [('без обрезки', {'crop_text': False})]
+    variants += [
+        (f"обрезка, высота {height}", {'crop_text': True, 'text_height': height})
+        for height in TEXT_HEIGHT_CANDIDATES
+    ]
+    
+    results = []
+    for title, overrides in variants:
+        result = evaluate(samples, overrides)
+        result.update(title=title, overrides=overrides)
+        results.append(result)
+        print(f"  {title:<24} точность {result['accuracy'] * 100:>5.1f}%  "
+              f"символы {result['char_accuracy'] * 100:>5.1f}%  {result['mean_ms']:>7.1f} мс")
+    
+    return results
+
+def compare_languages(samples: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Выбор модели на каждую капчу против одной модели и 'eng+rus' сразу"""
+    from config import OCR_LANGUAGES
+    
+    # Для fixed модель задается через TESSERACT_LANG рабочих процессов
+    variants = [('combined', None, 'combined')]
+    variants += [(f"fixed {lang}", lang, 'fixed') for lang in OCR_LANGUAGES]
+    variants += [('auto', None, 'auto')]
+    
+    results = []
+    for title, lang, mode in variants:
+        result = evaluate(samples, lang_mode=mode, lang=lang)
+        result['title'] = title
+        results.append(result)
+            
+        used = ', '.join(f"{name}: {count}" for name, count in sorted(result['languages'].items()))
+        print(f"  {title:<16} точность {result['accuracy'] * 100:>5.1f}%  "
+              f"символы {result['char_accuracy'] * 100:>5.1f}%  {result['mean_ms']:>7.1f} мс  ({used})")
+    
+    return results
+
+def main(argv: List[str]) -> int:
+    """
+    python3 corpus.py import [папка]   - скриншоты success_* в корпус
+    python3 corpus.py synth [N]        - N синтетических капч
+    python3 corpus.py eval             - точность текущих настроек
+    python3 corpus.py tune             - подбор обрезки и высоты текста
+    python3 corpus.py langs            - выбор модели против 'eng+rus'
+    """
+    command = argv[0] if argv else 'eval'
+    
+    if command == 'import':
+        added = import_screenshots(argv[1] if len(argv) > 1 else None)
+        print(f"✅ Добавлено в корпус: {added}. Проверьте разметку в {os.path.join(CORPUS_DIR, LABELS_FILE)}")
+        return 0
+    
+    if command == 'synth':
+        count = synthesize(int(argv[1]) if len(argv) > 1 else 200)
+        print(f"✅ Синтетических капч: {count}")
+        return 0
+    
+    samples = load_corpus()
+    if not samples:
+        print("❌ Корпус пуст: python3 corpus.py import или synth")
+        return 1
+    
+    from image_processor import tesseract_available
+    if not tesseract_available():
+        print("❌ Tesseract не установлен, оценка невозможна")
+        return 1
+    
+    print("\n" + "="*60)
+    print(f"🏷️ КОРПУС: {len(samples)} капч")
+    print("="*60)
+    
+    if command == 'eval':
+        result = evaluate(samples)
+        print(f"Точность: {result['accuracy'] * 100:.1f}%")
+        print(f"По символам: {result['char_accuracy'] * 100:.1f}%")
+        print(f"Среднее время: {result['mean_ms']:.1f} мс")
+        print(f"Весь прогон: {result['wall_s']:.1f} с")
+        return 0
+    
+    if command == 'tune':
+        results = tune(samples)
+        best = max(results, key=lambda r: (r['accuracy'], r['char_accuracy'], -r['mean_ms']))
+        print(f"\n🏆 Лучший вариант: {best['title']}")
+        print(f"   PREPROCESS_CONFIG: {json.dumps(best['overrides'])}")
+        return 0
+    
+    if command == 'langs':
+        compare_languages(samples)
+        return 0
+    
+    print(main.__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+🧭 Отслеживание сдвига окна по небольшому опорному шаблону
+"""
+
+import os
+import logging
+from typing import Optional, Tuple, Dict, Any
+
+import cv2
+import numpy as np
+
+from config import (
+    save_coordinates, TEMPLATES_DIR,
+    ANCHOR_SIZE, DRIFT_CHECK_EVERY, DRIFT_SEARCH_MARGIN, DRIFT_MIN_SCORE
+)
+from template_matcher import find_template, match_in_window, to_gray
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('DriftTracker')
+
+ANCHOR_FILE = os.path.join(TEMPLATES_DIR, "anchor.png")
+
+class DriftTracker:
+    """
+    Опорный фрагмент экрана ищется в небольшом окне вокруг
+    прежнего положения. При смещении сдвигаются область капчи
+    и точки клика (в памяти и в coordinates.json)
+    """
+    
+    def __init__(self, coordinates: Dict[str, Any], check_every: int = DRIFT_CHECK_EVERY):
+        self.coordinates = coordinates
+        self.check_every = check_every
+        self.anchor: Optional[np.ndarray] = None
+        self.since_check = 0
+        self.total_shift = (0, 0)
+        
+        import pyautogui
+        self.pyautogui = pyautogui
+        self.screen_width, self.screen_height = pyautogui.size()
+    
+    def _default_anchor_region(self) -> Tuple[int, int, int, int]:
+        """Опорная область по умолчанию - фрагмент вокруг кнопки"""
+        x, y = self.coordinates['button_coords']
+        width, height = ANCHOR_SIZE
+        return (x - width // 2, y - height // 2, width, height)
+    
+    def _clip(self, region) -> Tuple[int, int, int, int]:
+        """Ограничение области размерами экрана"""
+        x, y, width, height = region
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.screen_width, x + width)
+        y1 = min(self.screen_height, y + height)
+        return (x0, y0, x1 - x0, y1 - y0)
+    
+    def init_anchor(self) -> bool:
+        """Загрузить опорный шаблон или снять его с экрана по текущим координатам"""
+        if 'anchor_region' in self.coordinates and os.path.exists(ANCHOR_FILE):
+            self.anchor = cv2.imread(ANCHOR_FILE, cv2.IMREAD_GRAYSCALE)
+            if self.anchor is not None:
+                return True
+        
+        try:
+            region = self._clip(self.coordinates.get('anchor_region') or self._default_anchor_region())
+            self.anchor = to_gray(self.pyautogui.screenshot(region=region))
+            self.coordinates['anchor_region'] = region
+            
+            os.makedirs(TEMPLATES_DIR, exist_ok=True)
+            cv2.imwrite(ANCHOR_FILE, self.anchor)
+            save_coordinates(self.coordinates)
+            
+            logger.info(f"🧭 Опорный шаблон сохранен: {region}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка создания опорного шаблона: {e}")
+            self.anchor = None
+            return False
+    
+    def should_check(self, last_success: Optional[bool]) -> bool:
+        """Проверять каждые N капч или сразу после ошибки"""
+        self.since_check += 1
+        return last_success is False or self.since_check >= self.check_every
+    
+    def check(self) -> Optional[Tuple[int, int]]:
+        """
+        Поиск опорного шаблона в окне вокруг прежнего положения.
+        Возвращает смещение (dx, dy) или None, если шаблон не найден
+        """
+        self.since_check = 0
+        if self.anchor is None and not self.init_anchor():
+            return None
+        
+        ax, ay, width, height = self.coordinates['anchor_region']
+        search = self._clip((
+            ax - DRIFT_SEARCH_MARGIN, ay - DRIFT_SEARCH_MARGIN,
+            width + DRIFT_SEARCH_MARGIN * 2, height + DRIFT_SEARCH_MARGIN * 2
+        ))
+        
+        try:
+            window = self.pyautogui.screenshot(region=search)
+            match = match_in_window(window, self.anchor, (search[0], search[1]))
+            
+            if match is None or match.score < DRIFT_MIN_SCORE:
+                # Сдвиг больше окна поиска - один раз ищем по всему экрану
+                logger.warning("🧭 Опорный шаблон не найден рядом, поиск по всему экрану...")
+                match = find_template(self.pyautogui.screenshot(), self.anchor, scales=(1.0,))
+                if match is None or match.score < DRIFT_MIN_SCORE:
+                    logger.warning("🧭 Опорный шаблон не найден, координаты не изменены")
+                    return None
+        except Exception as e:
+            logger.error(f"Ошибка проверки сдвига: {e}")
+            return None
+        
+        offset = (match.x - ax, match.y - ay)
+        if offset != (0, 0):
+            self.apply_offset(*offset)
+        
+        return offset
+    
+    def apply_offset(self, dx: int, dy: int) -> None:
+        """Сдвиг координат в памяти и сохранение"""
+        coords = self.coordinates
+        
+        x, y, width, height = coords['captcha_region']
+        coords['captcha_region'] = (x + dx, y + dy, width, height)
+        
+        for key in ('input_coords', 'button_coords'):
+            x, y = coords[key]
+            coords[key] = (x + dx, y + dy)
+        
+        x, y, width, height = coords['anchor_region']
+        coords['anchor_region'] = (x + dx, y + dy, width, height)
+        
+        self.total_shift = (self.total_shift[0] + dx, self.total_shift[1] + dy)
+        save_coordinates(coords)
+        
+        logger.warning(f"🧭 Окно сдвинулось на ({dx:+d}, {dy:+d}), координаты обновлены: "
+                       f"капча {coords['captcha_region']}")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+📼 Бортовой самописец: последние циклы решателя для разбора инцидентов
+"""
+
+import os
+import sys
+import glob
+import json
+import zlib
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    FLIGHT_DIR, FLIGHT_RECORDER_SIZE, FLIGHT_FRAME_SIZE,
+    FLIGHT_TEXT_LENGTH, FLIGHT_KEEP_DUMPS
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('FlightRecorder')
+
+# Этапы цикла (столбцы таблицы длительностей)
+STAGES = ('capture', 'ocr', 'input', 'verify')
+# Исход цикла: код в буфере -> имя
+OUTCOME_CODES = ('capture_failed', 'recognition_failed', 'submitted', 'accepted', 'rejected', 'unchanged',
+                 'changed')
+
+def frame_hash(frame: np.ndarray) -> int:
+    """
+    64-битный хэш полного кадра (crc32 и adler32): повторы одной капчи
+    видны без картинки. Не криптографический, зато в разы быстрее blake2b
+    """
+    data = np.ascontiguousarray(frame).data
+    return (zlib.crc32(data) << 32) | zlib.adler32(data)
+
+class FlightRecorder:
+    """
+    Кольцевой буфер последних циклов в заранее выделенных массивах:
+    хэш и уменьшенный grayscale кадр, длительности этапов, текст,
+    уверенность и исход. Запись не выделяет память; dump сохраняет
+    циклы по порядку в один .npz
+    """
+    
+    def __init__(self, size: int = FLIGHT_RECORDER_SIZE,
+                 frame_size: Tuple[int, int] = FLIGHT_FRAME_SIZE):
+        self.size = size
+        self.frame_size = tuple(frame_size)   # (ширина, высота)
+        width, height = self.frame_size
+        
+        self.frames = np.zeros((size, height, width), dtype=np.uint8)
+        self.shapes = np.zeros((size, 2), dtype=np.int16)       # Размер исходного кадра (h, w)
+        self.hashes = np.zeros(size, dtype=np.uint64)
+        self.times = np.zeros(size, dtype=np.float64)
+        self.timings = np.full((size, len(STAGES)), np.nan, dtype=np.float32)
+        self.texts = np.zeros(size, dtype=f'U{FLIGHT_TEXT_LENGTH}')
+        self.confidences = np.full(size, np.nan, dtype=np.float32)
+        self.outcomes = np.zeros(size, dtype=np.int8)
+        
+        self.count = 0   # Всего записано циклов
+        self._gray = np.zeros((1, 1), dtype=np.uint8)
+        # RLock: дамп по сигналу может прийти в том же потоке посреди record
+        self._lock = threading.RLock()
+    
+    def record(self, frame: Optional[np.ndarray], stages: Dict[str, float],
+               text: Optional[str], confidence: Optional[float], outcome: str,
+               timestamp: float) -> None:
+        """Записать цикл (кадр RGB или None, если скриншот не удался)"""
+        with self._lock:
+            slot = self.count % self.size
+            
+            if frame is not None:
+                if frame.ndim == 3:
+                    if self._gray.shape != frame.shape[:2]:
+                        self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+                    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=self._gray)
+                else:
+                    gray = frame
+                cv2.resize(gray, self.frame_size, dst=self.frames[slot], interpolation=cv2.INTER_AREA)
+                self.shapes[slot] = frame.shape[:2]
+                self.hashes[slot] = frame_hash(frame)
+            else:
+                self.frames[slot] = 0
+                self.shapes[slot] = 0
+                self.hashes[slot] = 0
+            
+            self.times[slot] = timestamp
+            for column, stage in enumerate(STAGES):
+                self.timings[slot, column] = stages.get(stage, np.nan)
+            self.texts[slot] = (text or '')[:FLIGHT_TEXT_LENGTH]
+            self.confidences[slot] = np.nan if confidence is None else confidence
+            self.outcomes[slot] = OUTCOME_CODES.index(outcome)
+            self.count += 1
+    
+    def _order(self) -> np.ndarray:
+        """Индексы записанных слотов от старого к новому"""
+        if self.count <= self.size:
+            return np.arange(self.count)
+        return (np.arange(self.size) + self.count) % self.size
+    
+    def dump(self, reason: str = '', meta: Optional[Dict[str, Any]] = None,
+             directory: str = FLIGHT_DIR) -> Optional[str]:
+        """
+        Сохранить циклы в один файл flight_<время>.npz (через временный
+        файл: прерванная запись не оставит битый дамп)
+        """
+        try:
+            with self._lock:
+                order = self._order()
+                arrays = {
+                    'frames': self.frames[order],
+                    'shapes': self.shapes[order],
+                    'hashes': self.hashes[order],
+                    'times': self.times[order],
+                    'timings': self.timings[order],
+                    'texts': self.texts[order],
+                    'confidences': self.confidences[order],
+                    'outcomes': self.outcomes[order]
+                }
+                count = self.count
+            
+            info = {
+                'created_at': datetime.now().isoformat(),
+                'reason': reason,
+                'cycles_total': count,
+                'stages': STAGES,
+                'outcome_codes': OUTCOME_CODES,
+                **(meta or {})
+            }
+            
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"flight_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.npz")
+            temporary = path + '.tmp'
+            with open(temporary, 'wb') as f:
+                np.savez_compressed(f, meta=np.array(json.dumps(info, ensure_ascii=False, default=str)),
+                                    **arrays)
+            os.replace(temporary, path)
+            
+            prune_dumps(directory)
+            logger.info(f"📼 Самописец: {len(order)} циклов -> {path} ({reason})")
+            return path
+        except Exception as e:
+            logger.error(f"Ошибка записи самописца: {e}")
+            return None
+
+def prune_dumps(directory: str = FLIGHT_DIR, keep: int = FLIGHT_KEEP_DUMPS) -> None:
+    """Оставить только последние дампы"""
+    for path in sorted(glob.glob(os.path.join(directory, "flight_*.npz")))[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def latest_dump(directory: str = FLIGHT_DIR) -> Optional[str]:
+    """Путь к последнему дампу"""
+    dumps = sorted(glob.glob(os.path.join(directory, "flight_*.npz")))
+    return dumps[-1] if dumps else None
+
+def load_dump(path: str) -> Dict[str, Any]:
+    """Дамп: массивы и 'meta'; 'cycles' - список циклов по порядку"""
+    with np.load(path, allow_pickle=False) as data:
+        dump = {name: data[name] for name in data.files}
+    dump['meta'] = json.loads(str(dump['meta']))
+    
+    stages, codes = dump['meta']['stages'], dump['meta']['outcome_codes']
+    dump['cycles'] = [
+        {
+            'time': datetime.fromtimestamp(dump['times'][i]).isoformat(timespec='seconds'),
+            'hash': f"{int(dump['hashes'][i]):016x}",
+            'text': str(dump['texts'][i]),
+            'confidence': None if np.isnan(dump['confidences'][i]) else float(dump['confidences'][i]),
+            'outcome': codes[dump['outcomes'][i]],
+            'stages': {
+                stage: float(dump['timings'][i, column])
+                for column, stage in enumerate(stages) if not np.isnan(dump['timings'][i, column])
+            }
+        }
+        for i in range(len(dump['times']))
+    ]
+    return dump
+
+def restore_frame(dump: Dict[str, Any], index: int) -> Optional[np.ndarray]:
+    """Кадр цикла в исходном размере (RGB) для повторного прогона"""
+    height, width = (int(v) for v in dump['shapes'][index])
+    if not height or not width:
+        return None
+    gray = cv2.resize(dump['frames'][index], (width, height), interpolation=cv2.INTER_LINEAR)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+
+def print_dump(path: str) -> None:
+    """Сводка дампа: причина и таблица циклов"""
+    dump = load_dump(path)
+    meta = dump['meta']
+    print(f"📼 {os.path.basename(path)}: {meta.get('reason')} ({meta['created_at']})")
+    for key, value in meta.items():
+        if key not in ('reason', 'created_at', 'stages', 'outcome_codes'):
+            print(f"  {key}: {value}")
+    
+    print(f"\n{'время':<20} {'хэш':<17} {'исход':<19} {'текст':<12} {'увер.':>6}  этапы (мс)")
+    for cycle in dump['cycles']:
+        confidence = f"{cycle['confidence']:.0f}" if cycle['confidence'] is not None else '-'
+        stages = ' '.join(f"{stage}={seconds * 1000:.0f}" for stage, seconds in cycle['stages'].items())
+        print(f"{cycle['time']:<20} {cycle['hash']:<17} {cycle['outcome']:<19} "
+              f"{cycle['text']:<12} {confidence:>6}  {stages}")
+
+def main(argv: List[str]) -> int:
+    """
+    python3 flight_recorder.py [ДАМП]  - сводка дампа (по умолчанию последнего)
+    Повторный прогон кадров: python3 benchmark.py --replay ДАМП
+    """
+    path = argv[0] if argv else latest_dump()
+    if not path or not os.path.exists(path):
+        print(f"❌ Дампов нет в {FLIGHT_DIR}")
+        return 1
+    
+    print_dump(path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+🎞️ Фоновый захват области капчи в кольцевой буфер кадров
+"""
+
+import time
+import logging
+import threading
+from typing import Optional, Callable, Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    CAPTURE_FPS, CAPTURE_RING_SIZE,
+    CAPTURE_CHANGE_THRESHOLD, CAPTURE_WAIT_TIMEOUT
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('FrameGrabber')
+
+def _pyautogui_grab(region: Tuple[int, int, int, int]) -> Image.Image:
+    """Скриншот области через pyautogui"""
+    import pyautogui
+    return pyautogui.screenshot(region=region)
+
+class FrameGrabber:
+    """
+    Поток снимает captcha_region с заданной частотой в заранее
+    выделенный кольцевой буфер. У каждого кадра есть флаг изменения
+    относительно предыдущего и номер поколения: поколение растет,
+    когда содержимое области меняется (новая капча).
+    Стабильный кадр - кадр, не отличающийся от предыдущего
+    """
+    
+    def __init__(self, coordinates: Dict[str, Any], fps: float = CAPTURE_FPS,
+                 ring_size: int = CAPTURE_RING_SIZE,
+                 change_threshold: float = CAPTURE_CHANGE_THRESHOLD,
+                 grab: Optional[Callable[[Tuple[int, int, int, int]], Image.Image]] = None):
+        # Общий словарь координат: сдвиг окна (DriftTracker) подхватывается сразу
+        self.coordinates = coordinates
+        self.interval = 1.0 / fps
+        self.ring_size = ring_size
+        self.change_threshold = change_threshold
+        self.grab = grab or _pyautogui_grab
+        
+        self.ring: Optional[np.ndarray] = None
+        self.seq = np.zeros(ring_size, dtype=np.int64)
+        self.generation = np.zeros(ring_size, dtype=np.int64)
+        self.changed = np.zeros(ring_size, dtype=bool)
+        self.timestamps = np.zeros(ring_size, dtype=np.float64)
+        
+        self.frames = 0                 # Номер последнего записанного кадра
+        self.current_generation = 0
+        self.consumed_generation = -1   # Поколение последней выданной капчи
+        self.errors = 0
+        
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self) -> None:
+        """Запуск потока захвата"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='FrameGrabber', daemon=True)
+        self._thread.start()
+        logger.info(f"🎞️ Фоновый захват: {1 / self.interval:.0f} кадров/сек, буфер {self.ring_size}")
+    
+    def stop(self) -> None:
+        """Остановка потока захвата"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+    
+    def _allocate(self, shape: Tuple[int, ...]) -> None:
+        """Выделение кольцевого буфера под размер области"""
+        self.ring = np.zeros((self.ring_size,) + shape, dtype=np.uint8)
+        self.seq[:] = 0
+        self.frames = 0
+    
+    def _store(self, frame: np.ndarray) -> None:
+        """Запись кадра в следующий слот кольца"""
+        with self._lock:
+            if self.ring is None or self.ring.shape[1:] != frame.shape:
+                self._allocate(frame.shape)
+            
+            changed = True
+            if self.frames:
+                previous = self.ring[(self.frames - 1) % self.ring_size]
+                # Сравнение по прореженной сетке пикселей
+                diff = np.abs(frame[::4, ::4].astype(np.int16) - previous[::4, ::4].astype(np.int16))
+                changed = float(diff.mean()) > self.change_threshold
+            if changed:
+                self.current_generation += 1
+            
+            self.frames += 1
+            slot = (self.frames - 1) % self.ring_size
+            np.copyto(self.ring[slot], frame)
+            self.seq[slot] = self.frames
+            self.generation[slot] = self.current_generation
+            self.changed[slot] = changed
+            self.timestamps[slot] = time.time()
+            
+            self._lock.notify_all()
+    
+    def _run(self) -> None:
+        """Цикл захвата с постоянной частотой"""
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                image = self.grab(tuple(self.coordinates['captcha_region']))
+                self._store(np.asarray(image if image.mode == 'RGB' else image.convert('RGB')))
+            except Exception as e:
+                self.errors += 1
+                if self.errors % 50 == 1:
+                    logger.error(f"Ошибка фонового захвата: {e}")
+            
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter() - started)))
+    
+    def _latest_stable_slot(self) -> Optional[int]:
+        """Слот самого свежего стабильного кадра (вызывать под блокировкой)"""
+        for back in range(min(self.frames, self.ring_size)):
+            slot = (self.frames - 1 - back) % self.ring_size
+            if not self.changed[slot]:
+                return slot
+        return None
+    
+    def get_frame(self, timeout: float = CAPTURE_WAIT_TIMEOUT) -> Optional[np.ndarray]:
+        """
+        Самый свежий стабильный кадр новой капчи (поколение больше выданного ранее).
+        Если за timeout капча не сменилась - последний стабильный кадр
+        """
+        deadline = time.monotonic() + timeout
+        
+        with self._lock:
+            while True:
+                slot = self._latest_stable_slot()
+                if slot is not None and self.generation[slot] > self.consumed_generation:
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    if slot is None:
+                        return None
+                    logger.debug("🎞️ Капча не сменилась, используется последний стабильный кадр")
+                    break
+                self._lock.wait(remaining)
+            
+            self.consumed_generation = int(self.generation[slot])
+            # Копия: слот будет перезаписан потоком захвата
+            return self.ring[slot].copy()
+    
+    def latest_frame(self) -> Optional[np.ndarray]:
+        """Последний записанный кадр; поколение не отмечается выданным"""
+        with self._lock:
+            if not self.frames:
+                return None
+            return self.ring[(self.frames - 1) % self.ring_size].copy()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Состояние буфера"""
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'generation': self.current_generation,
+                'errors': self.errors,
+                'running': self.running
+            }
@@ -4,19 +4,34 @@
 """
 
 import os
+import shlex
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict, deque
+from itertools import zip_longest
+from typing import Optional, Union, Dict, List, Tuple
 from datetime import datetime
 
 import pytesseract
-from PIL import Image, ImageFilter, ImageEnhance, ImageOps
+from PIL import Image
 import cv2
 import numpy as np
 
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
 from config import (
     TESSERACT_CONFIG, TESSERACT_LANG,
-    PREPROCESS_CONFIG, SCREENSHOTS_DIR
+    OCR_LANG_MODE, OCR_LANGUAGES, OCR_MIN_CONFIDENCE,
+    OCR_LANG_DECAY, OCR_LANG_CHARSETS,
+    PREPROCESS_CONFIG, SCREENSHOTS_DIR,
+    TEXT_ROI_PADDING, TEXT_ROI_MIN_INK, TEXT_ROI_INK_RATIO, TEXT_SCALE_MIN, TEXT_SCALE_MAX,
+    TEXT_SCALE_HISTORY, TEXT_SCALE_CACHE_SIZE,
+    OCR_TEXT_LENGTH, OCR_CORRECTION, OCR_SITE_CHARSET
 )
+from text_corrector import TextCorrector
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,109 +40,420 @@ logging.basicConfig(
 )
 logger = logging.getLogger('ImageProcessor')
 
+# Кадр капчи: PIL изображение или массив (H, W) / (H, W, 3) в RGB
+Frame = Union[Image.Image, np.ndarray]
+
+def to_gray_array(image: Frame, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Кадр -> grayscale uint8 без промежуточных PIL объектов"""
+    if isinstance(image, Image.Image):
+        if image.mode == 'L':
+            return np.asarray(image)
+        image = np.asarray(image.convert('RGB'))
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=out)
+
+def tesseract_available() -> bool:
+    """Доступен ли Tesseract (tesserocr или бинарник для pytesseract)"""
+    if tesserocr is not None:
+        return True
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def languages_for_charset(charset: str, languages) -> list:
+    """
+    Модели, нужные для букв алфавита сайта (цифры есть у всех). Выбор
+    до OCR и без затрат: латинским капчам не нужна rus, и наоборот
+    """
+    letters = {c for c in charset if c.isalpha()}
+    return [lang for lang in languages if letters & set(OCR_LANG_CHARSETS.get(lang, ''))]
+
+def _tesseract_options(config: str) -> Dict[str, str]:
+    """Разбор строки TESSERACT_CONFIG: --psm, --oem и -c ключ=значение"""
+    options = {}
+    args = shlex.split(config)
+    for i, arg in enumerate(args):
+        if arg in ('--psm', '--oem') and i + 1 < len(args):
+            options[arg[2:]] = args[i + 1]
+        elif arg == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+            key, value = args[i + 1].split('=', 1)
+            options[key] = value
+    return options
+
 class ImageProcessor:
     """Класс для обработки и распознавания капч"""
     
     def __init__(self):
         self.config = PREPROCESS_CONFIG
-        logger.info("✅ Процессор изображений инициализирован")
+        # Рабочие буферы и API tesserocr - свои у каждого потока
+        self._local = threading.local()
+        # Замеры высоты текста по размеру области: {(h, w): deque}
+        self._text_heights: OrderedDict = OrderedDict()
+        self._scale_lock = threading.Lock()
+        self.ocr_backend = 'tesserocr' if tesserocr is not None else 'pytesseract'
+        
+        # Выбор языковой модели на каждую капчу
+        self.lang_mode = OCR_LANG_MODE
+        self.languages = tuple(OCR_LANGUAGES)
+        self.lang_scores: Dict[str, float] = {lang: 0.0 for lang in self.languages}
+        self.lang_scores.setdefault(TESSERACT_LANG, 0.0)
+        self.lang_scores[TESSERACT_LANG] += 1.0  # Известная кодировка сайта - первой
+        self._lang_lock = threading.Lock()
+        self.last_lang: Optional[str] = None
+        self.last_confidence: Optional[float] = None
+        # Текст до коррекции и уверенность в каждом его символе
+        self.last_raw_text: Optional[str] = None
+        self.last_char_confidences: List[float] = []
+        
+        # Коррекция путаниц символов (модель из data/confusion_model.json).
+        # Без построенной модели одни известные группы путаниц переписывают
+        # неуверенные символы вслепую - коррекция выключается
+        self.corrector: Optional[TextCorrector] = None
+        if OCR_CORRECTION:
+            corrector = TextCorrector.load()
+            if corrector.samples:
+                self.corrector = corrector
+            else:
+                logger.info("✏️ Модель путаниц не построена (text_corrector.py build), коррекция выключена")
+        
+        # Алфавит сайта (OCR_SITE_CHARSET или из разметки модели путаниц)
+        # сужает auto до нужных моделей: с одной моделью второго прохода нет
+        site_charset = OCR_SITE_CHARSET or (''.join(self.corrector.charset) if self.corrector else '')
+        self.site_languages = languages_for_charset(site_charset, self.languages) if site_charset else []
+        
+        # Движки tesserocr загружаются заранее, по одному на язык
+        if tesserocr is not None:
+            for lang in self._all_models():
+                self._tesserocr_api(lang)
+        
+        logger.info(f"✅ Процессор изображений инициализирован "
+                    f"(OCR: {self.ocr_backend}, языки: {self.lang_mode})")
+    
+    def _buffers(self, shape) -> Dict[str, np.ndarray]:
+        """Заранее выделенные буферы под размер кадра (переиспользуются между капчами)"""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers['gray'].shape != shape:
+            buffers = {
+                'gray': np.empty(shape, dtype=np.uint8),
+                'binary': np.empty(shape, dtype=np.uint8),
+                'out': np.empty(shape, dtype=np.uint8),
+                'ink': np.empty(shape, dtype=np.uint8)
+            }
+            self._local.buffers = buffers
+        return buffers
+    
+    def _threshold_lut(self, mean: float) -> np.ndarray:
+        """
+        Таблица контраст + бинаризация за один проход.
+        Повторяет ImageEnhance.Contrast (смешивание со средним, отсечение
+        дробной части) и последующий порог point(p > threshold)
+        """
+        factor = self.config.get('contrast', 1.0)
+        threshold = self.config.get('threshold', 150)
+        
+        levels = np.arange(256, dtype=np.float32)
+        if factor != 1.0:
+            degenerate = np.float32(int(mean + 0.5))
+            levels = np.clip(np.trunc(degenerate + np.float32(factor) * (levels - degenerate)), 0, 255)
+        
+        return np.where(levels > threshold, 255, 0).astype(np.uint8)
+    
+    def preprocess_array(self, image: Frame) -> np.ndarray:
+        """
+        Предобработка кадра целиком в массивах numpy/OpenCV.
+        Результат лежит в буфере потока и действителен до следующего вызова
+        """
+        if isinstance(image, np.ndarray) and image.ndim == 3:
+            buffers = self._buffers(image.shape[:2])
+            gray = to_gray_array(image, out=buffers['gray'])
+        else:
+            gray = to_gray_array(image)
+            buffers = self._buffers(gray.shape)
+        
+        # Контраст и бинаризация (черно-белое) - одна таблица
+        binary = cv2.LUT(gray, self._threshold_lut(cv2.mean(gray)[0]), dst=buffers['binary'])
+        
+        # SHARPEN на бинарном изображении ничего не меняет: белый пиксель
+        # остается белым при любых соседях, черный - черным. Шаг пропускаем
+        
+        # Убираем шум (края дублируются, как в PIL MedianFilter)
+        if self.config.get('denoise', True):
+            out = cv2.medianBlur(binary, 3, dst=buffers['out'])
+        else:
+            out = binary
+        
+        # Инвертируем если темный текст на светлом фоне
+        white_pixels = cv2.countNonZero(out)
+        if out.size - white_pixels > white_pixels:
+            cv2.bitwise_not(out, dst=out)
+        
+        # Обрезка до текста и приведение высоты букв к удобной для Tesseract
+        if self.config.get('crop_text', False):
+            out = self._crop_and_scale(out, buffers['ink'])
+        
+        return out
+    
+    def _text_roi(self, image: np.ndarray, ink: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Рамка текста (x, y, ширина, высота) по проекциям темных пикселей.
+        Порог относительный: шумовые точки и тонкие линии дают в строке
+        единицы пикселей, строки с буквами - десятки
+        """
+        cv2.compare(image, 128, cv2.CMP_LT, dst=ink)
+        rows = cv2.reduce(ink, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+        if rows.max() < TEXT_ROI_MIN_INK:
+            return None
+        
+        # Самая "чернильная" непрерывная полоса строк
+        band = np.flatnonzero(rows >= max(TEXT_ROI_MIN_INK, rows.max() * TEXT_ROI_INK_RATIO))
+        runs = np.split(band, np.flatnonzero(np.diff(band) > 1) + 1)
+        run = max(runs, key=lambda r: rows[r].sum())
+        y0, y1 = int(run[0]), int(run[-1]) + 1
+        
+        # Столбцы считаем только внутри полосы текста. Промежутки между
+        # буквами уже половины высоты строки, отдельные линии шума - дальше
+        cols = cv2.reduce(ink[y0:y1], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+        xs = np.flatnonzero(cols >= max(TEXT_ROI_MIN_INK, cols.max() * TEXT_ROI_INK_RATIO))
+        if not len(xs):
+            return None
+        
+        groups = np.split(xs, np.flatnonzero(np.diff(xs) > max(2, (y1 - y0) // 2)) + 1)
+        group = max(groups, key=lambda g: cols[g].sum())
+        x0, x1 = int(group[0]), int(group[-1]) + 1
+        
+        return x0, y0, x1 - x0, y1 - y0
     
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
+    def _text_scale(self, shape, text_height: int) -> float:
+        """
+        Масштаб до целевой высоты текста. Берется медиана последних замеров
+        для этого размера области, чтобы один шумный кадр не менял масштаб
+        """
+        with self._scale_lock:
+            heights = self._text_heights.get(shape)
+            if heights is None:
+                heights = self._text_heights[shape] = deque(maxlen=TEXT_SCALE_HISTORY)
+                if len(self._text_heights) > TEXT_SCALE_CACHE_SIZE:
+                    self._text_heights.popitem(last=False)
+            else:
+                self._text_heights.move_to_end(shape)
+            
+            heights.append(text_height)
+            median = float(np.median(heights))
+        
+        scale = self.config.get('text_height', 36) / max(median, 1.0)
+        return min(max(scale, TEXT_SCALE_MIN), TEXT_SCALE_MAX)
+    
+    def _crop_and_scale(self, image: np.ndarray, ink: np.ndarray) -> np.ndarray:
+        """Обрезка до рамки текста с полями и масштабирование"""
+        roi = self._text_roi(image, ink)
+        if roi is None:
+            return image
+        
+        x, y, width, height = roi
+        x0 = max(0, x - TEXT_ROI_PADDING)
+        y0 = max(0, y - TEXT_ROI_PADDING)
+        x1 = min(image.shape[1], x + width + TEXT_ROI_PADDING)
+        y1 = min(image.shape[0], y + height + TEXT_ROI_PADDING)
+        crop = image[y0:y1, x0:x1]
+        
+        scale = self._text_scale(image.shape, height)
+        if abs(scale - 1.0) < 0.05:
+            return crop
+        
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        return cv2.resize(crop, None, fx=scale, fy=scale, interpolation=interpolation)
+    
+    def preprocess_image(self, image: Frame) -> Image.Image:
         """Предобработка изображения для лучшего распознавания"""
         try:
-            img = image.copy()
-            
-            # Конвертация в grayscale
-            if img.mode != 'L':
-                img = img.convert('L')
-            
-            # Увеличение контраста
-            if self.config.get('contrast', 1.0) != 1.0:
-                enhancer = ImageEnhance.Contrast(img)
-                img = enhancer.enhance(self.config['contrast'])
-            
-            # Бинаризация (черно-белое)
-            threshold = self.config.get('threshold', 150)
-            img = img.point(lambda p: 255 if p > threshold else 0)
-            
-            # Увеличение резкости
-            if self.config.get('sharpen', True):
-                img = img.filter(ImageFilter.SHARPEN)
-            
-            # Убираем шум
-            if self.config.get('denoise', True):
-                img = img.filter(ImageFilter.MedianFilter(size=3))
-            
-            # Инвертируем если темный текст на светлом фоне
-            pixels = np.array(img)
-            white_pixels = np.sum(pixels > 128)
-            black_pixels = np.sum(pixels <= 128)
-            
-            if black_pixels > white_pixels:
-                img = ImageOps.invert(img)
-            
-            return img
-            
+            return Image.fromarray(self.preprocess_array(image).copy())
         except Exception as e:
             logger.error(f"Ошибка обработки изображения: {e}")
             return image
     
-    def recognize_text(self, image: Image.Image) -> Optional[str]:
+    def _all_models(self) -> list:
+        """Модели, которые может запросить текущий режим"""
+        if self.lang_mode == 'auto':
+            return list(self.site_languages or self.languages)
+        if self.lang_mode == 'combined':
+            return ['+'.join(self.languages)]
+        return [TESSERACT_LANG]
+    
+    def _candidate_languages(self) -> list:
+        """Порядок моделей для очередной капчи"""
+        if self.lang_mode != 'auto' or len(self._all_models()) == 1:
+            return self._all_models()
+        with self._lang_lock:
+            return sorted(self._all_models(), key=lambda lang: -self.lang_scores.get(lang, 0.0))
+    
+    def _remember_language(self, lang: str) -> None:
+        """Учесть удачную модель; старые удачи постепенно забываются"""
+        with self._lang_lock:
+            for key in self.lang_scores:
+                self.lang_scores[key] *= OCR_LANG_DECAY
+            self.lang_scores[lang] = self.lang_scores.get(lang, 0.0) + 1.0
+    
+    def _tesserocr_api(self, lang: str):
+        """API tesserocr текущего потока для языка (создается один раз)"""
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        
+        api = apis.get(lang)
+        if api is None:
+            options = _tesseract_options(TESSERACT_CONFIG)
+            api = tesserocr.PyTessBaseAPI(
+                lang=lang,
+                psm=int(options.pop('psm', tesserocr.PSM.SINGLE_WORD)),
+                oem=int(options.pop('oem', tesserocr.OEM.DEFAULT))
+            )
+            for key, value in options.items():
+                api.SetVariable(key, value)
+            apis[lang] = api
+        return api
+    
+    def _ocr(self, image: Frame, lang: str,
+             need_confidence: bool = True) -> Tuple[str, Optional[float], List[float]]:
+        """
+        Вызов Tesseract: (текст без пробелов, уверенность 0-100,
+        уверенность каждого символа). tesserocr получает сырой grayscale
+        буфер напрямую; pytesseract (запасной вариант) кодирует
+        изображение во временный файл и дает уверенность только по словам.
+        Без need_confidence pytesseract вызывает более легкий image_to_string
+        """
+        if tesserocr is not None:
+            gray = np.ascontiguousarray(to_gray_array(image))
+            api = self._tesserocr_api(lang)
+            api.SetImageBytes(gray.tobytes(), gray.shape[1], gray.shape[0], 1, gray.strides[0])
+            api.Recognize()
+            
+            chars, confidences = [], []
+            level = tesserocr.RIL.SYMBOL
+            iterator = api.GetIterator()
+            if iterator is not None:
+                for symbol in tesserocr.iterate_level(iterator, level):
+                    text = symbol.GetUTF8Text(level) or ''
+                    chars.append(text)
+                    confidences.extend([symbol.Confidence(level)] * len(text))
+            return ''.join(chars), float(api.MeanTextConf()), confidences
+        
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        if not need_confidence:
+            text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG, lang=lang)
+            return ''.join(text.split()), None, []
+        data = pytesseract.image_to_data(
+            image, config=TESSERACT_CONFIG, lang=lang, output_type=pytesseract.Output.DICT
+        )
+        words = [(word.strip(), float(conf)) for word, conf in zip(data['text'], data['conf'])
+                 if word.strip() and float(conf) >= 0]
+        if not words:
+            return '', 0.0, []
+        return (
+            ''.join(word for word, _ in words),
+            sum(conf for _, conf in words) / len(words),
+            [conf for word, conf in words for _ in word]
+        )
+    
+    @staticmethod
+    def _fits_charset(text: str, lang: str) -> bool:
+        """Все буквы текста из алфавита модели (для 'eng+rus' - любой из них)"""
+        charset = ''.join(OCR_LANG_CHARSETS.get(part, '') for part in lang.split('+'))
+        if not charset:
+            return True
+        return all(c.isdigit() or c in charset for c in text)
+    
+    def recognize_text(self, image: Frame) -> Optional[str]:
         """Распознавание текста с изображения"""
         try:
-            # Настройки Tesseract
-            custom_config = f'{TESSERACT_CONFIG}'
+            best = None
+            min_length, max_length = OCR_TEXT_LENGTH
             
-            # Распознавание
-            text = pytesseract.image_to_string(
-                image,
-                config=custom_config,
-                lang=TESSERACT_LANG
-            )
+            languages = self._candidate_languages()
+            # Уверенность нужна коррекции и выбору между моделями
+            need_confidence = self.corrector is not None or len(languages) > 1
+            for lang in languages:
+                # Распознавание
+                raw, confidence, char_confidences = self._ocr(image, lang, need_confidence)
+                
+                # Убираем лишние символы, оставляем только буквы и цифры
+                # (без need_confidence pytesseract не дает уверенности символов)
+                kept = [(c, conf) for c, conf in zip_longest(raw, char_confidences) if c.isalnum()]
+                text = ''.join(c for c, _ in kept)
+                char_confidences = [conf for _, conf in kept if conf is not None]
+                
+                fits = self._fits_charset(text, lang)
+                if best is None or (fits, confidence or 0.0) > (best[2], best[1] or 0.0):
+                    best = (text, confidence, fits, lang, char_confidences)
+                
+                # Следующая модель - только если эта не уверена или выдала чужие символы
+                # (худший случай - два полных прохода Tesseract)
+                if (fits and (confidence is None or confidence >= OCR_MIN_CONFIDENCE)
+                        and min_length <= len(text) <= max_length):
+                    break
             
-            # Очистка текста
-            text = text.strip()
+            text, confidence, _, lang, char_confidences = best
+            self.last_lang = lang
+            self.last_confidence = confidence
+            self.last_raw_text = text
+            self.last_char_confidences = char_confidences
             
-            # Убираем лишние символы, оставляем только буквы и цифры
-            text = ''.join(c for c in text if c.isalnum())
+            # Путаницы 0/O, 1/l/I, 5/S: алфавит сайта, длина и уверенность символов
+            if self.corrector is not None:
+                corrected = self.corrector.correct(text, char_confidences)
+                if corrected != text:
+                    logger.debug(f"✏️ Коррекция: '{text}' -> '{corrected}'")
+                    text = corrected
             
             # Проверяем длину
-            if len(text) < 3 or len(text) > 10:
+            if len(text) < min_length or len(text) > max_length:
                 logger.warning(f"Подозрительная длина текста: {len(text)} символов")
                 return None
             
-            logger.debug(f"Распознанный текст: '{text}'")
-            return text
+            if self.lang_mode == 'auto':
+                self._remember_language(lang)
             
+            logger.debug(f"Распознанный текст: '{text}' ({lang}, уверенность "
+                         f"{'-' if confidence is None else f'{confidence:.0f}'})")
+            return text
+        
         except Exception as e:
             logger.error(f"Ошибка распознавания текста: {e}")
             return None
     
-    def process_and_recognize(self, image: Image.Image) -> Optional[str]:
+    def process_and_recognize(self, image: Frame) -> Optional[str]:
         """Полный цикл обработки и распознавания"""
         try:
-            # Предобработка
-            processed_img = self.preprocess_image(image)
+            # Предобработка (буфер, без промежуточных PIL изображений)
+            processed = self.preprocess_array(image)
             
             # Распознавание
-            text = self.recognize_text(processed_img)
+            text = self.recognize_text(processed)
             
             # Сохраняем для отладки если включен режим отладки
             if text:
-                self._save_debug_images(image, processed_img, text)
+                self._save_debug_images(image, processed, text)
             
             return text
-            
+        
         except Exception as e:
             logger.error(f"Ошибка в process_and_recognize: {e}")
             return None
     
-    def _save_debug_images(self, original: Image.Image, processed: Image.Image, text: str):
+    def _save_debug_images(self, original: Frame, processed: Frame, text: str):
         """Сохранение изображений для отладки"""
         try:
             os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             
+            if isinstance(original, np.ndarray):
+                original = Image.fromarray(original)
+            if isinstance(processed, np.ndarray):
+                processed = Image.fromarray(processed)
+            
             original.save(f"{SCREENSHOTS_DIR}/original_{timestamp}.png")
             processed.save(f"{SCREENSHOTS_DIR}/processed_{timestamp}_{text}.png")
             
@@ -150,11 +476,34 @@ class ImageProcessor:
             print(f"Результат: '{text}'")
             
             return text
-            
+        
         except Exception as e:
             logger.error(f"Ошибка теста распознавания: {e}")
             return None
 
+def test_recognition_batch(directory: str) -> None:
+    """Распознавание всех изображений папки пулом процессов OCR"""
+    import time
+    from ocr_pool import OcrPool
+    
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))
+    )
+    if not paths:
+        print(f"❌ Нет изображений в {directory}")
+        return
+    
+    with OcrPool() as pool:
+        started = time.perf_counter()
+        for path, result in zip(paths, pool.map(paths)):
+            error = f"  ❌ {result['error']}" if result.get('error') else ''
+            print(f"  {os.path.basename(path):<48} '{result['text']}'{error}")
+        elapsed = time.perf_counter() - started
+    
+    print(f"\n⏱️ {len(paths)} изображений за {elapsed:.1f} с "
+          f"({elapsed / len(paths) * 1000:.0f} мс на капчу, процессов: {pool.workers})")
+
 def test_recognition():
     """Функция для тестирования распознавания"""
     print("\n" + "="*60)
@@ -166,8 +515,9 @@ def test_recognition():
     # Вариант 1: Сделать скриншот сейчас
     print("\n1. Сделать скриншот сейчас")
     print("2. Использовать существующий файл")
+    print("3. Все изображения папки (пул процессов)")
     
-    choice = input("\nВаш выбор (1-2): ").strip()
+    choice = input("\nВаш выбор (1-3): ").strip()
     
     if choice == "1":
         import pyautogui
@@ -195,14 +545,18 @@ def test_recognition():
         # Распознавание
         text = processor.process_and_recognize(image)
         print(f"📝 Распознанный текст: '{text}'")
-        
+    
     elif choice == "2":
         filepath = input("Введите путь к файлу: ").strip()
         if not filepath:
             filepath = "test_captcha.png"
         
         processor.test_recognition_from_file(filepath)
-        
+    
+    elif choice == "3":
+        directory = input("Введите путь к папке: ").strip() or SCREENSHOTS_DIR
+        test_recognition_batch(directory)
+    
     else:
         print("❌ Неверный выбор")
 
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+⌨️ Бэкенды ввода: pyautogui и прямой XTest (без скрытых пауз)
+"""
+
+import sys
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Tuple, Optional, Dict, List
+
+from config import INPUT_BACKEND
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('InputBackend')
+
+class InputFailSafe(Exception):
+    """Курсор в углу экрана - аварийная остановка (как pyautogui.FAILSAFE)"""
+
+class InputBackend(ABC):
+    """
+    Интерфейс низкоуровневого ввода: мышь и клавиатура. Неполный
+    бэкенд падает TypeError при создании, а не посреди движения
+    """
+    
+    name = 'base'
+    
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        ...
+    
+    @abstractmethod
+    def position(self) -> Tuple[int, int]:
+        ...
+    
+    @abstractmethod
+    def move_to(self, x: float, y: float, duration: float = 0.0) -> None:
+        ...
+    
+    @abstractmethod
+    def click(self, button: str = 'left', clicks: int = 1) -> None:
+        ...
+    
+    @abstractmethod
+    def mouse_down(self, button: str = 'left') -> None:
+        ...
+    
+    @abstractmethod
+    def mouse_up(self, button: str = 'left') -> None:
+        ...
+    
+    @abstractmethod
+    def scroll(self, clicks: int) -> None:
+        ...
+    
+    @abstractmethod
+    def hotkey(self, *keys: str) -> None:
+        ...
+    
+    @abstractmethod
+    def press(self, key: str) -> None:
+        ...
+    
+    @abstractmethod
+    def write(self, text: str) -> None:
+        ...
+
+class PyAutoGUIBackend(InputBackend):
+    """Ввод через pyautogui (каждый вызов добавляет pyautogui.PAUSE)"""
+    
+    name = 'pyautogui'
+    
+    def __init__(self):
+        import pyautogui
+        
+        # Настройка безопасности pyautogui
+        pyautogui.FAILSAFE = True  # Прервать если мышь в углу экрана
+        pyautogui.PAUSE = 0.1  # Минимальная пауза между командами
+        
+        self.pyautogui = pyautogui
+    
+    def size(self) -> Tuple[int, int]:
+        return tuple(self.pyautogui.size())
+    
+    def position(self) -> Tuple[int, int]:
+        return tuple(self.pyautogui.position())
+    
+    def move_to(self, x: float, y: float, duration: float = 0.0) -> None:
+        self.pyautogui.moveTo(x, y, duration=duration)
+    
+    def click(self, button: str = 'left', clicks: int = 1) -> None:
+        self.pyautogui.click(button=button, clicks=clicks)
+    
+    def mouse_down(self, button: str = 'left') -> None:
+        self.pyautogui.mouseDown(button=button)
+    
+    def mouse_up(self, button: str = 'left') -> None:
+        self.pyautogui.mouseUp(button=button)
+    
+    def scroll(self, clicks: int) -> None:
+        self.pyautogui.scroll(clicks)
+    
+    def hotkey(self, *keys: str) -> None:
+        self.pyautogui.hotkey(*keys)
+    
+    def press(self, key: str) -> None:
+        self.pyautogui.press(key)
+    
+    def write(self, text: str) -> None:
+        self.pyautogui.write(text)
+
+class XTestBackend(InputBackend):
+    """
+    Ввод через расширение XTest в том же процессе (python-xlib).
+    Никаких неявных пауз: время тратится только на заданные задержки
+    """
+    
+    name = 'xtest'
+    
+    BUTTONS = {'left': 1, 'middle': 2, 'right': 3}
+    
+    # Имена клавиш pyautogui -> keysym X11
+    KEY_NAMES = {
+        'ctrl': 'Control_L', 'ctrlleft': 'Control_L', 'ctrlright': 'Control_R',
+        'shift': 'Shift_L', 'shiftleft': 'Shift_L', 'shiftright': 'Shift_R',
+        'alt': 'Alt_L', 'altleft': 'Alt_L', 'altright': 'Alt_R',
+        'win': 'Super_L', 'command': 'Super_L',
+        'enter': 'Return', 'return': 'Return', 'tab': 'Tab', 'esc': 'Escape',
+        'escape': 'Escape', 'space': 'space', 'backspace': 'BackSpace',
+        'delete': 'Delete', 'del': 'Delete', 'home': 'Home', 'end': 'End',
+        'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+        'pageup': 'Prior', 'pagedown': 'Next', 'insert': 'Insert'
+    }
+    
+    # Частота шагов при плавном перемещении (шагов в секунду)
+    MOVE_RATE = 100
+    
+    def __init__(self, display_name: Optional[str] = None):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display(display_name)
+        
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError("X сервер не поддерживает расширение XTEST")
+        
+        self.screen = self.display.screen()
+        self._keycodes: Dict[int, Tuple[int, bool]] = {}
+        self._spare_keycode: Optional[int] = None
+        self.failsafe = True
+    
+    def _check_failsafe(self) -> None:
+        if not self.failsafe:
+            return
+        x, y = self.position()
+        width, height = self.size()
+        if (x, y) in [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]:
+            raise InputFailSafe("Курсор в углу экрана - аварийная остановка")
+    
+    def size(self) -> Tuple[int, int]:
+        return (self.screen.width_in_pixels, self.screen.height_in_pixels)
+    
+    def position(self) -> Tuple[int, int]:
+        pointer = self.screen.root.query_pointer()
+        return (pointer.root_x, pointer.root_y)
+    
+    def move_to(self, x: float, y: float, duration: float = 0.0) -> None:
+        self._check_failsafe()
+        
+        if duration > 0:
+            # Плавное линейное перемещение с явными паузами
+            start_x, start_y = self.position()
+            steps = max(1, int(duration * self.MOVE_RATE))
+            step_delay = duration / steps
+            for i in range(1, steps):
+                t = i / steps
+                self._motion(start_x + (x - start_x) * t, start_y + (y - start_y) * t)
+                time.sleep(step_delay)
+            time.sleep(step_delay)
+        
+        self._motion(x, y)
+    
+    def _motion(self, x: float, y: float) -> None:
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(round(x)), y=int(round(y)))
+        self.display.sync()
+    
+    def _button(self, button: int, press: bool) -> None:
+        event = self.X.ButtonPress if press else self.X.ButtonRelease
+        self.xtest.fake_input(self.display, event, button)
+        self.display.sync()
+    
+    def click(self, button: str = 'left', clicks: int = 1) -> None:
+        self._check_failsafe()
+        code = self.BUTTONS[button]
+        for _ in range(clicks):
+            self._button(code, True)
+            self._button(code, False)
+    
+    def mouse_down(self, button: str = 'left') -> None:
+        self._button(self.BUTTONS[button], True)
+    
+    def mouse_up(self, button: str = 'left') -> None:
+        self._button(self.BUTTONS[button], False)
+    
+    def scroll(self, clicks: int) -> None:
+        # Кнопки 4/5 - колесо вверх/вниз
+        code = 4 if clicks > 0 else 5
+        for _ in range(abs(clicks)):
+            self._button(code, True)
+            self._button(code, False)
+    
+    def _keysym(self, key: str) -> int:
+        name = self.KEY_NAMES.get(key.lower(), key) if len(key) > 1 else key
+        keysym = self.XK.string_to_keysym(name)
+        if keysym == 0 and len(key) == 1:
+            # Символы вне латиницы (например, кириллица): keysym = 0x01000000 + код
+            keysym = ord(key) if ord(key) < 0x100 else 0x01000000 + ord(key)
+        return keysym
+    
+    def _keycode(self, keysym: int) -> Tuple[int, bool]:
+        """Код клавиши и нужен ли Shift; отсутствующие keysym привязываются к свободной клавише"""
+        if keysym in self._keycodes:
+            return self._keycodes[keysym]
+        
+        for keycode, index in self.display.keysym_to_keycodes(keysym):
+            # index 0 - без модификаторов, 1 - с Shift
+            if index in (0, 1):
+                result = (keycode, index == 1)
+                self._keycodes[keysym] = result
+                return result
+        
+        # Символа нет в раскладке - временно назначаем его свободной клавише
+        keycode = self._get_spare_keycode()
+        self.display.change_keyboard_mapping(keycode, [(keysym, keysym)])
+        self.display.sync()
+        return (keycode, False)
+    
+    def _get_spare_keycode(self) -> int:
+        if self._spare_keycode is None:
+            first = self.display.display.info.min_keycode
+            count = self.display.display.info.max_keycode - first + 1
+            mapping = self.display.get_keyboard_mapping(first, count)
+            for offset, keysyms in enumerate(reversed(mapping)):
+                if not any(keysyms):
+                    self._spare_keycode = first + count - 1 - offset
+                    break
+            else:
+                raise RuntimeError("Нет свободной клавиши для ввода символа")
+        return self._spare_keycode
+    
+    def _key(self, keycode: int, press: bool) -> None:
+        event = self.X.KeyPress if press else self.X.KeyRelease
+        self.xtest.fake_input(self.display, event, keycode)
+        self.display.sync()
+    
+    def _tap(self, key: str) -> None:
+        keycode, shift = self._keycode(self._keysym(key))
+        shift_code = self._keycode(self.XK.string_to_keysym('Shift_L'))[0] if shift else None
+        
+        if shift_code:
+            self._key(shift_code, True)
+        self._key(keycode, True)
+        self._key(keycode, False)
+        if shift_code:
+            self._key(shift_code, False)
+    
+    def hotkey(self, *keys: str) -> None:
+        codes = [self._keycode(self._keysym(key))[0] for key in keys]
+        for code in codes:
+            self._key(code, True)
+        for code in reversed(codes):
+            self._key(code, False)
+    
+    def press(self, key: str) -> None:
+        self._tap(key)
+    
+    def write(self, text: str) -> None:
+        for char in text:
+            self._tap(char)
+
+class NullBackend(InputBackend):
+    """Бэкенд без реального ввода - записывает вызовы (тесты, замеры)"""
+    
+    name = 'null'
+    
+    def __init__(self, screen_size: Tuple[int, int] = (1920, 1080), clock=None):
+        self.screen_size = screen_size
+        # Плавное перемещение "тратит" время на этих часах (для симуляции)
+        self.clock = clock
+        self.cursor = (screen_size[0] // 2, screen_size[1] // 2)
+        # Последние вызовы (ограничено, чтобы длинная симуляция не росла в памяти)
+        self.calls: deque = deque(maxlen=10000)
+    
+    def size(self) -> Tuple[int, int]:
+        return self.screen_size
+    
+    def position(self) -> Tuple[int, int]:
+        return self.cursor
+    
+    def move_to(self, x: float, y: float, duration: float = 0.0) -> None:
+        if duration > 0 and self.clock is not None:
+            self.clock.sleep(duration, 'mouse_move')
+        self.cursor = (int(round(x)), int(round(y)))
+        self.calls.append(('move_to', self.cursor, duration))
+    
+    def click(self, button: str = 'left', clicks: int = 1) -> None:
+        self.calls.append(('click', button, clicks))
+    
+    def mouse_down(self, button: str = 'left') -> None:
+        self.calls.append(('mouse_down', button))
+    
+    def mouse_up(self, button: str = 'left') -> None:
+        self.calls.append(('mouse_up', button))
+    
+    def scroll(self, clicks: int) -> None:
+        self.calls.append(('scroll', clicks))
+    
+    def hotkey(self, *keys: str) -> None:
+        self.calls.append(('hotkey',) + keys)
+    
+    def press(self, key: str) -> None:
+        self.calls.append(('press', key))
+    
+    def write(self, text: str) -> None:
+        self.calls.append(('write', text))
+
+BACKENDS = {
+    'pyautogui': PyAutoGUIBackend,
+    'xtest': XTestBackend,
+    'null': NullBackend
+}
+
+def get_input_backend(name: str = INPUT_BACKEND) -> InputBackend:
+    """Создание бэкенда ввода; при недоступности XTest - откат на pyautogui"""
+    name = (name or 'pyautogui').lower()
+    
+    try:
+        backend = BACKENDS[name]()
+    except KeyError:
+        logger.warning(f"⚠️ Неизвестный бэкенд ввода '{name}', используется pyautogui")
+        backend = PyAutoGUIBackend()
+    except Exception as e:
+        if name == 'pyautogui':
+            raise
+        logger.warning(f"⚠️ Бэкенд ввода '{name}' недоступен ({e}), используется pyautogui")
+        backend = PyAutoGUIBackend()
+    
+    logger.info(f"⌨️ Бэкенд ввода: {backend.name}")
+    return backend
+
+def benchmark_input(backend_names: Optional[List[str]] = None, repeats: int = 20) -> Dict[str, Dict[str, tuple]]:
+    """
+    Замер реальной длительности операций ввода против заданной.
+    Запускать на виртуальном экране:
+        xvfb-run -s "-screen 0 1920x1080x24" python3 input_backend.py --benchmark
+    """
+    from mouse_controller import MouseController
+    
+    backend_names = backend_names or ['pyautogui', 'xtest']
+    results = {}
+    
+    print("\n" + "="*60)
+    print("⏱️ ЗАМЕР ОПЕРАЦИЙ ВВОДА")
+    print("="*60)
+    
+    for name in backend_names:
+        try:
+            backend = BACKENDS[name]()
+        except Exception as e:
+            print(f"\n❌ {name}: недоступен ({e})")
+            continue
+        
+        controller = MouseController(backend=backend)
+        width, height = backend.size()
+        center = (width // 2, height // 2)
+        
+        # Операция -> (функция, заданная длительность)
+        operations = {
+            'move_to': (lambda: backend.move_to(*center), lambda: 0.0),
+            'click': (lambda: backend.click(), lambda: 0.0),
+            'hotkey': (lambda: backend.hotkey('ctrl', 'a'), lambda: 0.0),
+            'press': (lambda: backend.press('delete'), lambda: 0.0),
+            'write (1 символ)': (lambda: backend.write('a'), lambda: 0.0),
+            'human_move_to': (
+                lambda: controller.human_move_to(center[0] + 400, center[1] + 200)
+                if backend.position()[0] < center[0] + 200
+                else controller.human_move_to(center[0] - 400, center[1] - 200),
+                lambda: controller.last_move_duration
+            )
+        }
+        
+        print(f"\n🔧 {name}:")
+        print(f"  {'Операция':<20}{'Реально, мс':>14}{'Задано, мс':>14}{'Сверх, мс':>12}")
+        
+        results[name] = {}
+        for operation, (run, intended) in operations.items():
+            actual_total = 0.0
+            intended_total = 0.0
+            for _ in range(repeats):
+                started = time.perf_counter()
+                run()
+                actual_total += time.perf_counter() - started
+                intended_total += intended()
+            
+            actual = actual_total / repeats * 1000
+            planned = intended_total / repeats * 1000
+            results[name][operation] = (actual, planned)
+            print(f"  {operation:<20}{actual:>14.1f}{planned:>14.1f}{actual - planned:>12.1f}")
+    
+    print("="*60)
+    return results
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark_input()
+    else:
+        backend = get_input_backend()
+        print(f"Экран: {backend.size()}, курсор: {backend.position()}")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+🧠 Контроль роста памяти в долгих сессиях: RSS и топ аллокаций tracemalloc
+"""
+
+import os
+import logging
+import tracemalloc
+from typing import Optional, Dict, Any
+
+from config import (
+    MEMORY_CHECK_INTERVAL, MEMORY_GROWTH_WARN_MB,
+    MEMORY_TRACE_FRAMES, MEMORY_TOP_ALLOCATORS
+)
+from clock import Clock, REAL_CLOCK
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('MemoryWatchdog')
+
+MB = 1024 * 1024
+
+def current_rss() -> Optional[int]:
+    """Текущий RSS процесса в байтах (psutil, /proc или пиковое значение)"""
+    if psutil is not None:
+        try:
+            return psutil.Process().memory_info().rss
+        except Exception:
+            pass
+    
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    
+    try:
+        import resource
+        # ru_maxrss - пик, а не текущее значение (Linux: КБ)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+class MemoryWatchdog:
+    """
+    Периодический замер памяти. Рост считается от первого замера
+    сессии, аллокации сравниваются с начальным снимком tracemalloc
+    """
+    
+    def __init__(self, interval: float = MEMORY_CHECK_INTERVAL,
+                 growth_warn_mb: float = MEMORY_GROWTH_WARN_MB,
+                 trace_frames: int = MEMORY_TRACE_FRAMES,
+                 top: int = MEMORY_TOP_ALLOCATORS,
+                 clock: Optional[Clock] = None):
+        self.interval = interval
+        self.growth_warn_mb = growth_warn_mb
+        self.trace_frames = trace_frames
+        self.top = top
+        self.clock = clock or REAL_CLOCK
+        
+        self.start_rss: Optional[int] = None
+        self.peak_rss = 0
+        self.last_check = 0.0
+        self.warned_level = 0
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracing = False
+    
+    def start(self) -> None:
+        """Начальный замер; запуск tracemalloc, если он еще не включен"""
+        if self.trace_frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._owns_tracing = True
+        if tracemalloc.is_tracing():
+            self._baseline = self._snapshot()
+        
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss or 0
+        self.last_check = self.clock.time()
+    
+    def stop(self) -> None:
+        """Остановить tracemalloc, если его включал watchdog"""
+        if self._owns_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._owns_tracing = False
+        self._baseline = None
+    
+    def due(self) -> bool:
+        """Пора ли делать следующий замер"""
+        return self.clock.time() - self.last_check >= self.interval
+    
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Снимок без служебных аллокаций tracemalloc и импорта"""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+    
+    def _top_allocators(self) -> list:
+        """Строки кода с наибольшим ростом аллокаций с начала сессии"""
+        if not tracemalloc.is_tracing():
+            return []
+        
+        snapshot = self._snapshot()
+        if self._baseline is not None:
+            stats = snapshot.compare_to(self._baseline, 'lineno')
+        else:
+            stats = snapshot.statistics('lineno')
+        
+        top = []
+        for stat in stats[:self.top]:
+            frame = stat.traceback[0]
+            top.append({
+                'where': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                'size_kb': round(stat.size / 1024, 1),
+                'diff_kb': round(getattr(stat, 'size_diff', stat.size) / 1024, 1),
+                'count': stat.count
+            })
+        return top
+    
+    def check(self) -> Dict[str, Any]:
+        """Замер памяти; возвращает сводку для stats['memory']"""
+        self.last_check = self.clock.time()
+        
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        growth = (rss - self.start_rss) / MB if rss is not None and self.start_rss is not None else 0.0
+        
+        summary = {
+            'checked_at': self.clock.now().isoformat(),
+            'rss_mb': round(rss / MB, 1) if rss is not None else None,
+            'start_rss_mb': round(self.start_rss / MB, 1) if self.start_rss is not None else None,
+            'peak_rss_mb': round(self.peak_rss / MB, 1),
+            'growth_mb': round(growth, 1),
+            'top_allocators': self._top_allocators(),
+            'warning': False
+        }
+        
+        logger.info(f"🧠 Память: RSS {summary['rss_mb']} МБ "
+                    f"(рост {growth:+.1f} МБ, пик {summary['peak_rss_mb']} МБ)")
+        for item in summary['top_allocators'][:3]:
+            logger.info(f"🧠   {item['where']}: {item['size_kb']} КБ ({item['diff_kb']:+} КБ)")
+        
+        # Предупреждение при каждом новом пересечении порога (100, 200, ... МБ)
+        if self.growth_warn_mb > 0:
+            level = int(growth // self.growth_warn_mb)
+            if level > self.warned_level:
+                self.warned_level = level
+                summary['warning'] = True
+                where = summary['top_allocators'][0]['where'] if summary['top_allocators'] else 'нет данных'
+                logger.warning(f"⚠️ Рост памяти {growth:.1f} МБ с начала сессии "
+                               f"(больше всего: {where})")
+        
+        return summary
@@ -7,18 +7,17 @@ import time
 import random
 import math
 import logging
-from typing import Tuple
+import functools
+from typing import Tuple, Optional
 
-import pyautogui
+import numpy as np
 
 from config import (
     MOUSE_MOVE_DURATION_MIN, MOUSE_MOVE_DURATION_MAX,
     MOUSE_ACCURACY
 )
-
-# Настройка безопасности pyautogui
-pyautogui.FAILSAFE = True  # Прервать если мышь в углу экрана
-pyautogui.PAUSE = 0.1  # Минимальная пауза между командами
+from input_backend import InputBackend, get_input_backend
+from clock import Clock, REAL_CLOCK
 
 # Настройка логирования
 logging.basicConfig(
@@ -27,11 +26,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger('MouseController')
 
+@functools.lru_cache(maxsize=128)
+def bernstein_basis(degree: int, steps: int) -> np.ndarray:
+    """
+    Матрица (steps + 1, degree + 1) коэффициентов Бернштейна для
+    t = i / steps по той же формуле, что в _bezier_point (коэффициенты
+    совпадают побитово). Общая для всех вызовов, только для чтения
+    """
+    basis = np.array([
+        [math.comb(degree, i) * (t**i) * ((1 - t)**(degree - i)) for i in range(degree + 1)]
+        for t in (step / steps for step in range(steps + 1))
+    ], dtype=np.float64)
+    basis.setflags(write=False)
+    return basis
+
 class MouseController:
     """Класс для человекоподобного управления мышью"""
     
-    def __init__(self):
-        self.screen_width, self.screen_height = pyautogui.size()
+    def __init__(self, backend: Optional[InputBackend] = None, clock: Optional[Clock] = None):
+        self.backend = backend or get_input_backend()
+        self.clock = clock or REAL_CLOCK
+        self.screen_width, self.screen_height = self.backend.size()
+        # Заданная длительность последнего перемещения (для замеров)
+        self.last_move_duration = 0.0
         logger.info(f"✅ Контроллер мыши инициализирован. Экран: {self.screen_width}x{self.screen_height}")
     
     def human_move_to(self, x: int, y: int) -> None:
@@ -40,7 +57,7 @@ class MouseController:
         """
         try:
             # Текущая позиция мыши
-            current_x, current_y = pyautogui.position()
+            current_x, current_y = self.backend.position()
             
             # Случайное отклонение для "дрожания руки"
             x += random.randint(-MOUSE_ACCURACY, MOUSE_ACCURACY)
@@ -55,6 +72,7 @@ class MouseController:
                 MOUSE_MOVE_DURATION_MIN,
                 MOUSE_MOVE_DURATION_MAX
             )
+            self.last_move_duration = duration
             
             # Параметры для кривой Безье
             control_points = []
@@ -92,32 +110,34 @@ class MouseController:
                 
                 # Плавное перемещение по точкам
                 for point_x, point_y in points:
-                    pyautogui.moveTo(point_x, point_y)
-                    time.sleep(duration / len(points))
+                    self.backend.move_to(point_x, point_y)
+                    self.clock.sleep(duration / len(points), 'mouse_move')
             else:
                 # Прямое перемещение для коротких дистанций
-                pyautogui.moveTo(x, y, duration=duration)
+                self.backend.move_to(x, y, duration=duration)
             
             logger.debug(f"Мышь перемещена в ({x}, {y}) за {duration:.2f} сек")
             
         except Exception as e:
             logger.error(f"Ошибка перемещения мыши: {e}")
-            pyautogui.moveTo(x, y)  # Простое перемещение в случае ошибки
+            self.backend.move_to(x, y)  # Простое перемещение в случае ошибки
     
     def _generate_bezier_curve(self, start: Tuple[float, float], end: Tuple[float, float],
                                control_points: list, steps: int = 50) -> list:
-        """Генерация кривой Безье"""
-        points = []
-        
-        for i in range(steps + 1):
-            t = i / steps
-            points.append(self._bezier_point(t, start, end, control_points))
-        
-        return points
+        """
+        Генерация кривой Безье: произведение кэшированной матрицы
+        Бернштейна на опорные точки. Сумма по опорным точкам идет
+        в том же порядке, что в _bezier_point (BLAS через @ меняет
+        порядок и последние биты), так что точки совпадают точно
+        """
+        all_points = np.array([start] + list(control_points) + [end], dtype=np.float64)
+        basis = bernstein_basis(len(all_points) - 1, steps)
+        curve = (basis[:, :, None] * all_points).sum(axis=1)
+        return list(zip(*curve.T.tolist()))
     
     def _bezier_point(self, t: float, start: Tuple[float, float], end: Tuple[float, float],
                       control_points: list) -> Tuple[float, float]:
-        """Вычисление точки на кривой Безье"""
+        """Вычисление точки на кривой Безье (эталон для _generate_bezier_curve)"""
         # Кривая Безье высшего порядка
         all_points = [start] + control_points + [end]
         n = len(all_points) - 1
@@ -140,13 +160,13 @@ class MouseController:
             self.human_move_to(x, y)
             
             # Случайная задержка перед кликом
-            time.sleep(random.uniform(0.1, 0.3))
+            self.clock.sleep(random.uniform(0.1, 0.3), 'click')
             
             # Клик
-            pyautogui.click(button=button)
+            self.backend.click(button=button)
             
             # Случайная задержка после клика
-            time.sleep(random.uniform(0.05, 0.15))
+            self.clock.sleep(random.uniform(0.05, 0.15), 'click')
             
             logger.debug(f"Клик в ({x}, {y}) кнопкой {button}")
             
@@ -168,9 +188,9 @@ class MouseController:
         """Двойной клик"""
         try:
             self.human_move_to(x, y)
-            time.sleep(random.uniform(0.1, 0.2))
+            self.clock.sleep(random.uniform(0.1, 0.2), 'click')
             
-            pyautogui.doubleClick()
+            self.backend.click(clicks=2)
             
             logger.debug(f"Двойной клик в ({x}, {y})")
             
@@ -181,9 +201,9 @@ class MouseController:
         """Правый клик"""
         try:
             self.human_move_to(x, y)
-            time.sleep(random.uniform(0.1, 0.3))
+            self.clock.sleep(random.uniform(0.1, 0.3), 'click')
             
-            pyautogui.rightClick()
+            self.backend.click(button='right')
             
             logger.debug(f"Правый клик в ({x}, {y})")
             
@@ -195,24 +215,24 @@ class MouseController:
         try:
             # Перемещение к начальной точке
             self.human_move_to(start_x, start_y)
-            time.sleep(random.uniform(0.2, 0.4))
+            self.clock.sleep(random.uniform(0.2, 0.4), 'click')
             
             # Нажатие и удержание
-            pyautogui.mouseDown()
-            time.sleep(random.uniform(0.1, 0.2))
+            self.backend.mouse_down()
+            self.clock.sleep(random.uniform(0.1, 0.2), 'click')
             
             # Перетаскивание
             self.human_move_to(end_x, end_y)
-            time.sleep(random.uniform(0.1, 0.2))
+            self.clock.sleep(random.uniform(0.1, 0.2), 'click')
             
             # Отпускание
-            pyautogui.mouseUp()
+            self.backend.mouse_up()
             
             logger.debug(f"Перетаскивание из ({start_x}, {start_y}) в ({end_x}, {end_y})")
             
         except Exception as e:
             logger.error(f"Ошибка перетаскивания: {e}")
-            pyautogui.mouseUp()  # На всякий случай отпускаем
+            self.backend.mouse_up()  # На всякий случай отпускаем
     
     def scroll(self, clicks: int, direction: str = 'down') -> None:
         """Прокрутка колесика"""
@@ -225,8 +245,8 @@ class MouseController:
             
             # Случайная скорость прокрутки
             for _ in range(abs(clicks)):
-                pyautogui.scroll(clicks // abs(clicks))
-                time.sleep(random.uniform(0.05, 0.15))
+                self.backend.scroll(clicks // abs(clicks))
+                self.clock.sleep(random.uniform(0.05, 0.15), 'scroll')
             
             logger.debug(f"Прокрутка {abs(clicks)} кликов {direction}")
             
@@ -268,7 +288,7 @@ class MouseController:
             
         elif choice == "2":
             print("\n🖱️ Тест кликов...")
-            current_x, current_y = pyautogui.position()
+            current_x, current_y = self.backend.position()
             print(f"Текущая позиция: ({current_x}, {current_y})")
             
             print("Левый клик...")
@@ -286,7 +306,7 @@ class MouseController:
             
         elif choice == "3":
             print("\n↔️ Тест перетаскивания...")
-            current_x, current_y = pyautogui.position()
+            current_x, current_y = self.backend.position()
             
             print(f"Начинаю перетаскивание из ({current_x}, {current_y})")
             self.drag_to(current_x, current_y, current_x + 200, current_y + 200)
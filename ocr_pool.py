@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+🧠 Пул процессов OCR: прогретые движки Tesseract для решателя и пакетной оценки
+"""
+
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional, Iterable, Iterator, List, Dict, Any, Union
+
+import numpy as np
+
+from config import (
+    OCR_POOL_QUEUE_SIZE, OCR_POOL_TASK_TIMEOUT, OCR_POOL_START_TIMEOUT,
+    OCR_BATCH_WORKERS, DEFAULT_CAPTCHA_REGION
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('OcrPool')
+
+# Задача: кадр RGB или путь к файлу изображения
+Task = Union[np.ndarray, str]
+
+class OcrTimeout(Exception):
+    """Задача OCR не уложилась в таймаут, процесс перезапущен"""
+
+def _recognize(processor, frame: Task, save_debug: bool) -> Dict[str, Any]:
+    """Одна капча в рабочем процессе"""
+    if isinstance(frame, str):
+        from PIL import Image
+        frame = np.asarray(Image.open(frame).convert('RGB'))
+    
+    started = time.perf_counter()
+    if save_debug:
+        text = processor.process_and_recognize(frame)
+    else:
+        text = processor.recognize_text(processor.preprocess_array(frame))
+    return {
+        'text': text,
+        'confidence': processor.last_confidence,
+        'lang': processor.last_lang,
+        'seconds': time.perf_counter() - started
+    }
+
+def _worker(index: int, options: Dict[str, Any], tasks, results, current, started_at, guard) -> None:
+    """
+    Рабочий процесс: движок загружается и прогревается один раз,
+    дальше задачи берутся из общей очереди до None. Текущая задача
+    пишется в общую память: сообщение в очереди могло бы пропасть
+    вместе с упавшим процессом. Задача снимается под guard до отправки
+    результата и до следующего tasks.get(): пул завершает процесс по
+    таймауту под тем же guard, поэтому не убьет его с блокировкой очереди
+    """
+    try:
+        import image_processor
+        from corpus import synthetic_captcha
+        
+        logging.getLogger('ImageProcessor').setLevel(logging.WARNING)
+        if options.get('lang'):
+            image_processor.TESSERACT_LANG = options['lang']
+        processor = image_processor.ImageProcessor()
+        if options.get('config'):
+            processor.config = {**processor.config, **options['config']}
+        if options.get('lang_mode'):
+            processor.lang_mode = options['lang_mode']
+        
+        # Прогрев: буферы под размер капчи и первый вызов Tesseract.
+        # Высота текста синтетики не должна попасть в медиану масштаба
+        warmup = np.asarray(synthetic_captcha('WARM1', size=tuple(options['size'])))
+        _recognize(processor, warmup, save_debug=False)
+        processor._text_heights.clear()
+    except Exception as e:
+        results.put(('broken', index, None, str(e)))
+        return
+    
+    results.put(('ready', index, None, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, frame = task
+        with guard:
+            started_at[index] = time.time()
+            current[index] = task_id
+        try:
+            message = ('done', index, task_id, _recognize(processor, frame, options['save_debug']))
+        except Exception as e:
+            message = ('failed', index, task_id, str(e))
+        with guard:
+            current[index] = -1
+        results.put(message)
+
+class OcrPool:
+    """
+    Долгоживущие процессы распознавания с общей ограниченной очередью
+    задач. submit возвращает Future, map - результаты по порядку.
+    Задача дольше task_timeout завершается OcrTimeout, а ее процесс
+    перезапускается; упавший процесс тоже заменяется новым
+    """
+    
+    def __init__(self, workers: Optional[int] = None, queue_size: int = OCR_POOL_QUEUE_SIZE,
+                 task_timeout: float = OCR_POOL_TASK_TIMEOUT, save_debug: bool = False,
+                 config: Optional[Dict[str, Any]] = None, lang_mode: Optional[str] = None,
+                 lang: Optional[str] = None, size=DEFAULT_CAPTCHA_REGION[2:]):
+        self.workers = workers or OCR_BATCH_WORKERS or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.task_timeout = task_timeout
+        self.options = {
+            'save_debug': save_debug,
+            'config': config,
+            'lang_mode': lang_mode,
+            'lang': lang,
+            'size': tuple(size)
+        }
+        
+        # spawn: решатель и бот многопоточны, fork мог бы унаследовать захваченные блокировки
+        self._context = multiprocessing.get_context('spawn')
+        self._tasks = self._context.Queue(maxsize=queue_size)
+        self._results = self._context.Queue()
+        self._processes: Dict[int, Any] = {}
+        self._ready = set()
+        self._broken = set()   # Не запустились (нет модели, ошибка импорта)
+        self._ready_event = threading.Event()
+        
+        self._futures: Dict[int, Future] = {}
+        # Задача каждого процесса (-1 - свободен) и время ее начала
+        self._current = self._context.Array('q', [-1] * self.workers, lock=False)
+        self._started_at = self._context.Array('d', self.workers, lock=False)
+        # Снятие задачи процессом и его завершение по таймауту исключают друг друга
+        self._guards: Dict[int, Any] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._closing = False    # Процессы больше не перезапускаются
+        self._stopping = False   # Поток пула завершается
+        self.restarts = 0
+    
+    def _spawn(self, index: int) -> None:
+        """Запустить рабочий процесс с номером index"""
+        self._current[index] = -1
+        # Новая блокировка: упавший процесс мог оставить старую захваченной
+        self._guards[index] = self._context.Lock()
+        process = self._context.Process(
+            target=_worker,
+            args=(index, self.options, self._tasks, self._results, self._current, self._started_at,
+                  self._guards[index]),
+            name=f"ocr-{index}", daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+    
+    def start(self, wait: bool = True) -> 'OcrPool':
+        """Запуск процессов; wait - дождаться загрузки движков"""
+        for index in range(self.workers):
+            self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, name='OcrPoolCollector', daemon=True)
+        self._collector.start()
+        
+        if wait and not self._ready_event.wait(OCR_POOL_START_TIMEOUT):
+            logger.warning(f"⚠️ Готово процессов OCR: {len(self._ready)}/{self.workers}")
+        logger.info(f"✅ Пул OCR: {len(self._ready)} процессов")
+        return self
+    
+    def submit(self, frame: Task, timeout: Optional[float] = None) -> Future:
+        """
+        Поставить задачу. При полной очереди ждет до timeout секунд
+        (None - без ограничения), затем queue.Full. Массив сериализуется
+        в фоне: до результата его нельзя менять
+        """
+        if len(self._broken) >= self.workers:
+            raise RuntimeError("процессы OCR не запустились")
+        future: Future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            self._futures[task_id] = future
+        try:
+            self._tasks.put((task_id, frame), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._futures.pop(task_id, None)
+            raise
+        return future
+    
+    def map(self, frames: Iterable[Task], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Результаты по порядку кадров. Одновременно в работе не больше
+        очереди и процессов; ошибка задачи дает результат с 'error'
+        """
+        pending: deque = deque()
+        window = self.queue_size + self.workers
+        
+        def result(future: Future) -> Dict[str, Any]:
+            try:
+                return future.result(timeout)
+            except Exception as e:
+                return {'text': None, 'confidence': None, 'lang': None, 'seconds': None, 'error': str(e)}
+        
+        for frame in frames:
+            pending.append(self.submit(frame))
+            if len(pending) >= window:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+    
+    def _collect(self) -> None:
+        """Поток пула: раздача результатов, таймауты и перезапуск процессов"""
+        while not self._stopping:
+            try:
+                kind, index, task_id, payload = self._results.get(timeout=0.2)
+                self._handle(kind, index, task_id, payload)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error(f"Ошибка пула OCR: {e}")
+            self._supervise()
+    
+    def _handle(self, kind: str, index: int, task_id: Optional[int], payload: Any) -> None:
+        """Сообщение рабочего процесса"""
+        if kind in ('ready', 'broken'):
+            if kind == 'ready':
+                self._ready.add(index)
+            else:
+                logger.error(f"❌ Процесс OCR {index} не запустился: {payload}")
+                self._broken.add(index)
+            if len(self._ready) + len(self._broken) >= self.workers:
+                self._ready_event.set()
+            if len(self._broken) >= self.workers:
+                # Задачи в очереди никто не возьмет
+                self._fail_pending(RuntimeError("процессы OCR не запустились"))
+            return
+        
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is None or future.done():
+            return
+        if kind == 'done':
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+    
+    def _supervise(self) -> None:
+        """Снять зависшую задачу и заменить упавший процесс"""
+        if self._closing:
+            return
+        for index, process in list(self._processes.items()):
+            # Пока guard у пула, процесс не может закончить задачу и уйти
+            # в tasks.get(): завершается он точно посреди распознавания
+            guard = self._guards[index]
+            if not guard.acquire(timeout=1):
+                if process.is_alive():
+                    continue
+                locked = False   # Процесс упал, держа guard
+            else:
+                locked = True
+            try:
+                task_id = self._current[index]
+                timed_out = (locked and task_id >= 0
+                             and time.time() - self._started_at[index] > self.task_timeout)
+                if timed_out:
+                    process.terminate()
+            finally:
+                if locked:
+                    guard.release()
+            if process.is_alive() and not timed_out:
+                continue
+            if not timed_out and index not in self._ready:
+                continue   # Не запустился - не перезапускаем по кругу
+            
+            process.join(1)
+            self._ready.discard(index)
+            
+            if task_id >= 0:
+                with self._lock:
+                    future = self._futures.pop(task_id, None)
+                if future is not None and not future.done():
+                    error = (OcrTimeout(f"OCR дольше {self.task_timeout:.0f} с") if timed_out
+                             else RuntimeError("процесс OCR завершился"))
+                    future.set_exception(error)
+            
+            logger.warning(f"♻️ Перезапуск процесса OCR {index}"
+                           f"{' (таймаут задачи)' if timed_out else ''}")
+            self.restarts += 1
+            self._spawn(index)
+    
+    def stop(self) -> None:
+        """Завершить процессы; задачи без результата получают ошибку"""
+        if self._collector is None:
+            return
+        self._closing = True
+        for _ in self._processes:
+            try:
+                self._tasks.put(None, timeout=1)
+            except queue.Full:
+                break
+        
+        deadline = time.time() + 2
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        self._stopping = True
+        self._collector.join(1)
+        self._collector = None
+        
+        self._fail_pending(RuntimeError("пул OCR остановлен"))
+    
+    def _fail_pending(self, error: Exception) -> None:
+        """Завершить ошибкой все задачи без результата"""
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(error)
+    
+    def __enter__(self) -> 'OcrPool':
+        return self.start()
+    
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def recognize_files(paths: List[str], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Распознать файлы пакетом (без отладочных скриншотов)"""
+    with OcrPool(workers) as pool:
+        return list(pool.map(paths))
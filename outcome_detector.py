@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+✅ Проверка результата отправки: сайт принял ответ, отклонил или ничего не изменилось
+"""
+
+import os
+import sys
+import json
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    DATA_DIR, OUTCOMES_FILE, OUTCOME_ERROR_TEMPLATE,
+    OUTCOME_CHANGE_THRESHOLD, OUTCOME_ERROR_MATCH, OUTCOME_CHANGE_MEANS_ACCEPTED
+)
+from template_matcher import match_in_window, to_gray
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('OutcomeDetector')
+
+OUTCOMES = ('accepted', 'rejected', 'changed', 'unchanged')
+
+def frame_difference(before: np.ndarray, after: np.ndarray) -> float:
+    """Средняя разница яркости по прореженной сетке пикселей"""
+    if before.shape != after.shape:
+        return float('inf')
+    diff = np.abs(after[::4, ::4].astype(np.int16) - before[::4, ::4].astype(np.int16))
+    return float(diff.mean())
+
+class OutcomeDetector:
+    """
+    Сравнивает область капчи до и после клика по кнопке.
+    Найден шаблон сообщения об ошибке - ответ отклонен. Капча сменилась:
+    принят, если шаблон ошибки загружен и не найден (или сайт не меняет
+    капчу после неверного ответа), иначе - нейтральное 'changed': новая
+    капча бывает и после отказа. Кадр не изменился - без изменений
+    """
+    
+    def __init__(self, change_threshold: float = OUTCOME_CHANGE_THRESHOLD,
+                 error_match: float = OUTCOME_ERROR_MATCH,
+                 template_path: Optional[str] = OUTCOME_ERROR_TEMPLATE,
+                 change_means_accepted: bool = OUTCOME_CHANGE_MEANS_ACCEPTED):
+        self.change_threshold = change_threshold
+        self.error_match = error_match
+        self.error_template = self._load_template(template_path)
+        self.change_means_accepted = change_means_accepted
+    
+    def _load_template(self, path: Optional[str]) -> Optional[np.ndarray]:
+        """Шаблон сообщения об ошибке (если сохранен)"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            template = to_gray(np.asarray(Image.open(path).convert('RGB')))
+            logger.info(f"✅ Шаблон ошибки загружен: {path}")
+            return template
+        except Exception as e:
+            logger.error(f"Ошибка загрузки шаблона ошибки: {e}")
+            return None
+    
+    def error_score(self, frame: np.ndarray) -> Optional[float]:
+        """Схожесть с шаблоном ошибки (None - шаблона нет или он больше области)"""
+        if self.error_template is None:
+            return None
+        match = match_in_window(frame, self.error_template, (0, 0))
+        return match.score if match else None
+    
+    def classify(self, before: np.ndarray, after: np.ndarray,
+                 result_frame: Optional[np.ndarray] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Исход по кадрам области капчи до и после клика. Шаблон ошибки
+        ищется в result_frame (отдельная область сообщения), иначе в after
+        """
+        score = self.error_score(after if result_frame is None else result_frame)
+        diff = frame_difference(before, after)
+        details = {
+            'diff': round(diff, 2) if diff != float('inf') else None,
+            'error_score': round(score, 3) if score is not None else None
+        }
+        
+        if score is not None and score >= self.error_match:
+            return 'rejected', details
+        if diff > self.change_threshold:
+            if score is not None or self.change_means_accepted:
+                return 'accepted', details
+            return 'changed', details
+        return 'unchanged', details
+
+def append_outcome(record: Dict[str, Any], path: str = OUTCOMES_FILE) -> None:
+    """Дописать исход отправки (одна JSON-строка на капчу)"""
+    try:
+        os.makedirs(os.path.dirname(path) or DATA_DIR, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except Exception as e:
+        logger.error(f"Ошибка записи исхода: {e}")
+
+def read_outcomes(path: str = OUTCOMES_FILE) -> List[Dict[str, Any]]:
+    """Все записанные исходы отправок"""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+def load_outcomes(path: str = OUTCOMES_FILE) -> Dict[str, str]:
+    """Исходы по имени скриншота: {имя файла: исход}"""
+    return {
+        record['screenshot']: record.get('outcome')
+        for record in read_outcomes(path) if record.get('screenshot')
+    }
+
+def save_error_template(region: Tuple[int, int, int, int],
+                        path: str = OUTCOME_ERROR_TEMPLATE) -> bool:
+    """Снять сообщение сайта об ошибке с экрана как шаблон"""
+    try:
+        import pyautogui
+        
+        image = pyautogui.screenshot(region=region)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.convert('RGB').save(path)
+        logger.info(f"✅ Шаблон ошибки сохранен: {path}")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка сохранения шаблона ошибки: {e}")
+        return False
+
+def main(argv: List[str]) -> int:
+    """
+    python3 outcome_detector.py template X Y W H  - снять шаблон сообщения об ошибке
+    python3 outcome_detector.py report            - сводка исходов из outcomes.jsonl
+    """
+    command = argv[0] if argv else 'report'
+    
+    if command == 'template' and len(argv) == 5:
+        return 0 if save_error_template(tuple(int(v) for v in argv[1:])) else 1
+    
+    if command == 'report':
+        counts = {outcome: 0 for outcome in OUTCOMES}
+        for record in read_outcomes():
+            if record.get('outcome') in counts:
+                counts[record['outcome']] += 1
+        
+        total = sum(counts.values())
+        print(f"📨 Отправлено: {total}")
+        for outcome, count in counts.items():
+            share = count / total * 100 if total else 0.0
+            print(f"  {outcome:<10} {count:>7}  {share:>5.1f}%")
+        return 0
+    
+    print(main.__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+📈 Инкрементальные агрегаты производительности и графики для /perf
+"""
+
+import io
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from PIL import Image, ImageDraw
+
+from config import (
+    DATA_DIR, ROLLUPS_FILE, ROLLUP_WINDOWS,
+    PERF_CHART_SIZE, PERF_CHART_REFRESH
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('PerfRollups')
+
+# Цвета графиков
+COLOR_SOLVED = (46, 160, 67)
+COLOR_ERRORS = (218, 54, 51)
+STAGE_COLORS = [(31, 111, 235), (191, 135, 0), (137, 87, 229), (110, 118, 129)]
+
+class PerfRollups:
+    """
+    Агрегаты по временным корзинам (час / сутки / неделя).
+    Каждая капча обновляет по одной корзине в каждом окне,
+    история целиком не пересчитывается.
+    """
+    
+    def __init__(self, path: str = ROLLUPS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._load()
+    
+    def _load(self) -> Dict[str, Any]:
+        """Загрузка агрегатов"""
+        data = load_rollups(self.path) or {}
+        for window in ROLLUP_WINDOWS:
+            data.setdefault(window, {})
+        return data
+    
+    def record(self, outcome: str, stages: Dict[str, float],
+               timestamp: Optional[float] = None, verdict: Optional[str] = None) -> None:
+        """
+        Учесть одну капчу: outcome - 'solved' или 'errors', stages - секунды
+        по этапам, verdict - ответ сайта (outcome_detector.OUTCOMES)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        
+        with self._lock:
+            for window, (bucket_size, keep) in ROLLUP_WINDOWS.items():
+                buckets = self.data[window]
+                start = int(timestamp // bucket_size * bucket_size)
+                bucket = buckets.setdefault(str(start), {'solved': 0, 'errors': 0, 'stages': {}})
+                
+                bucket[outcome] = bucket.get(outcome, 0) + 1
+                if verdict:
+                    bucket[verdict] = bucket.get(verdict, 0) + 1
+                for stage, seconds in stages.items():
+                    total, count = bucket['stages'].get(stage, (0.0, 0))
+                    bucket['stages'][stage] = (total + seconds, count + 1)
+                
+                # Удаляем корзины, вышедшие за окно
+                oldest = start - bucket_size * (keep - 1)
+                for key in [k for k in buckets if int(k) < oldest]:
+                    del buckets[key]
+            
+            self._save()
+    
+    def _save(self) -> None:
+        """Атомарная запись, чтобы бот не прочитал файл наполовину"""
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения агрегатов: {e}")
+
+def load_rollups(path: str = ROLLUPS_FILE) -> Optional[Dict[str, Any]]:
+    """Загрузка агрегатов для просмотра"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except:
+        pass
+    return None
+
+def window_series(rollups: Dict[str, Any], window: str,
+                  now: Optional[float] = None) -> Tuple[List[int], Dict[str, list]]:
+    """Ряды по корзинам окна, включая пустые корзины"""
+    bucket_size, keep = ROLLUP_WINDOWS[window]
+    now = time.time() if now is None else now
+    
+    last = int(now // bucket_size * bucket_size)
+    starts = [last - bucket_size * i for i in range(keep - 1, -1, -1)]
+    buckets = rollups.get(window, {})
+    
+    series = {'solved': [], 'errors': [], 'accepted': [], 'stages': {}}
+    stage_names = sorted({s for b in buckets.values() for s in b.get('stages', {})})
+    for stage in stage_names:
+        series['stages'][stage] = []
+    
+    for start in starts:
+        bucket = buckets.get(str(start), {})
+        series['solved'].append(bucket.get('solved', 0))
+        series['errors'].append(bucket.get('errors', 0))
+        series['accepted'].append(bucket.get('accepted', 0))
+        for stage in stage_names:
+            total, count = bucket.get('stages', {}).get(stage, (0.0, 0))
+            series['stages'][stage].append(total / count * 1000 if count else None)
+    
+    return starts, series
+
+def render_chart(rollups: Dict[str, Any], window: str, now: Optional[float] = None) -> bytes:
+    """График окна в PNG: решено/ошибки (столбцы) и задержка этапов (линии, мс)"""
+    starts, series = window_series(rollups, window, now)
+    width, height = PERF_CHART_SIZE
+    margin = 40
+    panel_height = (height - margin * 3) // 2
+    
+    image = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    
+    solved, errors = series['solved'], series['errors']
+    total_solved, total_errors = sum(solved), sum(errors)
+    # Встроенный шрифт PIL без кириллицы, поэтому подписи латиницей
+    title = f"{window}: solved {total_solved}, errors {total_errors}"
+    if sum(series['accepted']):
+        title += f", accepted {sum(series['accepted'])}"
+    draw.text((margin, 8), title, fill=(0, 0, 0))
+    
+    # Панель 1: столбцы решено/ошибки
+    top = margin
+    bottom = top + panel_height
+    max_count = max([s + e for s, e in zip(solved, errors)] + [1])
+    step = (width - margin * 2) / len(starts)
+    
+    for i, (s, e) in enumerate(zip(solved, errors)):
+        x0 = margin + i * step
+        x1 = x0 + max(step - 1, 1)
+        solved_top = bottom - s / max_count * panel_height
+        errors_top = solved_top - e / max_count * panel_height
+        if s:
+            draw.rectangle([x0, solved_top, x1, bottom], fill=COLOR_SOLVED)
+        if e:
+            draw.rectangle([x0, errors_top, x1, solved_top], fill=COLOR_ERRORS)
+    
+    draw.line([margin, bottom, width - margin, bottom], fill=(0, 0, 0))
+    draw.text((4, top), str(max_count), fill=(0, 0, 0))
+    
+    # Панель 2: средняя задержка этапов
+    top = bottom + margin
+    bottom = top + panel_height
+    values = [v for line in series['stages'].values() for v in line if v is not None]
+    max_ms = max(values + [1.0])
+    
+    for index, (stage, line) in enumerate(series['stages'].items()):
+        color = STAGE_COLORS[index % len(STAGE_COLORS)]
+        points = [
+            (margin + (i + 0.5) * step, bottom - v / max_ms * panel_height)
+            for i, v in enumerate(line) if v is not None
+        ]
+        if len(points) > 1:
+            draw.line(points, fill=color, width=2)
+        for x, y in points:
+            draw.ellipse([x - 2, y - 2, x + 2, y + 2], fill=color)
+        draw.text((margin + index * 110, top - 14), f"{stage}, ms", fill=color)
+    
+    draw.line([margin, bottom, width - margin, bottom], fill=(0, 0, 0))
+    draw.text((4, top), f"{max_ms:.0f}", fill=(0, 0, 0))
+    
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+class ChartCache:
+    """
+    Кэш готовых графиков по окнам. График перерисовывается при смене
+    текущей корзины или при новых данных, но не чаще PERF_CHART_REFRESH
+    """
+    
+    def __init__(self, path: str = ROLLUPS_FILE):
+        self.path = path
+        self._charts: Dict[str, Tuple[int, float, float, bytes]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, window: str) -> Optional[bytes]:
+        """График окна; перерисовывается только при новой корзине или новых данных"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        
+        now = time.time()
+        bucket_size, _ = ROLLUP_WINDOWS[window]
+        bucket = int(now // bucket_size)
+        
+        with self._lock:
+            cached = self._charts.get(window)
+            if cached:
+                cached_bucket, cached_mtime, rendered_at, chart = cached
+                fresh = cached_mtime == mtime or now - rendered_at < PERF_CHART_REFRESH
+                if cached_bucket == bucket and fresh:
+                    return chart
+        
+        rollups = load_rollups(self.path)
+        if rollups is None:
+            return None
+        
+        chart = render_chart(rollups, window, now)
+        with self._lock:
+            self._charts[window] = (bucket, mtime, now, chart)
+        return chart
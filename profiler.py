@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+🔬 Профилирование цикла решателя (cProfile) на ограниченном окне капч
+"""
+
+import io
+import os
+import glob
+import pstats
+import cProfile
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config import PROFILES_DIR, PROFILE_WINDOW, PROFILE_TOP
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('Profiler')
+
+class SessionProfiler:
+    """
+    Профилирует следующие N капч после включения debug_mode.
+    Следующее окно начинается только после выключения и
+    повторного включения режима отладки
+    """
+    
+    def __init__(self, window: int = PROFILE_WINDOW, directory: str = PROFILES_DIR):
+        self.window = window
+        self.directory = directory
+        self.profile: Optional[cProfile.Profile] = None
+        self.captchas = 0
+        self.started_at: Optional[datetime] = None
+        self.armed = True
+        self.last_summary: Optional[str] = None
+    
+    @property
+    def active(self) -> bool:
+        return self.profile is not None
+    
+    def update(self, debug_mode: bool) -> None:
+        """Синхронизация с настройкой debug_mode"""
+        if debug_mode and self.armed and not self.active:
+            self.start()
+        elif not debug_mode:
+            if self.active:
+                self.stop()
+            self.armed = True
+    
+    def start(self) -> None:
+        """Начать окно профилирования"""
+        self.profile = cProfile.Profile()
+        self.captchas = 0
+        self.started_at = datetime.now()
+        self.armed = False
+        logger.info(f"🔬 Профилирование следующих {self.window} капч")
+    
+    def begin(self) -> None:
+        """Перед обработкой капчи"""
+        if self.profile:
+            self.profile.enable()
+    
+    def end(self) -> None:
+        """После обработки капчи; окно закрывается после N капч"""
+        if not self.profile:
+            return
+        
+        self.profile.disable()
+        self.captchas += 1
+        if self.captchas >= self.window:
+            self.stop()
+    
+    def stop(self) -> Optional[str]:
+        """Завершить окно и записать профиль со сводкой"""
+        if not self.profile:
+            return None
+        
+        profile, self.profile = self.profile, None
+        profile.disable()
+        if self.captchas == 0:
+            return None
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stem = os.path.join(self.directory, f"profile_{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+            base, suffix = stem, 1
+            while os.path.exists(f"{base}.prof"):
+                suffix += 1
+                base = f"{stem}-{suffix}"
+            
+            profile.dump_stats(f"{base}.prof")
+            with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+                f.write(self._summary(profile))
+            
+            self.last_summary = f"{base}.txt"
+            logger.info(f"🔬 Профиль {self.captchas} капч сохранен: {base}.prof")
+            return self.last_summary
+        except Exception as e:
+            logger.error(f"Ошибка сохранения профиля: {e}")
+            return None
+    
+    def _summary(self, profile: cProfile.Profile) -> str:
+        """Топ функций по собственному и накопленному времени"""
+        duration = (datetime.now() - self.started_at).total_seconds()
+        header = (
+            f"Profile: {self.captchas} captchas, "
+            f"{self.started_at.strftime('%Y-%m-%d %H:%M:%S')}, window {duration:.0f}s\n"
+        )
+        
+        sections = [header]
+        for sort_key, title in (('tottime', 'Top by own time'), ('cumulative', 'Top by cumulative time')):
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.strip_dirs().sort_stats(sort_key).print_stats(PROFILE_TOP)
+            
+            # Отбрасываем шапку pstats до таблицы
+            table = stream.getvalue()
+            table = table[table.find('   ncalls'):] if '   ncalls' in table else table
+            sections.append(f"\n== {title} ==\n{table.rstrip()}\n")
+        
+        return ''.join(sections)
+
+def latest_profile(directory: str = PROFILES_DIR) -> Optional[Tuple[str, Optional[str]]]:
+    """Последняя сводка и файл профиля: (путь .txt, путь .prof или None)"""
+    summaries = sorted(glob.glob(os.path.join(directory, "profile_*.txt")))
+    if not summaries:
+        return None
+    
+    summary = summaries[-1]
+    profile = summary[:-len('.txt')] + '.prof'
+    return summary, profile if os.path.exists(profile) else None
@@ -3,14 +3,19 @@
 🎯 Основной решатель капч по фиксированным координатам
 """
 
-import time
+import os
+import copy
 import json
 import random
+import signal
+import asyncio
 import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
-import pyautogui
+import numpy as np
 from PIL import Image
 
 from config import (
@@ -19,10 +24,24 @@ from config import (
     DELAY_TYPING_MIN, DELAY_TYPING_MAX,
     DELAY_CLICK_MIN, DELAY_CLICK_MAX,
     MOUSE_MOVE_DURATION_MIN, MOUSE_MOVE_DURATION_MAX,
-    MOUSE_ACCURACY, DATA_DIR, STATS_FILE
+    MOUSE_ACCURACY, DATA_DIR, STATS_FILE, SETTINGS_FILE,
+    SESSIONS_FILE, SESSIONS_KEEP_IN_MEMORY, SOLVER_EXECUTOR_WORKERS,
+    OUTCOME_POLL_INTERVAL, OUTCOME_TIMEOUT,
+    SLO_CHECK_EVERY, SLO_PAUSE_SECONDS, OCR_POOL_WORKERS
 )
 from image_processor import ImageProcessor
 from mouse_controller import MouseController
+from thumbnail_cache import ThumbnailCache
+from perf_rollups import PerfRollups
+from drift_tracker import DriftTracker
+from profiler import SessionProfiler
+from memory_watchdog import MemoryWatchdog
+from frame_grabber import FrameGrabber
+from outcome_detector import OutcomeDetector, OUTCOMES, append_outcome
+from slo_watchdog import SloWatchdog
+from ocr_pool import OcrPool
+from flight_recorder import FlightRecorder
+from clock import Clock, REAL_CLOCK
 
 # Настройка логирования
 logging.basicConfig(
@@ -38,25 +57,103 @@ logger = logging.getLogger('ScreenSolver')
 class ScreenCaptchaSolver:
     """Основной класс для решения капч"""
     
-    def __init__(self):
+    def __init__(self, notifier=None, clock: Optional[Clock] = None,
+                 image_processor=None, mouse_controller=None, persist: bool = True):
         self.is_running = False
-        self.image_processor = ImageProcessor()
-        self.mouse_controller = MouseController()
+        # Получатель событий прогресса (например, NotificationScheduler)
+        self.notifier = notifier
+        # Часы для всех пауз и замеров (виртуальные в режиме симуляции)
+        self.clock = clock or REAL_CLOCK
+        # persist=False - не писать статистику, агрегаты и скриншоты на диск
+        self.persist = persist
+        # С пулом OCR движки грузятся в рабочих процессах; свой процессор
+        # нужен только профилированию и создается при первом обращении
+        if image_processor is None and not (persist and OCR_POOL_WORKERS > 0):
+            image_processor = ImageProcessor()
+        self._image_processor = image_processor
+        self.mouse_controller = mouse_controller or MouseController(clock=self.clock)
+        # Клавиатура через тот же бэкенд, что и мышь
+        self.input_backend = self.mouse_controller.backend
+        self.thumbnails = ThumbnailCache()
+        self.rollups = PerfRollups()
+        
+        # Длительность этапов и ответ сайта для последней капчи
+        self.stage_timings: Dict[str, float] = {}
+        self.last_verdict: Optional[str] = None
+        self.last_confidence: Optional[float] = None
         
         # Загружаем конфигурацию
         self.coordinates = load_coordinates()
         self.settings = load_settings()
+        self._settings_mtime = self._get_settings_mtime()
+        
+        # Профилирование при включенном debug_mode (настройка меняется из Telegram)
+        self.profiler = SessionProfiler() if persist else None
+        
+        # Отслеживание сдвига окна (работает с тем же словарем координат)
+        self.drift_tracker = None
+        if persist and self.settings.get('drift_tracking', True):
+            self.drift_tracker = DriftTracker(self.coordinates)
+        
+        # Контроль роста памяти в долгих сессиях
+        self.memory_watchdog = None
+        if persist and self.settings.get('memory_watchdog', True):
+            self.memory_watchdog = MemoryWatchdog(clock=self.clock)
+        
+        # Проверка, принял ли сайт ответ (смена капчи или сообщение об ошибке)
+        self.outcome_detector: Optional[OutcomeDetector] = None
+        if persist and self.settings.get('verify_outcome', True):
+            self.outcome_detector = OutcomeDetector()
+        
+        # SLO по скользящему окну: задержка этапов, ошибки, решений в час
+        self.slo_watchdog: Optional[SloWatchdog] = None
+        if self.settings.get('slo_watchdog', True):
+            self.slo_watchdog = SloWatchdog(clock=self.clock)
+        
+        # Бортовой самописец последних циклов (дамп при сбое, сигнале или из Telegram)
+        self.flight_recorder: Optional[FlightRecorder] = None
+        if persist and self.settings.get('flight_recorder', True):
+            self.flight_recorder = FlightRecorder()
+        
+        # Фоновый захват кадров (запускается в run)
+        self.frame_grabber: Optional[FrameGrabber] = None
+        
+        # Процессы OCR с прогретым движком (запускаются в run)
+        self.ocr_pool: Optional[OcrPool] = None
+        
+        # Потоки для скриншота, OCR и ввода (создаются по требованию)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        # Один поток для записи на диск: статистика, скриншоты, агрегаты, дампы.
+        # Цикл событий (с SOLVER_IN_BOT - общий с ботом) их не ждет
+        self.writer: Optional[ThreadPoolExecutor] = None
         
         # Статистика
         self.stats = self._load_stats()
         logger.info("✅ Решатель инициализирован")
     
+    @property
+    def image_processor(self) -> ImageProcessor:
+        """Процессор изображений в этом процессе"""
+        if self._image_processor is None:
+            self._image_processor = ImageProcessor()
+        return self._image_processor
+    
     def _load_stats(self) -> Dict[str, Any]:
         """Загрузка статистики"""
         try:
-            if os.path.exists(STATS_FILE):
+            if self.persist and os.path.exists(STATS_FILE):
                 with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    stats = json.load(f)
+                
+                # Старый формат: вся история в stats.json - переносим в sessions.jsonl
+                sessions = stats.get('sessions', [])
+                if 'sessions_total' not in stats:
+                    if sessions and not os.path.exists(SESSIONS_FILE):
+                        self._append_sessions(sessions)
+                    stats['sessions_total'] = len(sessions)
+                stats['sessions'] = sessions[-SESSIONS_KEEP_IN_MEMORY:]
+                
+                return stats
         except:
             pass
         
@@ -68,99 +165,457 @@ class ScreenCaptchaSolver:
             'last_solution': None,
             'last_error': None,
             'start_time': None,
-            'sessions': []
+            'sessions': [],
+            'sessions_total': 0
         }
     
+    def _append_sessions(self, sessions: list):
+        """Дописать сессии в полную историю на диске (по одной JSON-строке)"""
+        if not self.persist:
+            return
+        
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(SESSIONS_FILE, 'a', encoding='utf-8') as f:
+                for session in sessions:
+                    f.write(json.dumps(session, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.error(f"Ошибка сохранения истории сессий: {e}")
+    
+    async def _check_memory(self):
+        """Замер памяти: сводка в статистику и лог, предупреждение при росте"""
+        # Снимок tracemalloc - в пуле потоков, статистика меняется только в цикле
+        summary = await self._run_blocking(self.memory_watchdog.check)
+        self.stats['memory'] = summary
+        
+        # История в памяти не растет: полная копия в sessions.jsonl
+        self.stats['sessions'] = self.stats.get('sessions', [])[-SESSIONS_KEEP_IN_MEMORY:]
+        
+        if summary['warning']:
+            self._notify('status', f"⚠️ Рост памяти: +{summary['growth_mb']} МБ "
+                                   f"(RSS {summary['rss_mb']} МБ)")
+        self._save_stats_later()
+    
     def _save_stats(self):
         """Сохранение статистики"""
+        if not self.persist:
+            return
+        self._write_stats(self.stats)
+    
+    def _save_stats_later(self):
+        """Сохранение копии статистики в потоке записи"""
+        if not self.persist:
+            return
+        self._write_later(self._write_stats, copy.deepcopy(self.stats))
+    
+    @staticmethod
+    def _write_stats(stats: Dict[str, Any]):
+        """Запись статистики в файл"""
         try:
             os.makedirs(DATA_DIR, exist_ok=True)
             with open(STATS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.stats, f, indent=2, ensure_ascii=False)
+                json.dump(stats, f, indent=2, ensure_ascii=False)
         except Exception as e:
             logger.error(f"Ошибка сохранения статистики: {e}")
     
-    def capture_captcha(self) -> Optional[Image.Image]:
-        """Сделать скриншот области с капчей"""
+    def _get_settings_mtime(self) -> Optional[float]:
+        """Время изменения файла настроек"""
         try:
-            region = self.coordinates['captcha_region']
-            screenshot = pyautogui.screenshot(region=region)
+            return os.path.getmtime(SETTINGS_FILE)
+        except OSError:
+            return None
+    
+    def _refresh_settings(self):
+        """Перечитать настройки, если файл изменился (например, из Telegram)"""
+        if not self.persist:
+            return
+        
+        mtime = self._get_settings_mtime()
+        if mtime == self._settings_mtime:
+            return
+        
+        self._settings_mtime = mtime
+        debug_mode = self.settings.get('debug_mode', False)
+        self.settings = load_settings()
+        
+        if self.settings.get('debug_mode', False) != debug_mode:
+            logger.info(f"🐛 Режим отладки: {'включен' if not debug_mode else 'выключен'}")
+    
+    def _notify(self, kind: str, text: str = ''):
+        """Передать событие в уведомления, не прерывая работу"""
+        if self.notifier is None:
+            return
+        try:
+            self.notifier.notify(kind, text)
+        except Exception as e:
+            logger.debug(f"Ошибка уведомления: {e}")
+    
+    def _grab_region(self, region) -> Optional[np.ndarray]:
+        """Скриншот области (RGB массив)"""
+        try:
+            import pyautogui
+            
+            screenshot = pyautogui.screenshot(region=tuple(region))
             logger.debug(f"Скриншот сделан: {region}")
-            return screenshot
+            return np.asarray(screenshot)
         except Exception as e:
             logger.error(f"Ошибка скриншота: {e}")
             return None
     
-    def solve_one_captcha(self) -> bool:
-        """Решить одну капчу"""
-        logger.info("🔄 Обработка капчи...")
+    def capture_captcha(self) -> Optional[np.ndarray]:
+        """Кадр области с капчей (RGB массив) - сразу вход для предобработки"""
+        # Свежий стабильный кадр из фонового захвата, без ожидания скриншота
+        if self.frame_grabber and self.frame_grabber.running:
+            frame = self.frame_grabber.get_frame()
+            if frame is not None:
+                return frame
+            logger.warning("🎞️ Нет кадра из фонового захвата, делаю скриншот")
         
-        # 1. Скриншот
-        captcha_image = self.capture_captcha()
-        if not captcha_image:
-            logger.error("❌ Не удалось сделать скриншот")
-            self.stats['total_errors'] += 1
-            self.stats['session_errors'] += 1
-            self.stats['last_error'] = 'screenshot_failed'
-            self._save_stats()
-            return False
+        return self._grab_region(self.coordinates['captcha_region'])
+            
+    def capture_result(self) -> Optional[np.ndarray]:
+        """Текущий кадр области капчи после отправки (без ожидания новой капчи)"""
+        if self.frame_grabber and self.frame_grabber.running:
+            frame = self.frame_grabber.latest_frame()
+            if frame is not None:
+                return frame
         
-        # 2. Обработка и распознавание
-        solution = self.image_processor.process_and_recognize(captcha_image)
-        if not solution:
-            logger.warning("⚠️ Не удалось распознать капчу")
-            self.stats['total_errors'] += 1
-            self.stats['session_errors'] += 1
-            self.stats['last_error'] = 'recognition_failed'
+        return self._grab_region(self.coordinates['captcha_region'])
+    
+    def _save_capture(self, path: str, frame: np.ndarray):
+        """Сохранить кадр на диск и поставить превью в очередь"""
+        try:
+            image = Image.fromarray(frame)
+            image.save(path)
+            self.thumbnails.submit(path, image)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения скриншота {path}: {e}")
+    
+    def _record_outcome(self, outcome: str, verdict: Optional[str] = None):
+        """Записать результат, ответ сайта и длительность этапов в агрегаты /perf"""
+        if not self.persist:
+            return
+        self._write_later(self._write_rollups, outcome, dict(self.stage_timings),
+                          self.clock.time(), verdict)
+    
+    def _write_rollups(self, outcome: str, stages: Dict[str, float],
+                       timestamp: float, verdict: Optional[str]):
+        """Запись в агрегаты /perf (файл переписывается целиком)"""
+        try:
+            self.rollups.record(outcome, stages, timestamp, verdict)
+        except Exception as e:
+            logger.error(f"Ошибка записи агрегатов: {e}")
+    
+    def _record_flight(self, frame: Optional[np.ndarray], text: Optional[str], outcome: str):
+        """Записать цикл в самописец"""
+        if self.flight_recorder:
+            self.flight_recorder.record(
+                frame, self.stage_timings, text, self.last_confidence, outcome, self.clock.time()
+            )
+    
+    def _flight_meta(self, **extra) -> Dict[str, Any]:
+        """Состояние сессии для дампа самописца (копия)"""
+        return copy.deepcopy({
+            'session_solved': self.stats.get('session_solved'),
+            'session_errors': self.stats.get('session_errors'),
+            'last_error': self.stats.get('last_error'),
+            'slo': self.stats.get('slo'),
+            'coordinates': self.coordinates,
+            **extra
+        })
+    
+    def dump_flight(self, reason: str, **extra) -> Optional[str]:
+        """Дамп самописца с состоянием сессии; путь к файлу или None"""
+        if not self.flight_recorder:
+            return None
+        return self.flight_recorder.dump(reason, self._flight_meta(**extra))
+    
+    def _dump_flight_later(self, reason: str, **extra):
+        """Дамп самописца в потоке записи (из цикла событий)"""
+        if self.flight_recorder:
+            self._write_later(self.flight_recorder.dump, reason, self._flight_meta(**extra))
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Пул потоков для блокирующих этапов (создается при первом вызове)"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=SOLVER_EXECUTOR_WORKERS, thread_name_prefix='SolverStage'
+            )
+        return self.executor
+    
+    async def _run_blocking(self, func, *args):
+        """
+        Блокирующий вызов (скриншот, OCR, клик) в пуле потоков.
+        При профилировании - в текущем потоке: cProfile видит только его
+        """
+        if self.profiler and self.profiler.active:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+    
+    def _write_later(self, func, *args):
+        """
+        Запись на диск в отдельном потоке, по порядку постановки; аргументы -
+        копии, цикл событий не ждет. При профилировании - в текущем потоке
+        """
+        if self.profiler and self.profiler.active:
+            func(*args)
+            return
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='SolverWriter')
+        self.writer.submit(func, *args)
+    
+    def _on_capture_failed(self) -> bool:
+        """Учет неудачного скриншота"""
+        logger.error("❌ Не удалось сделать скриншот")
+        self.stats['total_errors'] += 1
+        self.stats['session_errors'] += 1
+        self.stats['last_error'] = 'screenshot_failed'
+        self._record_flight(None, None, 'capture_failed')
+        self._save_stats_later()
+        self._record_outcome('errors')
+        self._notify('errors', "❌ Не удалось сделать скриншот")
+        return False
+    
+    def _on_recognition_failed(self, captcha_image: np.ndarray) -> bool:
+        """Учет нераспознанной капчи"""
+        logger.warning("⚠️ Не удалось распознать капчу")
+        self.stats['total_errors'] += 1
+        self.stats['session_errors'] += 1
+        self.stats['last_error'] = 'recognition_failed'
+        
+        # Сохраняем скриншот для отладки
+        if self.persist and self.settings.get('save_screenshots', True):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._write_later(self._save_capture, f"screenshots/error_{timestamp}.png", captcha_image)
+        
+        self._record_flight(captcha_image, None, 'recognition_failed')
+        self._save_stats_later()
+        self._record_outcome('errors')
+        self._notify('errors', "⚠️ Не удалось распознать капчу")
+        return False
+    
+    def _on_solved(self, captcha_image: np.ndarray, solution: str,
+                   verdict: Optional[str] = None, details: Optional[Dict[str, Any]] = None) -> bool:
+        """Учет отправленной капчи; verdict - ответ сайта (None - проверка выключена)"""
+        self.stats['total_solved'] += 1
+        self.stats['session_solved'] += 1
+        self.stats['last_solution'] = solution
+        self.stats['last_error'] = None
+        
+        if verdict:
+            for key in ('outcomes', 'session_outcomes'):
+                # В старой статистике может не быть новых исходов
+                outcomes = self.stats.setdefault(key, dict.fromkeys(OUTCOMES, 0))
+                outcomes[verdict] = outcomes.get(verdict, 0) + 1
+        
+        # Сохраняем скриншот; отклоненный ответ - под своим именем
+        screenshot = None
+        if self.persist and self.settings.get('save_screenshots', True):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            prefix = 'rejected' if verdict == 'rejected' else 'success'
+            screenshot = f"{prefix}_{timestamp}_{solution}.png"
+            self._write_later(self._save_capture, f"screenshots/{screenshot}", captcha_image)
+        
+        if verdict and self.persist:
+            self._write_later(append_outcome, {
+                'time': self.clock.now().isoformat(),
+                'text': solution,
+                'outcome': verdict,
+                'confidence': self.last_confidence,
+                'screenshot': screenshot,
+                **(details or {})
+            })
+        
+        if verdict == 'rejected':
+            logger.warning(f"❌ Сайт отклонил ответ '{solution}'")
+        elif verdict == 'unchanged':
+            logger.warning(f"⚠️ После отправки '{solution}' капча не сменилась")
+        else:
+            logger.info(f"🎯 Капча решена! (#{self.stats['total_solved']})")
+        self._record_flight(captcha_image, solution, verdict or 'submitted')
+        self._save_stats_later()
+        self._record_outcome('solved', verdict)
+        self._notify('solved', f"🎯 {solution}" + (f" ({verdict})" if verdict and verdict != 'accepted' else ''))
+        return True
+    
+    async def _verify_outcome(self, before: np.ndarray) -> Tuple[str, Dict[str, Any]]:
+        """Ожидание реакции сайта после клика: смена капчи или сообщение об ошибке"""
+        # Сообщение об ошибке может быть вне области капчи (result_region в координатах)
+        result_region = self.coordinates.get('result_region')
+        if self.outcome_detector.error_template is None:
+            result_region = None
+        
+        outcome, details = 'unchanged', {}
+        deadline = self.clock.perf_counter() + OUTCOME_TIMEOUT
+        while True:
+            await self.clock.sleep_async(OUTCOME_POLL_INTERVAL, 'verify')
+            after = await self._run_blocking(self.capture_result)
+            if after is None:
+                break
             
-            # Сохраняем скриншот для отладки
-            if self.settings.get('save_screenshots', True):
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                captcha_image.save(f"screenshots/error_{timestamp}.png")
+            result_frame = None
+            if result_region:
+                result_frame = await self._run_blocking(self._grab_region, result_region)
             
-            self._save_stats()
-            return False
-        
-        logger.info(f"📝 Распознано: '{solution}'")
+            outcome, details = self.outcome_detector.classify(before, after, result_frame)
+            if outcome != 'unchanged' or self.clock.perf_counter() >= deadline:
+                break
         
-        # 3. Ввод текста
+        return outcome, details
+    
+    async def _enter_solution(self, solution: str):
+        """Ввод текста и клик по кнопке; паузы между действиями не блокируют цикл"""
         input_coords = self.coordinates['input_coords']
-        self.mouse_controller.click_with_variance(input_coords)
-        time.sleep(random.uniform(0.2, 0.5))
+        await self._run_blocking(self.mouse_controller.click_with_variance, input_coords)
+        await self.clock.sleep_async(random.uniform(0.2, 0.5), 'typing')
         
         # Очистка поля
-        pyautogui.hotkey('ctrl', 'a')
-        time.sleep(random.uniform(0.1, 0.3))
-        pyautogui.press('delete')
-        time.sleep(random.uniform(0.1, 0.3))
+        await self._run_blocking(self.input_backend.hotkey, 'ctrl', 'a')
+        await self.clock.sleep_async(random.uniform(0.1, 0.3), 'typing')
+        await self._run_blocking(self.input_backend.press, 'delete')
+        await self.clock.sleep_async(random.uniform(0.1, 0.3), 'typing')
         
         # Ввод текста
         for char in solution:
-            pyautogui.write(char)
-            time.sleep(random.uniform(DELAY_TYPING_MIN, DELAY_TYPING_MAX))
+            await self._run_blocking(self.input_backend.write, char)
+            await self.clock.sleep_async(random.uniform(DELAY_TYPING_MIN, DELAY_TYPING_MAX), 'typing')
         
-        # 4. Клик по кнопке
+        # Клик по кнопке
         button_coords = self.coordinates['button_coords']
-        self.mouse_controller.click_with_variance(button_coords)
+        await self._run_blocking(self.mouse_controller.click_with_variance, button_coords)
+    
+    async def _recognize(self, captcha_image: np.ndarray) -> Optional[str]:
+        """
+        OCR в пуле процессов, иначе в пуле потоков. При профилировании -
+        в текущем процессе: cProfile не видит рабочие процессы
+        """
+        if self.ocr_pool and not (self.profiler and self.profiler.active):
+            try:
+                result = await asyncio.wrap_future(self.ocr_pool.submit(captcha_image))
+            except Exception as e:
+                logger.error(f"Ошибка пула OCR: {e}")
+                return None
+            self.last_confidence = result['confidence']
+            return result['text']
+        
+        solution = await self._run_blocking(self.image_processor.process_and_recognize, captcha_image)
+        self.last_confidence = getattr(self.image_processor, 'last_confidence', None)
+        return solution
+    
+    async def solve_one_captcha_async(self) -> bool:
+        """Решить одну капчу: скриншот и OCR в пуле потоков"""
+        logger.info("🔄 Обработка капчи...")
+        self.stage_timings = {}
+        self.last_verdict = None
+        self.last_confidence = None
+        
+        # 1. Скриншот
+        started = self.clock.perf_counter()
+        captcha_image = await self._run_blocking(self.capture_captcha)
+        self.stage_timings['capture'] = self.clock.perf_counter() - started
+        if captcha_image is None:
+            return self._on_capture_failed()
+        
+        # 2. Обработка и распознавание
+        started = self.clock.perf_counter()
+        solution = await self._recognize(captcha_image)
+        self.stage_timings['ocr'] = self.clock.perf_counter() - started
+        if not solution:
+            return self._on_recognition_failed(captcha_image)
+        
+        logger.info(f"📝 Распознано: '{solution}'")
+        
+        # 3. Ввод текста и клик по кнопке
+        started = self.clock.perf_counter()
+        await self._enter_solution(solution)
+        self.stage_timings['input'] = self.clock.perf_counter() - started
+        
+        # 4. Ответ сайта: капча сменилась, ошибка или ничего не произошло
+        verdict, details = None, None
+        if self.outcome_detector:
+            started = self.clock.perf_counter()
+            verdict, details = await self._verify_outcome(captcha_image)
+            self.stage_timings['verify'] = self.clock.perf_counter() - started
+            self.last_verdict = verdict
         
         # 5. Обновление статистики
-        self.stats['total_solved'] += 1
-        self.stats['session_solved'] += 1
-        self.stats['last_solution'] = solution
-        self.stats['last_error'] = None
+        return self._on_solved(captcha_image, solution, verdict, details)
+    
+    def _recalibrate(self) -> bool:
+        """Перекалибровка координат по эталонным шаблонам, иначе поиск сдвига окна"""
+        coordinates = None
+        try:
+            from setup_coordinates import auto_calibrate
+            coordinates = auto_calibrate(save=True)
+        except Exception as e:
+            logger.error(f"Ошибка автокалибровки: {e}")
         
-        # Сохраняем успешный скриншот
-        if self.settings.get('save_screenshots', True):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            captcha_image.save(f"screenshots/success_{timestamp}_{solution}.png")
+        if coordinates:
+            # Тот же словарь используют DriftTracker и FrameGrabber
+            self.coordinates.pop('anchor_region', None)
+            self.coordinates.update(coordinates)
+            if self.drift_tracker:
+                self.drift_tracker.anchor = None
+            logger.info(f"🎯 Координаты перекалиброваны: капча {self.coordinates['captcha_region']}")
+            return True
         
-        logger.info(f"🎯 Капча решена! (#{self.stats['total_solved']})")
-        self._save_stats()
+        if self.drift_tracker:
+            return self.drift_tracker.check() is not None
+        return False
+    
+    async def _check_slo(self):
+        """Проверка SLO; при нарушении - сигнал и действие из правила"""
+        events = self.slo_watchdog.evaluate()
+        self.stats['slo'] = self.slo_watchdog.summary()
         
-        return True
+        for event in events:
+            if event['recovered']:
+                logger.info(f"✅ SLO {event['text']}")
+                if self.settings.get('slo_notify', True):
+                    self._notify('status', f"✅ SLO {event['text']}")
+                continue
+            
+            action = event['action']
+            logger.warning(f"🚨 SLO нарушен: {event['text']} (действие: {action})")
+            self._dump_flight_later(f"SLO {event['text']}")
+            if self.settings.get('slo_notify', True):
+                self._notify('status', f"🚨 SLO {event['text']} ({action})")
+            
+            if action == 'pause':
+                logger.warning(f"⏸️ Пауза {SLO_PAUSE_SECONDS:.0f} сек")
+                await self.clock.sleep_async(SLO_PAUSE_SECONDS, 'slo_pause')
+                # Капчи до паузы не должны снова вызвать то же действие
+                self.slo_watchdog.mark()
+            elif action == 'recalibrate':
+                await self._run_blocking(self._recalibrate)
+                self.slo_watchdog.mark()
+            elif action == 'stop':
+                logger.error("🛑 Остановка по SLO")
+                self.is_running = False
     
-    def run(self):
-        """Основной цикл работы"""
+    def solve_one_captcha(self) -> bool:
+        """Решить одну капчу (синхронная обертка)"""
+        try:
+            return asyncio.run(self.solve_one_captcha_async())
+        finally:
+            self._shutdown_executor()
+    
+    def _shutdown_executor(self):
+        """Освободить пул потоков (этап в работе завершится сам) и дописать очередь записи"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
+            self.writer = None
+    
+    def stop(self):
+        """Остановить цикл после текущей капчи или паузы"""
+        self.is_running = False
+    
+    async def run_async(self):
+        """Основной цикл работы; паузы не блокируют цикл событий"""
         print("\n" + "="*60)
         print("🚀 ЗАПУСК АВТОМАТИЧЕСКОГО РЕШАТЕЛЯ")
         print("="*60)
@@ -175,14 +630,57 @@ class ScreenCaptchaSolver:
         print("⚠️  Для остановки нажмите Ctrl+C")
         print("="*60)
         print("\nНачинаю работу через 3 секунды...")
-        time.sleep(3)
-        
         self.is_running = True
-        self.stats['start_time'] = datetime.now().isoformat()
+        # Движки OCR загружаются, пока идет отсчет
+        if self.persist and OCR_POOL_WORKERS > 0:
+            self.ocr_pool = OcrPool(OCR_POOL_WORKERS, save_debug=True,
+                                    size=self.coordinates['captcha_region'][2:])
+            self.ocr_pool.start(wait=False)
+        await self.clock.sleep_async(3, 'startup')
+        
+        self.stats['start_time'] = self.clock.now().isoformat()
+        self.stats['session_outcomes'] = dict.fromkeys(OUTCOMES, 0)
+        if self.slo_watchdog:
+            self.slo_watchdog.start()
+        slo_counter = 0
+        
+        # Опорный шаблон снимаем до первого клика, пока курсор не над кнопкой
+        if self.drift_tracker:
+            await self._run_blocking(self.drift_tracker.init_anchor)
+        if self.memory_watchdog:
+            self.memory_watchdog.start()
+        if self.persist and self.settings.get('capture_thread', False):
+            self.frame_grabber = FrameGrabber(self.coordinates)
+            self.frame_grabber.start()
+        success = None
         
         try:
             while self.is_running:
-                success = self.solve_one_captcha()
+                self._refresh_settings()
+                if self.profiler:
+                    self.profiler.update(self.settings.get('debug_mode', False))
+                    self.profiler.begin()
+                
+                # Проверка сдвига окна каждые N капч или после ошибки
+                if self.drift_tracker and self.drift_tracker.should_check(success):
+                    await self._run_blocking(self.drift_tracker.check)
+                
+                success = await self.solve_one_captcha_async()
+                
+                if self.profiler:
+                    self.profiler.end()
+                
+                if self.memory_watchdog and self.memory_watchdog.due():
+                    await self._check_memory()
+                
+                if self.slo_watchdog:
+                    self.slo_watchdog.record(success, self.stage_timings, self.last_verdict)
+                    slo_counter += 1
+                    if slo_counter % SLO_CHECK_EVERY == 0:
+                        await self._check_slo()
+                
+                if not self.is_running:
+                    break
                 
                 if success:
                     # Случайная пауза между капчами
@@ -196,24 +694,76 @@ class ScreenCaptchaSolver:
                     if self.stats['session_solved'] % 10 == 0:
                         self.show_progress()
                     
-                    time.sleep(delay)
+                    await self.clock.sleep_async(delay, 'between_captchas')
                 else:
                     logger.warning("⏳ Ожидание 10 сек после ошибки...")
-                    time.sleep(10)
+                    await self.clock.sleep_async(10, 'error_backoff')
                 
                 # Остановка после слишком многих ошибок
                 if self.stats['session_errors'] > self.settings.get('max_errors_before_stop', 10):
                     logger.error(f"⚠️ Слишком много ошибок ({self.stats['session_errors']}). Остановка.")
+                    self._dump_flight_later("слишком много ошибок")
                     break
-                    
-        except KeyboardInterrupt:
+        
+        except asyncio.CancelledError:
+            # Ctrl+C в asyncio.run или отмена задачи из бота
             logger.info("\n🛑 Остановка по запросу пользователя")
+            raise
         except Exception as e:
             logger.error(f"❌ Критическая ошибка: {e}")
+            self._dump_flight_later(f"исключение: {e!r}", traceback=traceback.format_exc())
         finally:
             self.is_running = False
+            if self.frame_grabber:
+                self.frame_grabber.stop()
+            if self.ocr_pool:
+                self.ocr_pool.stop()
+                self.ocr_pool = None
+            self._shutdown_executor()
+            # Незавершенное окно профилирования сохраняем как есть
+            if self.profiler:
+                self.profiler.stop()
+            if self.memory_watchdog:
+                self.stats['memory'] = self.memory_watchdog.check()
+                self.memory_watchdog.stop()
             self.show_final_stats()
     
+    def _install_signal_handlers(self) -> Dict[int, Any]:
+        """
+        SIGUSR1 - дамп самописца без остановки; SIGTERM - дамп и обычное
+        завершение. Возвращает прежние обработчики
+        """
+        previous = {}
+        if not self.flight_recorder:
+            return previous
+        
+        def on_signal(signum, frame):
+            self.dump_flight(f"сигнал {signal.Signals(signum).name}")
+            if signum == signal.SIGTERM:
+                signal.signal(signum, previous[signum])
+                os.kill(os.getpid(), signum)
+        
+        for name in ('SIGUSR1', 'SIGTERM'):
+            signum = getattr(signal, name, None)
+            if signum is None:
+                continue   # Windows: SIGUSR1 нет
+            try:
+                previous[signum] = signal.signal(signum, on_signal) or signal.SIG_DFL
+            except ValueError:
+                break      # Не главный поток
+        return previous
+    
+    def run(self):
+        """Основной цикл работы (синхронная обертка над run_async)"""
+        previous = self._install_signal_handlers()
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+    
     def show_progress(self):
         """Показать прогресс"""
         print("\n" + "="*40)
@@ -221,6 +771,8 @@ class ScreenCaptchaSolver:
         print("="*40)
         print(f"Решено в этой сессии: {self.stats['session_solved']}")
         print(f"Ошибок в этой сессии: {self.stats['session_errors']}")
+        if self.outcome_detector:
+            print(f"Принято сайтом: {self.stats.get('session_outcomes', {}).get('accepted', 0)}")
         print(f"Всего решено: {self.stats['total_solved']}")
         print(f"Последнее решение: {self.stats.get('last_solution', 'нет')}")
         print("="*40)
@@ -234,13 +786,16 @@ class ScreenCaptchaSolver:
         if self.stats['start_time']:
             try:
                 start = datetime.fromisoformat(self.stats['start_time'])
-                duration = datetime.now() - start
+                duration = self.clock.now() - start
                 hours = duration.total_seconds() / 3600
                 
                 print(f"Время работы: {hours:.2f} часов")
                 if hours > 0:
                     captchas_per_hour = self.stats['session_solved'] / hours
                     print(f"Скорость: {captchas_per_hour:.1f} капч/час")
+                    if self.outcome_detector:
+                        accepted = self.stats.get('session_outcomes', {}).get('accepted', 0)
+                        print(f"Принято сайтом: {accepted / hours:.1f} капч/час")
             except:
                 pass
         
@@ -249,6 +804,13 @@ class ScreenCaptchaSolver:
         print(f"Всего решено: {self.stats['total_solved']}")
         print(f"Всего ошибок: {self.stats['total_errors']}")
         
+        session_outcomes = self.stats.get('session_outcomes', {})
+        if any(session_outcomes.values()):
+            print(f"Ответ сайта: принято {session_outcomes.get('accepted', 0)}, "
+                  f"отклонено {session_outcomes.get('rejected', 0)}, "
+                  f"капча сменилась {session_outcomes.get('changed', 0)}, "
+                  f"без изменений {session_outcomes.get('unchanged', 0)}")
+        
         if self.stats['session_solved'] > 0:
             success_rate = self.stats['session_solved'] / (
                 self.stats['session_solved'] + self.stats['session_errors']
@@ -265,18 +827,20 @@ class ScreenCaptchaSolver:
         try:
             session_data = {
                 'start_time': self.stats['start_time'],
-                'end_time': datetime.now().isoformat(),
+                'end_time': self.clock.now().isoformat(),
                 'solved': self.stats['session_solved'],
                 'errors': self.stats['session_errors'],
+                'outcomes': self.stats.get('session_outcomes', {}),
                 'last_solution': self.stats['last_solution']
             }
             
-            if 'sessions' not in self.stats:
-                self.stats['sessions'] = []
-            
-            self.stats['sessions'].append(session_data)
+            # Полная история - в sessions.jsonl, в памяти только последние
+            self._append_sessions([session_data])
+            sessions = self.stats.get('sessions', []) + [session_data]
+            self.stats['sessions'] = sessions[-SESSIONS_KEEP_IN_MEMORY:]
+            self.stats['sessions_total'] = self.stats.get('sessions_total', 0) + 1
             self._save_stats()
-            
+        
         except Exception as e:
             logger.error(f"Ошибка сохранения сессии: {e}")
 
@@ -291,6 +855,5 @@ def load_stats() -> Optional[Dict[str, Any]]:
     return None
 
 if __name__ == "__main__":
-    import os
     solver = ScreenCaptchaSolver()
     solver.run()
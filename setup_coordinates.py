@@ -3,16 +3,32 @@
 🛠️ Утилита для настройки координат областей капчи
 """
 
+import sys
 import time
 import json
 import pyautogui
 from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from PIL import Image
 
 from config import (
     save_coordinates, load_coordinates,
-    DATA_DIR, COORDINATES_FILE
+    DATA_DIR, COORDINATES_FILE,
+    TEMPLATE_PATCH_SIZE, CALIBRATION_MIN_SCORE
+)
+from template_matcher import (
+    find_template, load_templates, save_template, update_templates_meta, to_gray
 )
 
+# Шаблон -> ключ в coordinates.json
+TEMPLATE_KEYS = {
+    'captcha': 'captcha_region',
+    'input': 'input_coords',
+    'button': 'button_coords'
+}
+
 def print_header():
     """Вывод заголовка"""
     print("="*60)
@@ -138,6 +154,11 @@ def setup_coordinates_interactive():
                 # Показываем где файл
                 print(f"\n📁 Файл: {COORDINATES_FILE}")
                 
+                # Шаблоны для последующей автокалибровки
+                templates_choice = input("\nСохранить эталонные шаблоны для автокалибровки? (y/n): ").lower()
+                if templates_choice == 'y':
+                    save_reference_templates(coordinates)
+                
                 # Тестовый запуск
                 test_choice = input("\nЗапустить тест координат? (y/n): ").lower()
                 if test_choice == 'y':
@@ -211,6 +232,137 @@ def test_coordinates(coordinates: dict):
     except Exception as e:
         print(f"❌ Ошибка теста: {e}")
 
+def _grab_screen(screenshot_path: Optional[str] = None) -> np.ndarray:
+    """Полный экран (один снимок) или сохраненный скриншот в grayscale"""
+    if screenshot_path:
+        return to_gray(Image.open(screenshot_path))
+    return to_gray(pyautogui.screenshot())
+
+def save_reference_templates(coordinates: Optional[dict] = None,
+                             screenshot_path: Optional[str] = None) -> bool:
+    """Сохранение эталонных шаблонов капчи, поля ввода и кнопки по текущим координатам"""
+    coordinates = coordinates or load_coordinates()
+    screen = _grab_screen(screenshot_path)
+    screen_height, screen_width = screen.shape[:2]
+    
+    # Область капчи - шаблон целиком
+    x, y, width, height = coordinates['captcha_region']
+    ok = save_template('captcha', screen[y:y + height, x:x + width], {'region': [0, 0, width, height]})
+    
+    # Поле ввода и кнопка - фрагмент вокруг точки клика
+    for name in ('input', 'button'):
+        point_x, point_y = coordinates[TEMPLATE_KEYS[name]]
+        patch_width, patch_height = TEMPLATE_PATCH_SIZE[name]
+        
+        left = max(0, min(point_x - patch_width // 2, screen_width - patch_width))
+        top = max(0, min(point_y - patch_height // 2, screen_height - patch_height))
+        patch = screen[top:top + patch_height, left:left + patch_width]
+        
+        ok &= save_template(name, patch, {'point': [point_x - left, point_y - top]})
+    
+    # Раскладка на момент сохранения - для элементов, которые не найдутся
+    ok &= update_templates_meta({
+        'layout': {key: list(coordinates[key]) for key in TEMPLATE_KEYS.values()},
+        'screen_size': [screen_width, screen_height],
+        'created_at': datetime.now().isoformat()
+    })
+    
+    if ok:
+        print("✅ Эталонные шаблоны сохранены")
+    return ok
+
+def auto_calibrate(screenshot_path: Optional[str] = None, save: bool = True) -> Optional[dict]:
+    """
+    Автоматическая калибровка: один снимок экрана, поиск шаблонов
+    на уменьшенной копии, уточнение в полном разрешении
+    """
+    templates, meta = load_templates()
+    if not templates:
+        print("❌ Эталонные шаблоны не найдены. Сначала сохраните их (пункт 6 меню)")
+        return None
+    
+    started = time.perf_counter()
+    screen = _grab_screen(screenshot_path)
+    captured = time.perf_counter()
+    
+    matches = {}
+    for name, template in templates.items():
+        match = find_template(screen, template)
+        if match and match.score >= CALIBRATION_MIN_SCORE:
+            matches[name] = match
+        else:
+            score = f"{match.score:.2f}" if match else "нет"
+            print(f"⚠️ Шаблон '{name}' не найден (схожесть {score})")
+    
+    elapsed = time.perf_counter() - started
+    print(f"⏱️ Снимок: {(captured - started) * 1000:.0f} мс, "
+          f"поиск: {(elapsed - (captured - started)) * 1000:.0f} мс")
+    
+    if not matches:
+        print("❌ Ни один шаблон не найден")
+        return None
+    
+    coordinates = load_coordinates()
+    info = meta.get('templates', {})
+    
+    if 'captcha' in matches:
+        match = matches['captcha']
+        dx, dy, width, height = info['captcha']['region']
+        coordinates['captcha_region'] = (
+            match.x + int(round(dx * match.scale)),
+            match.y + int(round(dy * match.scale)),
+            int(round(width * match.scale)),
+            int(round(height * match.scale))
+        )
+    
+    for name in ('input', 'button'):
+        key = TEMPLATE_KEYS[name]
+        if name in matches:
+            match = matches[name]
+            dx, dy = info[name]['point']
+            coordinates[key] = (
+                match.x + int(round(dx * match.scale)),
+                match.y + int(round(dy * match.scale))
+            )
+    
+    # Элементы без совпадения переносим по раскладке вместе с найденным
+    missing = [name for name in templates if name not in matches]
+    if missing and 'layout' in meta:
+        found = max(matches, key=lambda name: matches[name].score)
+        scale = matches[found].scale
+        anchor_old = meta['layout'][TEMPLATE_KEYS[found]]
+        anchor_new = coordinates[TEMPLATE_KEYS[found]]
+        
+        for name in missing:
+            key = TEMPLATE_KEYS[name]
+            old = meta['layout'][key]
+            coordinates[key] = (
+                anchor_new[0] + int(round((old[0] - anchor_old[0]) * scale)),
+                anchor_new[1] + int(round((old[1] - anchor_old[1]) * scale)),
+                *[int(round(size * scale)) for size in old[2:]]
+            )
+            print(f"↪️ '{name}' рассчитан по раскладке относительно '{found}'")
+    
+    screen_height, screen_width = screen.shape[:2]
+    coordinates['screen_size'] = (screen_width, screen_height)
+    # Опорный фрагмент отслеживания сдвига будет снят заново
+    coordinates.pop('anchor_region', None)
+    
+    print(f"\n📊 Найденные координаты:")
+    print(f"  Капча:      {coordinates['captcha_region']}")
+    print(f"  Поле ввода: {coordinates['input_coords']}")
+    print(f"  Кнопка:     {coordinates['button_coords']}")
+    for name, match in matches.items():
+        print(f"  {name}: схожесть {match.score:.3f}, масштаб {match.scale}")
+    
+    if save:
+        if save_coordinates(coordinates):
+            print("✅ Координаты сохранены!")
+        else:
+            print("❌ Ошибка сохранения координат")
+    
+    return coordinates
+
 def view_current_coordinates():
     """Просмотр текущих координат"""
     print("\n" + "="*60)
@@ -296,6 +448,7 @@ def edit_coordinates_manually():
             print("❌ Неверный формат")
     
     if choice in ["1", "2", "3"]:
+        current.pop('anchor_region', None)
         save_coordinates(current)
         print("✅ Координаты сохранены")
 
@@ -312,9 +465,11 @@ def main():
         print("3. ✏️  Ручное редактирование координат")
         print("4. 🧪 Тестирование текущих координат")
         print("5. 📋 Экспорт координат в Python код")
+        print("6. 🖼️ Сохранить эталонные шаблоны")
+        print("7. 🤖 Автокалибровка по шаблонам")
         print("0. 🚪 Выход")
         
-        choice = input("\nВаш выбор (0-5): ").strip()
+        choice = input("\nВаш выбор (0-7): ").strip()
         
         if choice == "1":
             setup_coordinates_interactive()
@@ -351,6 +506,14 @@ def main():
             else:
                 print("❌ Сначала настройте координаты")
                 
+        elif choice == "6":
+            print("\nПодготовьте окно с капчей так, как при настройке координат")
+            input("Нажмите Enter когда готовы...")
+            save_reference_templates()
+        
+        elif choice == "7":
+            auto_calibrate()
+        
         elif choice == "0":
             print("\n👋 До свидания!")
             break
@@ -360,7 +523,12 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        if "--auto" in sys.argv:
+            # python3 setup_coordinates.py --auto [скриншот.png]
+            args = sys.argv[sys.argv.index("--auto") + 1:]
+            auto_calibrate(args[0] if args else None)
+        else:
+            main()
     except KeyboardInterrupt:
         print("\n\n🛑 Отменено пользователем")
     except Exception as e:
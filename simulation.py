@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+🧪 Симуляция решателя на виртуальных часах: сценарий скриншотов и OCR
+"""
+
+import io
+import sys
+import time
+import random
+import logging
+import contextlib
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from clock import VirtualClock
+from input_backend import NullBackend
+from mouse_controller import MouseController
+from screen_solver import ScreenCaptchaSolver
+from outcome_detector import OutcomeDetector
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('Simulation')
+
+# Логгеры, которые на тысячах капч только замедляют прогон
+QUIET_LOGGERS = ['ScreenSolver', 'MouseController', 'ImageProcessor', 'InputBackend']
+
+class ScriptedOutcome:
+    """Исход одной капчи в сценарии"""
+    
+    def __init__(self, text: Optional[str], capture_ok: bool = True,
+                 capture_time: float = 0.05, ocr_time: float = 0.3,
+                 accepted: bool = True):
+        self.text = text
+        self.capture_ok = capture_ok
+        self.accepted = accepted    # Сайт принял ответ (иначе капча не меняется)
+        self.capture_time = capture_time
+        self.ocr_time = ocr_time
+
+def random_script(count: int, success_rate: float = 0.9, capture_fail_rate: float = 0.0,
+                  capture_time: float = 0.05, ocr_time: float = 0.3,
+                  accept_rate: float = 1.0, seed: Optional[int] = None) -> List[ScriptedOutcome]:
+    """Случайный сценарий с заданной долей успешных распознаваний и принятых ответов"""
+    rng = random.Random(seed)
+    alphabet = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+    script = []
+    
+    for _ in range(count):
+        capture_ok = rng.random() >= capture_fail_rate
+        text = None
+        if rng.random() < success_rate:
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 6)))
+        script.append(ScriptedOutcome(
+            text, capture_ok,
+            capture_time=rng.uniform(capture_time * 0.5, capture_time * 1.5),
+            ocr_time=rng.uniform(ocr_time * 0.5, ocr_time * 1.5),
+            accepted=rng.random() < accept_rate
+        ))
+    
+    return script
+
+class ScriptedProcessor:
+    """Замена ImageProcessor: результат распознавания берется из сценария"""
+    
+    def __init__(self, solver: 'SimulatedSolver'):
+        self.solver = solver
+    
+    def process_and_recognize(self, image: np.ndarray) -> Optional[str]:
+        outcome = self.solver.current
+        self.solver.clock.advance(outcome.ocr_time, 'ocr')
+        return outcome.text
+
+class SimulatedSolver(ScreenCaptchaSolver):
+    """Решатель с фейковыми скриншотом, OCR и вводом на виртуальных часах"""
+    
+    def __init__(self, script: List[ScriptedOutcome], clock: VirtualClock,
+                 max_errors: Optional[int] = None):
+        self.script = script
+        self.index = 0
+        self.current: Optional[ScriptedOutcome] = None
+        self.recalibrations = 0
+        self.frame = np.full((141, 545, 3), 255, dtype=np.uint8)
+        self.next_frame = np.zeros_like(self.frame)  # Следующая капча после принятого ответа
+        
+        super().__init__(
+            clock=clock,
+            image_processor=ScriptedProcessor(self),
+            mouse_controller=MouseController(backend=NullBackend(clock=clock), clock=clock),
+            persist=False
+        )
+        
+        # Проверка ответа сайта без шаблона ошибки: сценарный сайт меняет
+        # капчу только после верного ответа
+        self.outcome_detector = OutcomeDetector(template_path=None, change_means_accepted=True)
+        
+        # Порог ошибок: по умолчанию из настроек, как в реальном запуске
+        if max_errors is not None:
+            self.settings['max_errors_before_stop'] = max_errors
+    
+    def capture_captcha(self) -> Optional[np.ndarray]:
+        self.current = self.script[self.index]
+        self.index += 1
+        self.clock.advance(self.current.capture_time, 'capture')
+        return self.frame if self.current.capture_ok else None
+    
+    def _recalibrate(self) -> bool:
+        # Экрана нет: перекалибровка по SLO только учитывается
+        self.recalibrations += 1
+        return False
+    
+    def capture_result(self) -> Optional[np.ndarray]:
+        self.clock.advance(self.current.capture_time, 'capture')
+        return self.next_frame if self.current.accepted else self.frame
+    
+    async def solve_one_captcha_async(self) -> bool:
+        result = await super().solve_one_captcha_async()
+        if self.index >= len(self.script):
+            self.is_running = False
+        return result
+
+def run_simulation(script: List[ScriptedOutcome], max_errors: Optional[int] = None,
+                   verbose: bool = True) -> Dict[str, Any]:
+    """Прогон сценария через настоящий цикл ScreenCaptchaSolver.run"""
+    clock = VirtualClock()
+    
+    levels = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    started = time.perf_counter()
+    try:
+        solver = SimulatedSolver(script, clock, max_errors)
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.run()
+    finally:
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+    real_elapsed = time.perf_counter() - started
+    
+    hours = clock.elapsed / 3600
+    stats = solver.stats
+    report = {
+        'captchas': solver.index,
+        'solved': stats['session_solved'],
+        'errors': stats['session_errors'],
+        'stopped_early': solver.index < len(script),
+        'virtual_seconds': clock.elapsed,
+        'real_seconds': real_elapsed,
+        'captchas_per_hour': stats['session_solved'] / hours if hours else 0.0,
+        'attempts_per_hour': solver.index / hours if hours else 0.0,
+        'outcomes': dict(stats.get('session_outcomes', {})),
+        'recalibrations': solver.recalibrations,
+        'accepted_per_hour': stats.get('session_outcomes', {}).get('accepted', 0) / hours if hours else 0.0,
+        'idle': dict(clock.idle),
+        'work': dict(clock.work)
+    }
+    
+    if verbose:
+        print_report(report)
+    
+    return report
+
+def print_report(report: Dict[str, Any]):
+    """Вывод отчета симуляции"""
+    print("\n" + "="*60)
+    print("🧪 ОТЧЕТ СИМУЛЯЦИИ")
+    print("="*60)
+    print(f"Капч обработано: {report['captchas']}"
+          f"{' (остановка по ошибкам)' if report['stopped_early'] else ''}")
+    print(f"Решено: {report['solved']}, ошибок: {report['errors']}")
+    print(f"Виртуальное время: {report['virtual_seconds'] / 3600:.2f} ч, "
+          f"реальное: {report['real_seconds']:.2f} сек")
+    print(f"Скорость: {report['captchas_per_hour']:.1f} капч/час "
+          f"({report['attempts_per_hour']:.1f} попыток/час)")
+    outcomes = report['outcomes']
+    print(f"Ответ сайта: принято {outcomes.get('accepted', 0)}, "
+          f"отклонено {outcomes.get('rejected', 0)}, без изменений {outcomes.get('unchanged', 0)} "
+          f"({report['accepted_per_hour']:.1f} принятых/час)")
+    if report['recalibrations']:
+        print(f"Перекалибровок по SLO: {report['recalibrations']}")
+    
+    total = report['virtual_seconds'] or 1.0
+    print("\n⏳ Простой по категориям:")
+    for category, seconds in sorted(report['idle'].items(), key=lambda item: -item[1]):
+        print(f"  {category:<18}{seconds:>10.1f} сек  {seconds / total * 100:>5.1f}%")
+    
+    print("\n⚙️ Работа по категориям:")
+    for category, seconds in sorted(report['work'].items(), key=lambda item: -item[1]):
+        print(f"  {category:<18}{seconds:>10.1f} сек  {seconds / total * 100:>5.1f}%")
+    
+    print("="*60)
+
+if __name__ == "__main__":
+    # python3 simulation.py [количество] [доля успешных] [доля принятых сайтом]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    success_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.95
+    accept_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.9
+    run_simulation(random_script(count, success_rate, accept_rate=accept_rate, seed=0),
+                   max_errors=count)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+🚨 Контроль SLO в скользящем окне: задержка этапов, доля ошибок, решений в час
+"""
+
+import logging
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
+from config import (
+    SLO_RULES, SLO_WINDOW, SLO_MIN_SAMPLES, SLO_MIN_SPAN, SLO_ALERT_COOLDOWN
+)
+from clock import Clock, REAL_CLOCK
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('SloWatchdog')
+
+class SloWatchdog:
+    """
+    Хранит исходы капч за последние SLO_WINDOW секунд и проверяет
+    правила SLO. Срабатывание правила возвращается один раз при
+    нарушении и повторяется не чаще cooldown, пока нарушение длится;
+    возврат в норму возвращается отдельным событием. После действия
+    (пауза, перекалибровка) окно начинается заново: mark()
+    """
+    
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None,
+                 window: float = SLO_WINDOW, min_samples: int = SLO_MIN_SAMPLES,
+                 min_span: float = SLO_MIN_SPAN, cooldown: float = SLO_ALERT_COOLDOWN,
+                 clock: Optional[Clock] = None):
+        self.rules = SLO_RULES if rules is None else rules
+        self.window = window
+        self.min_samples = min_samples
+        self.min_span = min_span
+        self.cooldown = cooldown
+        self.clock = clock or REAL_CLOCK
+        
+        # (время, успех, ответ сайта, длительности этапов)
+        self.events: deque = deque()
+        self.started: Optional[float] = None
+        self.breached: Dict[str, float] = {}   # Правило -> время последнего срабатывания
+    
+    def start(self) -> None:
+        """Начало сессии: окно и состояние правил сбрасываются"""
+        self.events.clear()
+        self.breached.clear()
+        self.started = self.clock.time()
+    
+    def mark(self) -> None:
+        """
+        Окно после действия по правилу: капчи до него не учитываются,
+        иначе то же нарушение сработало бы снова через cooldown.
+        Состояние правил сохраняется
+        """
+        self.events.clear()
+        self.started = self.clock.time()
+    
+    def record(self, success: bool, stages: Dict[str, float],
+               verdict: Optional[str] = None) -> None:
+        """Учесть одну капчу"""
+        now = self.clock.time()
+        if self.started is None:
+            self.started = now
+        self.events.append((now, success, verdict, dict(stages)))
+        self._prune(now)
+    
+    def _prune(self, now: float) -> None:
+        """Удалить события, вышедшие из окна"""
+        while self.events and self.events[0][0] < now - self.window:
+            self.events.popleft()
+    
+    def metric(self, name: str, verdicts: Tuple[str, ...] = ('rejected',)) -> Optional[float]:
+        """
+        Значение метрики по окну (None - данных недостаточно). verdicts -
+        ответы сайта, которые reject_rate считает отказом
+        """
+        now = self.clock.time()
+        self._prune(now)
+        if len(self.events) < self.min_samples:
+            return None
+        
+        if name.startswith('latency_p95:'):
+            stage = name.split(':', 1)[1]
+            values = [stages[stage] for _, _, _, stages in self.events if stage in stages]
+            if len(values) < self.min_samples:
+                return None
+            return float(np.percentile(values, 95))
+        
+        if name == 'error_rate':
+            errors = sum(1 for _, success, _, _ in self.events if not success)
+            return errors / len(self.events)
+        
+        if name == 'reject_rate':
+            rejected = verdicts
+            verdicts = [verdict for _, _, verdict, _ in self.events if verdict]
+            if len(verdicts) < self.min_samples:
+                return None
+            return sum(1 for verdict in verdicts if verdict in rejected) / len(verdicts)
+        
+        if name == 'solves_per_hour':
+            span = min(self.window, now - self.started)
+            if span < self.min_span:
+                return None
+            # Принятые сайтом ответы, если проверка включена, иначе отправленные;
+            # смена капчи без шаблона ошибки ('changed') - тоже решение
+            solved = sum(
+                1 for _, success, verdict, _ in self.events
+                if success and verdict in (None, 'accepted', 'changed')
+            )
+            return solved / (span / 3600)
+        
+        logger.warning(f"Неизвестная метрика SLO: {name}")
+        return None
+    
+    def _rule_value(self, rule: Dict[str, Any]) -> Optional[float]:
+        """Метрика правила с его списком отказов"""
+        return self.metric(rule['metric'], tuple(rule.get('verdicts', ('rejected',))))
+    
+    def metrics(self) -> Dict[str, Optional[float]]:
+        """Текущие значения всех метрик из правил"""
+        return {rule['metric']: self._rule_value(rule) for rule in self.rules}
+    
+    def evaluate(self) -> List[Dict[str, Any]]:
+        """
+        Проверка правил. Возвращает события: нарушение (с действием)
+        или возврат в норму (recovered=True)
+        """
+        now = self.clock.time()
+        events = []
+        
+        for rule in self.rules:
+            value = self._rule_value(rule)
+            if value is None:
+                continue
+            
+            if 'max' in rule:
+                violated, limit, sign = value > rule['max'], rule['max'], '>'
+            else:
+                violated, limit, sign = value < rule['min'], rule['min'], '<'
+            
+            name = rule['name']
+            if violated:
+                last = self.breached.get(name)
+                if last is not None and now - last < self.cooldown:
+                    continue
+                self.breached[name] = now
+                events.append({
+                    'rule': name,
+                    'metric': rule['metric'],
+                    'value': value,
+                    'action': rule.get('action', 'alert'),
+                    'recovered': False,
+                    'text': f"{name}: {rule['metric']} = {value:.2f} {sign} {limit}"
+                })
+            elif name in self.breached:
+                del self.breached[name]
+                events.append({
+                    'rule': name,
+                    'metric': rule['metric'],
+                    'value': value,
+                    'action': None,
+                    'recovered': True,
+                    'text': f"{name}: {rule['metric']} = {value:.2f}, в норме"
+                })
+        
+        return events
+    
+    def summary(self) -> Dict[str, Any]:
+        """Сводка для stats['slo']"""
+        return {
+            'checked_at': self.clock.now().isoformat(),
+            'samples': len(self.events),
+            'metrics': {
+                name: round(value, 3) if value is not None else None
+                for name, value in self.metrics().items()
+            },
+            'breached': sorted(self.breached)
+        }
@@ -4,12 +4,24 @@
 """
 
 import os
+import sys
 import json
+import time
+import asyncio
 import logging
+import secrets
+import importlib.util
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Union, Callable, Tuple
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import RetryAfter, BadRequest, TelegramError
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler,
     ContextTypes
@@ -17,8 +29,20 @@ from telegram.ext import (
 
 from config import (
     load_coordinates, load_settings, save_settings,
-    print_config_summary, DATA_DIR, STATS_FILE
+    print_config_summary, DATA_DIR, STATS_FILE,
+    TELEGRAM_CHAT_ID, NOTIFY_DIGEST_INTERVAL, NOTIFY_DIGEST_INTERVAL_MAX,
+    NOTIFY_CHAT_RATE, NOTIFY_CHAT_BURST,
+    NOTIFY_GLOBAL_RATE, NOTIFY_GLOBAL_BURST,
+    NOTIFY_MAX_BACKLOG, NOTIFY_DIGEST_LINES,
+    TELEGRAM_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT,
+    WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_SECRET_FILE, TELEGRAM_CONCURRENT_UPDATES,
+    GALLERY_DEFAULT_COUNT, GALLERY_MAX_COUNT, PROFILE_WINDOW,
+    SOLVER_IN_BOT
 )
+from thumbnail_cache import ThumbnailCache, list_captures
+from perf_rollups import ChartCache
+from profiler import latest_profile
+from flight_recorder import latest_dump, load_dump
 
 # Настройка логирования
 logging.basicConfig(
@@ -34,42 +58,271 @@ logger = logging.getLogger('TelegramManager')
 # Получаем токен из переменных окружения
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
 
+class TokenBucket:
+    """Token bucket для соблюдения лимитов Telegram API"""
+    
+    def __init__(self, rate: float, capacity: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+    
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Забрать токены, если они есть"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+    
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Сколько секунд ждать до появления токенов"""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+# Общий лимит на все чаты бота
+GLOBAL_BUCKET = TokenBucket(NOTIFY_GLOBAL_RATE, NOTIFY_GLOBAL_BURST)
+
+
+class NotificationScheduler:
+    """
+    Планировщик уведомлений: объединяет события в дайджест и
+    редактирует одно закрепленное статусное сообщение
+    """
+    
+    def __init__(self, bot, chat_id, interval: float = NOTIFY_DIGEST_INTERVAL,
+                 global_bucket: Optional[TokenBucket] = None,
+                 max_backlog: int = NOTIFY_MAX_BACKLOG,
+                 clock: Callable[[], float] = time.monotonic):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.base_interval = interval
+        self.interval = interval
+        self.max_backlog = max_backlog
+        self.chat_bucket = TokenBucket(NOTIFY_CHAT_RATE, NOTIFY_CHAT_BURST, clock)
+        self.global_bucket = global_bucket or GLOBAL_BUCKET
+        
+        self.status_message_id: Optional[int] = None
+        self.counters = {'solved': 0, 'errors': 0}
+        self.dropped = 0
+        self.sent = 0
+        self.edited = 0
+        
+        self._events: deque = deque()
+        # События последнего дайджеста до подтверждения отправки
+        self._unsent: list = []
+        self._unsent_dropped = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = asyncio.Event()
+    
+    def notify(self, kind: str, text: str = '') -> None:
+        """Добавить событие (потокобезопасно, не блокирует решатель)"""
+        with self._lock:
+            if kind in self.counters:
+                self.counters[kind] += 1
+            
+            if text:
+                self._events.append((datetime.now().strftime('%H:%M:%S'), text))
+                # При отставании выбрасываем самые старые строки,
+                # счетчики при этом остаются точными
+                while len(self._events) > self.max_backlog:
+                    self._events.popleft()
+                    self.dropped += 1
+            
+            self._dirty = True
+    
+    def build_digest(self) -> Optional[str]:
+        """Собрать текст статусного сообщения"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            
+            lines = [
+                "🤖 CAPTCHA AUTO BOT - СТАТУС",
+                f"✅ Решено: {self.counters['solved']}",
+                f"❌ Ошибок: {self.counters['errors']}",
+            ]
+            
+            recent = list(self._events)[-NOTIFY_DIGEST_LINES:]
+            skipped = len(self._events) - len(recent) + self.dropped
+            if recent:
+                lines.append("")
+                lines.extend(f"{ts} {text}" for ts, text in recent)
+            if skipped:
+                lines.append(f"… и еще {skipped} событий")
+            
+            lines.append("")
+            lines.append(f"Обновлено: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            
+            self._unsent = list(self._events)
+            self._unsent_dropped = self.dropped
+            self._events.clear()
+            self.dropped = 0
+            self._dirty = False
+            
+            return "\n".join(lines)
+    
+    def _requeue(self) -> None:
+        """Вернуть события недоставленного дайджеста перед новыми"""
+        with self._lock:
+            events = self._unsent + list(self._events)
+            self.dropped += self._unsent_dropped
+            overflow = max(0, len(events) - self.max_backlog)
+            self._events = deque(events[overflow:])
+            self.dropped += overflow
+            self._unsent = []
+            self._unsent_dropped = 0
+            self._dirty = True
+    
+    async def flush(self) -> bool:
+        """Отправить дайджест, если позволяют лимиты"""
+        if not self._dirty:
+            return False
+        
+        # Ждем токены и в чате, и в общем лимите бота
+        if self.chat_bucket.wait_time() > 0 or self.global_bucket.wait_time() > 0:
+            return False
+        self.chat_bucket.try_acquire()
+        self.global_bucket.try_acquire()
+        
+        text = self.build_digest()
+        if not text:
+            return False
+        
+        try:
+            if self.status_message_id is None:
+                message = await self.bot.send_message(chat_id=self.chat_id, text=text)
+                self.status_message_id = message.message_id
+                self.sent += 1
+                try:
+                    await self.bot.pin_chat_message(
+                        chat_id=self.chat_id,
+                        message_id=self.status_message_id,
+                        disable_notification=True
+                    )
+                except TelegramError as e:
+                    logger.warning(f"Не удалось закрепить статус: {e}")
+            else:
+                await self.bot.edit_message_text(
+                    text=text,
+                    chat_id=self.chat_id,
+                    message_id=self.status_message_id
+                )
+                self.edited += 1
+            
+            # Успешная отправка - возвращаем обычный период
+            self.interval = self.base_interval
+            self._unsent = []
+            self._unsent_dropped = 0
+            return True
+        
+        except RetryAfter as e:
+            # Флуд-контроль: растягиваем период и повторим позже
+            self.interval = min(max(self.interval * 2, float(e.retry_after)),
+                                NOTIFY_DIGEST_INTERVAL_MAX)
+            logger.warning(f"Флуд-контроль Telegram, следующий дайджест через {self.interval:.0f} сек")
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return False
+            # Сообщение удалено - при следующей отправке создадим новое
+            logger.warning(f"Статусное сообщение недоступно: {e}")
+            self.status_message_id = None
+        except TelegramError as e:
+            logger.error(f"Ошибка отправки уведомления: {e}")
+        
+        # Дайджест не доставлен - вернем события, чтобы повторить
+        self._requeue()
+        return False
+    
+    async def run(self) -> None:
+        """Фоновый цикл отправки дайджестов"""
+        logger.info(f"📣 Уведомления включены: чат {self.chat_id}, период {self.interval:.0f} сек")
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    def stop(self) -> None:
+        """Остановить цикл после последнего дайджеста"""
+        self._stop.set()
+
+
+# Меню собираются один раз: по кнопкам меняются только текст и клавиатура
+MAIN_MENU_TEXT = (
+    "🤖 *CAPTCHA AUTO BOT - УПРАВЛЕНИЕ*\n\n"
+    "*Статус:* 🟢 Готов к работе\n"
+    "*Режим:* Локальное распознавание\n"
+    "*Хостинг:* Railway\n\n"
+    "Выберите действие:"
+)
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🎯 Запустить решатель", callback_data='start_solver'),
+        InlineKeyboardButton("⏹️ Остановить", callback_data='stop_solver')
+    ],
+    [
+        InlineKeyboardButton("📍 Координаты", callback_data='coordinates'),
+        InlineKeyboardButton("⚙️ Настройки", callback_data='settings')
+    ],
+    [
+        InlineKeyboardButton("📊 Статистика", callback_data='stats'),
+        InlineKeyboardButton("❓ Помощь", callback_data='help')
+    ]
+])
+
+# Справка, статистика и координаты: одна кнопка возврата в главное меню
+BACK_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("↩️ Назад", callback_data='back_to_menu')]
+])
+
+SETTINGS_TEXT = "⚙️ *НАСТРОЙКИ*\n\nИзмените параметры и нажмите 'Сохранить':\n"
+
+@lru_cache(maxsize=8)
+def settings_markup(human_like: bool, save_screenshots: bool, debug_mode: bool) -> InlineKeyboardMarkup:
+    """Клавиатура настроек для состояния переключателей (всего 8 вариантов)"""
+    mark = lambda enabled: '✅' if enabled else '❌'
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"👤 Человекоподобно: {mark(human_like)}", callback_data='toggle_human_like')],
+        [InlineKeyboardButton(f"🖼️ Сохранять скриншоты: {mark(save_screenshots)}", callback_data='toggle_screenshots')],
+        [InlineKeyboardButton(f"🐛 Режим отладки: {mark(debug_mode)}", callback_data='toggle_debug')],
+        [
+            InlineKeyboardButton("💾 Сохранить", callback_data='save_settings'),
+            InlineKeyboardButton("↩️ Назад", callback_data='back_to_menu')
+        ]
+    ])
+
+
 class TelegramManager:
     """Класс для управления через Telegram"""
     
     def __init__(self):
         self.coordinates = load_coordinates()
         self.settings = load_settings()
+        self.notifier: Optional[NotificationScheduler] = None
+        self.thumbnails = ThumbnailCache()
+        self.charts = ChartCache()
+        # Решатель в процессе бота (SOLVER_IN_BOT): цикл - задача в том же event loop
+        self.solver = None
+        self.solver_task: Optional[asyncio.Task] = None
         logger.info("✅ Telegram менеджер инициализирован")
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /start - главное меню"""
-        keyboard = [
-            [
-                InlineKeyboardButton("🎯 Запустить решатель", callback_data='start_solver'),
-                InlineKeyboardButton("⏹️ Остановить", callback_data='stop_solver')
-            ],
-            [
-                InlineKeyboardButton("📍 Координаты", callback_data='coordinates'),
-                InlineKeyboardButton("⚙️ Настройки", callback_data='settings')
-            ],
-            [
-                InlineKeyboardButton("📊 Статистика", callback_data='stats'),
-                InlineKeyboardButton("❓ Помощь", callback_data='help')
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            "🤖 *CAPTCHA AUTO BOT - УПРАВЛЕНИЕ*\n\n"
-            "*Статус:* 🟢 Готов к работе\n"
-            "*Режим:* Локальное распознавание\n"
-            "*Хостинг:* Railway\n\n"
-            "Выберите действие:",
-            parse_mode='Markdown',
-            reply_markup=reply_markup
-        )
+        await self._show_menu(update, MAIN_MENU_TEXT, MAIN_MENU_MARKUP)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help - справка"""
@@ -94,6 +347,12 @@ class TelegramManager:
 /stats - Статистика работы
 /settings - Настройки
 /coordinates - Просмотр координат
+/last N - Последние N капч с распознанным текстом
+/failures N - Последние N ошибок распознавания
+/perf - Графики скорости и задержек за час, сутки и неделю
+/profile - Сводка последнего профиля решателя (режим отладки)
+/flight - Дамп бортового самописца (последние циклы решателя)
+/stop - Остановка решателя, запущенного из бота
 
 *Для запуска решателя:*
 Нажмите кнопку "🎯 Запустить решатель" или отправьте /run
@@ -102,7 +361,7 @@ class TelegramManager:
 Запустите `python3 setup_coordinates.py` на компьютере
 """
         
-        await update.message.reply_text(help_text, parse_mode='Markdown')
+        await self._show_menu(update, help_text, BACK_MENU_MARKUP)
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /stats - статистика"""
@@ -115,11 +374,23 @@ class TelegramManager:
                 stats_text += f"• Всего решено: `{stats.get('total_solved', 0)}`\n"
                 stats_text += f"• Всего ошибок: `{stats.get('total_errors', 0)}`\n"
                 
+                if self.solver_running:
+                    stats_text += (f"• Решатель: 🟢 работает, в сессии решено "
+                                   f"`{self.solver.stats['session_solved']}`, "
+                                   f"ошибок `{self.solver.stats['session_errors']}`\n")
+                
+                outcomes = stats.get('outcomes')
+                if outcomes and sum(outcomes.values()):
+                    stats_text += (f"• Ответ сайта: принято `{outcomes.get('accepted', 0)}`, "
+                                   f"отклонено `{outcomes.get('rejected', 0)}`, "
+                                   f"капча сменилась `{outcomes.get('changed', 0)}`, "
+                                   f"без изменений `{outcomes.get('unchanged', 0)}`\n")
+                
                 if stats.get('last_solution'):
                     stats_text += f"• Последнее решение: `{stats['last_solution']}`\n"
                 
                 if stats.get('sessions'):
-                    total_sessions = len(stats['sessions'])
+                    total_sessions = stats.get('sessions_total', len(stats['sessions']))
                     stats_text += f"• Всего сессий: `{total_sessions}`\n"
                     
                     # Последняя сессия
@@ -127,21 +398,37 @@ class TelegramManager:
                     stats_text += f"• Последняя сессия:\n"
                     stats_text += f"  Решено: `{last_session.get('solved', 0)}`\n"
                     stats_text += f"  Ошибок: `{last_session.get('errors', 0)}`\n"
+                    
+                    # Попытки и принятые сайтом ответы в час - отдельно
+                    accepted = last_session.get('outcomes', {}).get('accepted')
+                    if accepted is not None and last_session.get('start_time'):
+                        hours = (datetime.fromisoformat(last_session['end_time']) -
+                                 datetime.fromisoformat(last_session['start_time'])).total_seconds() / 3600
+                        if hours > 0:
+                            stats_text += (f"  Попыток в час: `{last_session.get('solved', 0) / hours:.1f}`, "
+                                           f"принято в час: `{accepted / hours:.1f}`\n")
+                
+                slo = stats.get('slo')
+                if slo and slo.get('breached'):
+                    stats_text += f"• 🚨 Нарушены SLO: `{', '.join(slo['breached'])}`\n"
+                
+                memory = stats.get('memory')
+                if memory and memory.get('rss_mb') is not None:
+                    stats_text += (f"• Память: `{memory['rss_mb']}` МБ "
+                                   f"(рост `{memory['growth_mb']:+}` МБ)\n")
                 
-                await update.message.reply_text(stats_text, parse_mode='Markdown')
+                await self._show_menu(update, stats_text, BACK_MENU_MARKUP)
             else:
-                await update.message.reply_text(
+                await self._show_menu(
+                    update,
                     "📊 Статистика пока не собрана.\n"
                     "Запустите решатель для начала работы.",
-                    parse_mode='Markdown'
+                    BACK_MENU_MARKUP
                 )
                 
         except Exception as e:
             logger.error(f"Ошибка загрузки статистики: {e}")
-            await update.message.reply_text(
-                "❌ Ошибка загрузки статистики",
-                parse_mode='Markdown'
-            )
+            await self._show_menu(update, "❌ Ошибка загрузки статистики", BACK_MENU_MARKUP)
     
     async def coordinates_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /coordinates - просмотр координат"""
@@ -164,82 +451,264 @@ class TelegramManager:
         
         coords_text += "\n*Для изменения:*\nЗапустите `python3 setup_coordinates.py` локально"
         
-        await update.message.reply_text(coords_text, parse_mode='Markdown')
+        await self._show_menu(update, coords_text, BACK_MENU_MARKUP)
     
     async def settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /settings - настройки"""
-        settings = self.settings
+        await self._show_menu(update, SETTINGS_TEXT, settings_markup(*self._settings_state()))
+    
+    def _settings_state(self) -> Tuple[bool, bool, bool]:
+        """Переключатели меню настроек (ключ кэша клавиатур)"""
+        return (
+            bool(self.settings.get('human_like', True)),
+            bool(self.settings.get('save_screenshots', True)),
+            bool(self.settings.get('debug_mode', False))
+        )
+    
+    async def _show_menu(self, update, text: str, reply_markup: InlineKeyboardMarkup):
+        """
+        Меню по кнопке правит сообщение с кнопкой, по команде - отправляется
+        новым сообщением
+        """
+        if not isinstance(update, CallbackQuery):
+            await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+            return
         
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    f"👤 Человекоподобно: {'✅' if settings.get('human_like', True) else '❌'}",
-                    callback_data='toggle_human_like'
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    f"🖼️ Сохранять скриншоты: {'✅' if settings.get('save_screenshots', True) else '❌'}",
-                    callback_data='toggle_screenshots'
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    f"🐛 Режим отладки: {'✅' if settings.get('debug_mode', False) else '❌'}",
-                    callback_data='toggle_debug'
-                )
-            ],
-            [
-                InlineKeyboardButton("💾 Сохранить", callback_data='save_settings'),
-                InlineKeyboardButton("↩️ Назад", callback_data='back_to_menu')
-            ]
-        ]
+        try:
+            await update.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+        except BadRequest as e:
+            # Повторное нажатие той же кнопки: меню уже в нужном состоянии
+            if 'not modified' not in str(e).lower():
+                raise
+    
+    async def _send_gallery(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                            kind: Union[str, Tuple[str, ...], None], title: str):
+        """Отправка последних капч одним альбомом"""
+        count = GALLERY_DEFAULT_COUNT
+        if context.args:
+            try:
+                count = int(context.args[0])
+            except ValueError:
+                pass
+        count = max(1, min(count, GALLERY_MAX_COUNT))
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        captures = list_captures(kind=kind, limit=count)
+        if not captures:
+            await update.message.reply_text(f"{title}\n\nСкриншотов пока нет.")
+            return
         
-        settings_text = "⚙️ *НАСТРОЙКИ*\n\n"
-        settings_text += "Измените параметры и нажмите 'Сохранить':\n"
+        # Чтение превью - в executor, чтобы не блокировать event loop
+        loop = asyncio.get_running_loop()
+        thumbs = await loop.run_in_executor(
+            None, self.thumbnails.get_many, [c['path'] for c in captures]
+        )
         
-        await update.message.reply_text(
-            settings_text,
-            parse_mode='Markdown',
-            reply_markup=reply_markup
+        media = []
+        for capture, thumb in zip(captures, thumbs):
+            if thumb is None:
+                continue
+            
+            when = datetime.strptime(capture['timestamp'], '%Y%m%d_%H%M%S')
+            if capture['kind'] == 'success':
+                caption = f"✅ {capture['text']} - {when.strftime('%d.%m %H:%M:%S')}"
+            elif capture['kind'] == 'rejected':
+                caption = f"❌ {capture['text']} отклонено сайтом - {when.strftime('%d.%m %H:%M:%S')}"
+            else:
+                caption = f"❌ не распознано - {when.strftime('%d.%m %H:%M:%S')}"
+            
+            media.append(InputMediaPhoto(media=thumb, caption=caption))
+        
+        if not media:
+            await update.message.reply_text("❌ Не удалось подготовить превью")
+            return
+        
+        media[0] = InputMediaPhoto(
+            media=media[0].media,
+            caption=f"{title}\n{media[0].caption}"
         )
+        await self._reply_album(update, media)
+    
+    async def _reply_album(self, update: Update, media: list):
+        """
+        Альбом из превью. В media group Telegram принимает 2-10 фото,
+        поэтому одно превью отправляется обычным фото
+        """
+        try:
+            if len(media) == 1:
+                await update.message.reply_photo(photo=media[0].media, caption=media[0].caption)
+            else:
+                await update.message.reply_media_group(media=media)
+        except BadRequest as e:
+            logger.error(f"Ошибка отправки альбома: {e}")
+            await update.message.reply_text(f"❌ Не удалось отправить изображения: {e}")
+    
+    async def last_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /last N - последние капчи"""
+        await self._send_gallery(update, context, None, "🖼️ Последние капчи")
+    
+    async def failures_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /failures N - последние ошибки распознавания и отклоненные ответы"""
+        await self._send_gallery(update, context, ('error', 'rejected'), "🖼️ Последние ошибки")
+    
+    async def perf_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /perf - графики производительности"""
+        # Отрисовка в executor; готовые графики берутся из кэша
+        loop = asyncio.get_running_loop()
+        charts = await asyncio.gather(*[
+            loop.run_in_executor(None, self.charts.get, window)
+            for window in ('hour', 'day', 'week')
+        ])
+        
+        titles = ["⏱️ Последний час", "📅 Последние сутки", "🗓️ Последняя неделя"]
+        media = [
+            InputMediaPhoto(media=chart, caption=title)
+            for title, chart in zip(titles, charts) if chart
+        ]
+        
+        if not media:
+            await update.message.reply_text(
+                "📈 Данных о производительности пока нет.\n"
+                "Запустите решатель для начала работы."
+            )
+            return
+        
+        await self._reply_album(update, media)
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /profile - сводка последнего профиля решателя"""
+        latest = latest_profile()
+        if not latest:
+            await update.message.reply_text(
+                "🔬 Профилей пока нет.\n\n"
+                "Включите 🐛 Режим отладки в /settings и сохраните - "
+                f"решатель запишет профиль следующих {PROFILE_WINDOW} капч."
+            )
+            return
+        
+        summary_path, profile_path = latest
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = f.read()
+        
+        # Лимит сообщения Telegram - 4096 символов
+        if len(summary) > 3800:
+            summary = summary[:3800] + "\n..."
+        
+        await update.message.reply_text(f"🔬 {os.path.basename(summary_path)}\n\n{summary}")
+        
+        # Полный профиль для snakeviz / pstats
+        if profile_path:
+            with open(profile_path, 'rb') as f:
+                await update.message.reply_document(
+                    document=f.read(),
+                    filename=os.path.basename(profile_path)
+                )
+    
+    async def flight_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /flight - дамп бортового самописца"""
+        loop = asyncio.get_running_loop()
+        if self.solver_running and self.solver.flight_recorder:
+            path = await loop.run_in_executor(None, self.solver.dump_flight, "запрос из Telegram")
+        else:
+            # Решатель не в процессе бота - последний сохраненный дамп
+            path = latest_dump()
+        
+        if not path:
+            await update.message.reply_text(
+                "📼 Дампов самописца пока нет.\n\n"
+                "Они пишутся при сбое решателя, нарушении SLO, по сигналу "
+                "SIGUSR1 или по /flight, когда решатель запущен из бота."
+            )
+            return
+        
+        dump = await loop.run_in_executor(None, load_dump, path)
+        counts = {}
+        for cycle in dump['cycles']:
+            counts[cycle['outcome']] = counts.get(cycle['outcome'], 0) + 1
+        lines = [f"📼 {os.path.basename(path)}", f"Причина: {dump['meta'].get('reason')}",
+                 f"Циклов: {len(dump['cycles'])}"]
+        lines += [f"  {outcome}: {count}" for outcome, count in sorted(counts.items())]
+        
+        await update.message.reply_text("\n".join(lines))
+        with open(path, 'rb') as f:
+            await update.message.reply_document(document=f.read(), filename=os.path.basename(path))
+    
+    @property
+    def solver_running(self) -> bool:
+        return self.solver_task is not None and not self.solver_task.done()
     
     async def run_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /run - запуск решателя"""
-        # В реальном приложении здесь был бы запуск решателя
-        # В Railway мы можем только управлять настройками
+        if not SOLVER_IN_BOT:
+            # В Railway мы можем только управлять настройками
+            await update.message.reply_text(
+                "⚠️ *ЗАПУСК РЕШАТЕЛЯ*\n\n"
+                "В режиме Railway автоматический решатель не может быть запущен,\n"
+                "так как требует доступа к экрану и установленного Tesseract.\n\n"
+                "*Для запуска:*\n"
+                "1. Установите Tesseract OCR на свой компьютер\n"
+                "2. Настройте координаты через `setup_coordinates.py`\n"
+                "3. Запустите `python3 main.py` локально\n"
+                "   или бота с `SOLVER_IN_BOT=true`\n\n"
+                "Этот бот предназначен только для управления настройками.",
+                parse_mode='Markdown'
+            )
+            return
+        
+        if self.solver_running:
+            await update.message.reply_text("🟢 Решатель уже работает", parse_mode='Markdown')
+            return
+        
+        from screen_solver import ScreenCaptchaSolver
+        
+        # Загрузка моделей OCR блокирует - создаем решатель в отдельном потоке
+        loop = asyncio.get_running_loop()
+        self.solver = await loop.run_in_executor(
+            None, lambda: ScreenCaptchaSolver(notifier=self.notifier)
+        )
+        # Не через application.create_task: Application.stop ждал бы конца цикла
+        self.solver_task = asyncio.create_task(self.solver.run_async())
         
         await update.message.reply_text(
-            "⚠️ *ЗАПУСК РЕШАТЕЛЯ*\n\n"
-            "В режиме Railway автоматический решатель не может быть запущен,\n"
-            "так как требует доступа к экрану и установленного Tesseract.\n\n"
-            "*Для запуска:*\n"
-            "1. Установите Tesseract OCR на свой компьютер\n"
-            "2. Настройте координаты через `setup_coordinates.py`\n"
-            "3. Запустите `python3 main.py` локально\n\n"
-            "Этот бот предназначен только для управления настройками.",
+            "🎯 *РЕШАТЕЛЬ ЗАПУЩЕН*\n\n"
+            "Работает в процессе бота, команды и статистика доступны.\n"
+            "Остановка: /stop",
             parse_mode='Markdown'
         )
     
+    async def stop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /stop - остановка решателя, запущенного из бота"""
+        if self.solver_running:
+            self.solver.stop()
+            text = "⏹️ Решатель остановится после текущей капчи"
+        elif SOLVER_IN_BOT:
+            text = "⏹️ Решатель не запущен"
+        else:
+            text = (
+                "⏹️ *ОСТАНОВКА*\n\n"
+                "В режиме Railway решатель не запущен.\n"
+                "Для остановки локального решателя нажмите Ctrl+C."
+            )
+        
+        await update.message.reply_text(text, parse_mode='Markdown')
+    
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик нажатий кнопок"""
         query = update.callback_query
-        await query.answer()
-        
         action = query.data
         
+        if action == 'save_settings':
+            save_settings(self.settings)
+            # Подтверждение всплывающим уведомлением, без нового сообщения в чате
+            await query.answer("✅ Настройки сохранены!")
+            return
+        
+        await query.answer()
+        
         if action == 'start_solver':
             await self.run_command(query, context)
             
         elif action == 'stop_solver':
-            await query.message.reply_text(
-                "⏹️ *ОСТАНОВКА*\n\n"
-                "В режиме Railway решатель не запущен.\n"
-                "Для остановки локального решателя нажмите Ctrl+C.",
-                parse_mode='Markdown'
-            )
+            await self.stop_command(query, context)
             
         elif action == 'coordinates':
             await self.coordinates_command(query, context)
@@ -265,13 +734,6 @@ class TelegramManager:
             self.settings['debug_mode'] = not self.settings.get('debug_mode', False)
             await self.settings_command(query, context)
             
-        elif action == 'save_settings':
-            save_settings(self.settings)
-            await query.message.reply_text(
-                "✅ Настройки сохранены!",
-                parse_mode='Markdown'
-            )
-            
         elif action == 'back_to_menu':
             await self.start_command(query, context)
 
@@ -296,8 +758,37 @@ def main():
     # Создаем менеджер
     manager = TelegramManager()
     
+    async def post_init(app: Application):
+        # Статусное сообщение с дайджестами, если указан чат
+        if TELEGRAM_CHAT_ID:
+            manager.notifier = NotificationScheduler(app.bot, TELEGRAM_CHAT_ID)
+            manager.notifier.notify('status', '🟢 Бот запущен')
+            app.create_task(manager.notifier.run())
+        
+        # Превью для галереи готовим заранее в фоне
+        manager.thumbnails.warm([c['path'] for c in list_captures(limit=GALLERY_MAX_COUNT * 2)])
+    
+    async def post_stop(app: Application):
+        # Решатель из /run: итоговая статистика сохраняется в finally цикла
+        if manager.solver_running:
+            manager.solver.stop()
+            manager.solver_task.cancel()
+            try:
+                await manager.solver_task
+            except asyncio.CancelledError:
+                pass
+        if manager.notifier:
+            manager.notifier.stop()
+    
     # Создаем приложение
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)
+        .build()
+    )
     
     # Регистрируем команды
     application.add_handler(CommandHandler("start", manager.start_command))
@@ -306,6 +797,12 @@ def main():
     application.add_handler(CommandHandler("settings", manager.settings_command))
     application.add_handler(CommandHandler("coordinates", manager.coordinates_command))
     application.add_handler(CommandHandler("run", manager.run_command))
+    application.add_handler(CommandHandler("stop", manager.stop_command))
+    application.add_handler(CommandHandler("last", manager.last_command))
+    application.add_handler(CommandHandler("failures", manager.failures_command))
+    application.add_handler(CommandHandler("perf", manager.perf_command))
+    application.add_handler(CommandHandler("profile", manager.profile_command))
+    application.add_handler(CommandHandler("flight", manager.flight_command))
     
     # Регистрируем обработчик кнопок
     application.add_handler(CallbackQueryHandler(manager.button_handler))
@@ -315,7 +812,297 @@ def main():
     print("💬 Отправьте /start в Telegram")
     print("="*60)
     
-    application.run_polling(allowed_updates=['message', 'callback_query'])
+    allowed_updates = ['message', 'callback_query']
+    
+    if TELEGRAM_MODE == 'webhook' and _webhook_available():
+        secret = webhook_secret()
+        print(f"🌐 Webhook: {WEBHOOK_URL}/{WEBHOOK_PATH} (порт {WEBHOOK_PORT})")
+        
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=secret,
+            allowed_updates=allowed_updates,
+            max_connections=TELEGRAM_CONCURRENT_UPDATES
+        )
+    else:
+        application.run_polling(allowed_updates=allowed_updates)
+
+def _webhook_available() -> bool:
+    """Проверка, что webhook режим можно запустить, иначе откат на polling"""
+    if not WEBHOOK_URL:
+        logger.warning("⚠️ WEBHOOK_URL не задан, используется polling")
+        return False
+    
+    # Сервер webhook в python-telegram-bot
+    if importlib.util.find_spec('tornado') is None:
+        logger.warning("⚠️ Не установлен python-telegram-bot[webhooks], используется polling")
+        return False
+    
+    return True
+
+def webhook_secret() -> str:
+    """
+    Секрет webhook: WEBHOOK_SECRET или сохраненный в WEBHOOK_SECRET_FILE
+    (создается при первом запуске), чтобы --replay прошел проверку
+    """
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    
+    try:
+        with open(WEBHOOK_SECRET_FILE, 'r', encoding='utf-8') as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except OSError:
+        pass
+    
+    secret = secrets.token_urlsafe(32)
+    try:
+        os.makedirs(os.path.dirname(WEBHOOK_SECRET_FILE), exist_ok=True)
+        # Только владельцу: секретом подписываются входящие обновления
+        fd = os.open(WEBHOOK_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(secret)
+        logger.info(f"🔑 Секрет webhook сохранен: {WEBHOOK_SECRET_FILE}")
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось сохранить секрет webhook, --replay не пройдет проверку: {e}")
+    return secret
+
+def replay_updates(paths: list, url: Optional[str] = None, secret: Optional[str] = None,
+                   workers: int = TELEGRAM_CONCURRENT_UPDATES) -> list:
+    """
+    Отправка записанных обновлений (JSON файлы) в локальный webhook.
+    Файл может содержать одно обновление или список обновлений.
+    """
+    url = url or f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}"
+    secret = secret or webhook_secret()
+    
+    payloads = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        payloads.extend(data if isinstance(data, list) else [data])
+    
+    def post(payload: dict):
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json',
+                'X-Telegram-Bot-Api-Secret-Token': secret
+            },
+            method='POST'
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            logger.error(f"Ошибка отправки обновления {payload.get('update_id')}: {e}")
+            status = None
+        return payload.get('update_id'), status, time.perf_counter() - started
+    
+    # Отправляем параллельно, чтобы проверить конкурентную обработку
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(post, payloads))
+    
+    for update_id, status, elapsed in results:
+        mark = '✅' if status == 200 else '❌'
+        print(f"{mark} update_id={update_id} статус={status} за {elapsed * 1000:.0f} мс")
+    
+    return results
+
+class FakeBotAPI:
+    """Имитация Telegram Bot API для проверки уведомлений без сети"""
+    
+    class _Message:
+        def __init__(self, message_id: int):
+            self.message_id = message_id
+    
+    def __init__(self, flood_every: int = 0, retry_after: int = 5):
+        self.calls = []
+        self.messages = {}
+        self.markups = {}
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+    
+    def _record(self, method: str, **kwargs):
+        self.calls.append((method, kwargs))
+        if self.flood_every and len(self.calls) % self.flood_every == 0:
+            raise RetryAfter(self.retry_after)
+    
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self._record('send_message', chat_id=chat_id, text=text, reply_markup=reply_markup)
+        message_id = len(self.messages) + 1
+        self.messages[message_id] = text
+        self.markups[message_id] = reply_markup
+        return self._Message(message_id)
+    
+    async def edit_message_text(self, text, chat_id=None, message_id=None, reply_markup=None, **kwargs):
+        self._record('edit_message_text', chat_id=chat_id, message_id=message_id, text=text,
+                     reply_markup=reply_markup)
+        if message_id not in self.messages:
+            raise BadRequest("Message to edit not found")
+        if self.messages[message_id] == text and self.markups.get(message_id) == reply_markup:
+            raise BadRequest("Message is not modified")
+        self.messages[message_id] = text
+        self.markups[message_id] = reply_markup
+        return True
+    
+    async def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self._record('answer_callback_query', callback_query_id=callback_query_id, text=text)
+        return True
+    
+    async def pin_chat_message(self, chat_id, message_id, **kwargs):
+        self._record('pin_chat_message', chat_id=chat_id, message_id=message_id)
+        return True
+
+
+def test_notifications(events: int = 1000, duration: float = 60.0):
+    """Прогон планировщика уведомлений на фейковом API с виртуальным временем"""
+    print("\n" + "="*60)
+    print("🧪 ТЕСТ УВЕДОМЛЕНИЙ TELEGRAM")
+    print("="*60)
+    
+    now = [0.0]
+    clock = lambda: now[0]
+    
+    async def scenario(bot: FakeBotAPI) -> NotificationScheduler:
+        bucket = TokenBucket(NOTIFY_GLOBAL_RATE, NOTIFY_GLOBAL_BURST, clock)
+        notifier = NotificationScheduler(bot, chat_id=1, global_bucket=bucket,
+                                         clock=clock, max_backlog=50)
+        step = duration / events
+        next_flush = 0.0
+        
+        for i in range(events):
+            now[0] += step
+            if i % 10 == 9:
+                notifier.notify('errors', f"❌ ошибка #{i}")
+            else:
+                notifier.notify('solved', f"🎯 решено #{i}")
+            
+            if now[0] >= next_flush:
+                await notifier.flush()
+                next_flush = now[0] + notifier.interval
+        
+        # Финальный дайджест
+        now[0] += NOTIFY_DIGEST_INTERVAL_MAX
+        await notifier.flush()
+        return notifier
+    
+    for title, bot in [("Обычный режим", FakeBotAPI()),
+                       ("Флуд-контроль", FakeBotAPI(flood_every=3))]:
+        now[0] = 0.0
+        notifier = asyncio.run(scenario(bot))
+        methods = [method for method, _ in bot.calls]
+        
+        print(f"\n{title}:")
+        print(f"  Событий: {events}, вызовов API: {len(bot.calls)}")
+        print(f"  send_message: {methods.count('send_message')}, "
+              f"edit_message_text: {methods.count('edit_message_text')}, "
+              f"pin_chat_message: {methods.count('pin_chat_message')}")
+        print(f"  Счетчики: {notifier.counters}")
+        
+        ok = (methods.count('send_message') == 1
+              and notifier.counters['solved'] + notifier.counters['errors'] == events
+              and not notifier._dirty)
+        print(f"  {'✅ OK' if ok else '❌ FAIL'}")
+    
+    # Каждый вызов API отклонен: события дайджеста не теряются
+    async def rejected() -> NotificationScheduler:
+        bucket = TokenBucket(NOTIFY_GLOBAL_RATE, NOTIFY_GLOBAL_BURST, clock)
+        notifier = NotificationScheduler(FakeBotAPI(flood_every=1), chat_id=1,
+                                         global_bucket=bucket, clock=clock)
+        for i in range(3):
+            notifier.notify('solved', f"🎯 решено #{i}")
+        await notifier.flush()
+        notifier.notify('solved', "🎯 решено #3")
+        return notifier
+    
+    now[0] = 0.0
+    notifier = asyncio.run(rejected())
+    kept = [text for _, text in notifier._events]
+    ok = kept == [f"🎯 решено #{i}" for i in range(4)] and notifier._dirty
+    print(f"\nОтказ API: событий сохранено {len(kept)} из 4")
+    print(f"  {'✅ OK' if ok else '❌ FAIL'}")
+    
+    print("="*60)
+
+def test_menus():
+    """
+    Навигация по меню на фейковом API: нажатия правят одно сообщение,
+    клавиатуры берутся из кэша
+    """
+    from telegram import Chat, Message, User
+    
+    print("\n" + "="*60)
+    print("🧪 ТЕСТ МЕНЮ TELEGRAM")
+    print("="*60)
+    
+    bot = FakeBotAPI()
+    manager = TelegramManager()
+    # Настройки не читаются и не сохраняются в файл
+    manager.settings = {'human_like': True, 'save_screenshots': True, 'debug_mode': False}
+    chat = Chat(id=1, type=Chat.PRIVATE)
+    user = User(id=1, first_name='test', is_bot=False)
+    
+    def message(message_id: int, text: Optional[str] = None) -> Message:
+        result = Message(message_id, datetime.now(), chat, from_user=user, text=text)
+        result.set_bot(bot)
+        return result
+    
+    taps = ['settings', 'toggle_human_like', 'toggle_debug', 'toggle_human_like',
+            'toggle_debug', 'settings', 'back_to_menu', 'settings', 'back_to_menu',
+            'coordinates', 'back_to_menu', 'stats', 'back_to_menu', 'help', 'help', 'back_to_menu']
+    screens = [index for index, action in enumerate(taps) if action in ('coordinates', 'stats', 'help')]
+    
+    async def scenario() -> None:
+        await manager.start_command(Update(1, message=message(100, '/start')), None)
+        menu_id = max(bot.messages)
+        for number, action in enumerate(taps, start=2):
+            query = CallbackQuery(str(number), user, 'chat', data=action, message=message(menu_id))
+            query.set_bot(bot)
+            await manager.button_handler(Update(number, callback_query=query), None)
+    
+    settings_markup.cache_clear()
+    asyncio.run(scenario())
+    methods = [method for method, _ in bot.calls]
+    edits = [kwargs for method, kwargs in bot.calls if method == 'edit_message_text']
+    cache = settings_markup.cache_info()
+    
+    print(f"Нажатий: {len(taps)}, вызовов API: {len(bot.calls)}")
+    print(f"  send_message: {methods.count('send_message')}, "
+          f"edit_message_text: {methods.count('edit_message_text')}, "
+          f"answer_callback_query: {methods.count('answer_callback_query')}")
+    print(f"  Клавиатуры настроек: {cache.currsize} собрано, {cache.hits} из кэша")
+    # Раньше каждое нажатие отправляло новое меню
+    print(f"  Новых сообщений: {methods.count('send_message')} (было бы {1 + len(taps)})")
+    
+    ok = (methods.count('send_message') == 1
+          and methods.count('answer_callback_query') == len(taps)
+          and len(edits) == len(taps)
+          and len(bot.messages) == 1
+          and edits[-1]['reply_markup'] is MAIN_MENU_MARKUP
+          and edits[0]['reply_markup'] is edits[5]['reply_markup']
+          and all(edits[index]['reply_markup'] is BACK_MENU_MARKUP for index in screens)
+          and bot.messages[1] == MAIN_MENU_TEXT
+          and cache.currsize == 4)
+    print(f"{'✅ OK' if ok else '❌ FAIL'}")
+    print("="*60)
+    return ok
 
 if __name__ == "__main__":
-    main()
+    if "--test-notifications" in sys.argv:
+        test_notifications()
+    elif "--test-menus" in sys.argv:
+        test_menus()
+    elif "--replay" in sys.argv:
+        # python3 telegram_manager.py --replay updates/*.json
+        replay_updates(sys.argv[sys.argv.index("--replay") + 1:])
+    else:
+        main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+🔍 Поиск эталонных шаблонов на экране (cv2.matchTemplate)
+"""
+
+import os
+import json
+import logging
+from typing import Optional, Tuple, Dict, Any, NamedTuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import (
+    TEMPLATES_DIR, CALIBRATION_DOWNSCALE, CALIBRATION_SCALES,
+    CALIBRATION_REFINE_MARGIN, CALIBRATION_CANDIDATES
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('TemplateMatcher')
+
+class Match(NamedTuple):
+    """Найденное положение шаблона на экране"""
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+    scale: float
+
+def to_gray(image) -> np.ndarray:
+    """PIL изображение или массив -> grayscale uint8"""
+    if isinstance(image, Image.Image):
+        image = np.asarray(image.convert('RGB'))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+def _best_match(image: np.ndarray, template: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+    """Лучшее совпадение шаблона (TM_CCOEFF_NORMED)"""
+    if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+        return -1.0, (0, 0)
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, location = cv2.minMaxLoc(result)
+    return float(score), location
+
+def find_template(screen: np.ndarray, template: np.ndarray,
+                  scales=CALIBRATION_SCALES,
+                  downscale: float = CALIBRATION_DOWNSCALE) -> Optional[Match]:
+    """
+    Многомасштабный поиск шаблона: грубо на уменьшенном экране,
+    затем уточнение в полном разрешении рядом с найденной точкой
+    """
+    screen = to_gray(screen)
+    template = to_gray(template)
+    
+    # 1. Грубый поиск на уменьшенной копии (уровень пирамиды)
+    small_screen = cv2.resize(screen, None, fx=downscale, fy=downscale,
+                              interpolation=cv2.INTER_AREA)
+    
+    candidates = []
+    for scale in scales:
+        factor = downscale * scale
+        width = int(round(template.shape[1] * factor))
+        height = int(round(template.shape[0] * factor))
+        if width < 8 or height < 8:
+            continue
+        if width > small_screen.shape[1] or height > small_screen.shape[0]:
+            continue
+        
+        small_template = cv2.resize(template, (width, height), interpolation=cv2.INTER_AREA)
+        result = cv2.matchTemplate(small_screen, small_template, cv2.TM_CCOEFF_NORMED)
+        
+        # Несколько лучших пиков: на малом масштабе однотонные элементы
+        # (поле ввода) легко путаются, выбор делаем после уточнения
+        for _ in range(CALIBRATION_CANDIDATES):
+            _, score, _, location = cv2.minMaxLoc(result)
+            candidates.append((float(score), location, scale))
+            x, y = location
+            result[max(0, y - height // 2):y + height // 2 + 1,
+                   max(0, x - width // 2):x + width // 2 + 1] = -1.0
+    
+    if not candidates:
+        return None
+    
+    # 2. Уточнение в полном разрешении в небольших окнах вокруг кандидатов
+    best = None
+    scaled_templates = {}
+    margin = CALIBRATION_REFINE_MARGIN + int(1 / downscale)
+    
+    for _, location, scale in candidates:
+        if scale not in scaled_templates:
+            scaled_templates[scale] = template if scale == 1.0 else cv2.resize(
+                template, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR
+            )
+        scaled = scaled_templates[scale]
+        height, width = scaled.shape[:2]
+        
+        x0 = max(0, int(location[0] / downscale) - margin)
+        y0 = max(0, int(location[1] / downscale) - margin)
+        x1 = min(screen.shape[1], x0 + width + margin * 2)
+        y1 = min(screen.shape[0], y0 + height + margin * 2)
+        
+        score, refined = _best_match(screen[y0:y1, x0:x1], scaled)
+        if best is None or score > best.score:
+            best = Match(x0 + refined[0], y0 + refined[1], width, height, score, scale)
+    
+    return best
+
+def match_in_window(screen: np.ndarray, template: np.ndarray,
+                    origin: Tuple[int, int]) -> Optional[Match]:
+    """Поиск шаблона (масштаб 1) в уже вырезанной области с левым верхним углом origin"""
+    screen = to_gray(screen)
+    template = to_gray(template)
+    
+    score, location = _best_match(screen, template)
+    if score < 0:
+        return None
+    
+    height, width = template.shape[:2]
+    return Match(origin[0] + location[0], origin[1] + location[1], width, height, score, 1.0)
+
+def load_templates(directory: str = TEMPLATES_DIR) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Загрузка эталонных шаблонов и их описания"""
+    templates = {}
+    meta = {}
+    
+    meta_file = os.path.join(directory, "templates.json")
+    try:
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки описания шаблонов: {e}")
+    
+    for name in meta.get('templates', {}):
+        path = os.path.join(directory, f"{name}.png")
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            logger.warning(f"Шаблон не найден: {path}")
+            continue
+        templates[name] = image
+    
+    return templates, meta
+
+def update_templates_meta(values: Dict[str, Any], directory: str = TEMPLATES_DIR) -> bool:
+    """Обновление описания шаблонов (templates.json)"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        meta_file = os.path.join(directory, "templates.json")
+        
+        meta = {}
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        
+        for key, value in values.items():
+            if isinstance(value, dict) and isinstance(meta.get(key), dict):
+                meta[key].update(value)
+            else:
+                meta[key] = value
+        
+        with open(meta_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка сохранения описания шаблонов: {e}")
+        return False
+
+def save_template(name: str, image: np.ndarray, info: Dict[str, Any],
+                  directory: str = TEMPLATES_DIR) -> bool:
+    """Сохранение шаблона и его описания"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        cv2.imwrite(os.path.join(directory, f"{name}.png"), to_gray(image))
+    except Exception as e:
+        logger.error(f"Ошибка сохранения шаблона {name}: {e}")
+        return False
+    
+    return update_templates_meta({'templates': {name: info}}, directory)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+✏️ Коррекция распознанного текста: алфавит сайта, длина и модель путаниц символов
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import difflib
+import logging
+from datetime import datetime
+from typing import Optional, Iterable, List, Dict, Any, Tuple
+
+from config import (
+    CONFUSION_MODEL_FILE, OCR_SITE_CHARSET, OCR_TEXT_LENGTH,
+    OCR_CONFUSION_GROUPS, CORRECTION_SEED_WEIGHT, CORRECTION_SELF_WEIGHT,
+    CORRECTION_DELETE_WEIGHT, CORRECTION_MEAN_CONFIDENCE, CORRECTION_CANDIDATES, CORPUS_DIR
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('TextCorrector')
+
+# Минимум размеченных капч, чтобы вывести алфавит сайта из разметки
+MIN_LABELS_FOR_CHARSET = 20
+
+def align(observed: str, truth: str) -> List[Tuple[str, str]]:
+    """Пары (распознано, верно) для совпадающих и замененных символов"""
+    pairs = []
+    matcher = difflib.SequenceMatcher(None, observed, truth, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        # Вставки и удаления не выравниваются посимвольно
+        if tag == 'equal' or (tag == 'replace' and i2 - i1 == j2 - j1):
+            pairs.extend(zip(observed[i1:i2], truth[j1:j2]))
+    return pairs
+
+class TextCorrector:
+    """
+    Выбор самой вероятной строки, допустимой для сайта. Для каждого
+    символа OCR рассматриваются варианты из модели путаниц
+    P(верный | распознан): уверенность Tesseract выше типичной повышает
+    вес самого символа, ниже - вес замен; лишний неуверенный символ
+    может быть отброшен. Длина учитывается по распределению из разметки
+    """
+    
+    def __init__(self, charset: str = '', lengths: Optional[Dict[int, int]] = None,
+                 confusions: Optional[Dict[str, Dict[str, int]]] = None, samples: int = 0):
+        self.charset = set(charset)
+        self.lengths = {int(length): count for length, count in (lengths or {}).items()}
+        self.confusions = confusions or {}   # Распознанный символ -> {верный: количество}
+        self.samples = samples
+        
+        self.min_length, self.max_length = OCR_TEXT_LENGTH
+        self._length_log = self._length_prior()
+        # Варианты для распознанного символа считаются один раз
+        self._candidates_cache: Dict[str, List[Tuple[str, float]]] = {}
+    
+    def _length_prior(self) -> Dict[int, float]:
+        """log P(длина) со сглаживанием; без разметки - равномерно"""
+        lengths = range(self.min_length, self.max_length + 1)
+        total = sum(self.lengths.get(length, 0) for length in lengths) + len(lengths)
+        return {
+            length: math.log((self.lengths.get(length, 0) + 1) / total)
+            for length in lengths
+        }
+    
+    def _seed(self, char: str) -> Dict[str, float]:
+        """Известные путаницы символа: группы из конфигурации и другой регистр"""
+        seed = {}
+        for group in OCR_CONFUSION_GROUPS:
+            if char in group:
+                for other in group:
+                    if other != char:
+                        seed[other] = CORRECTION_SEED_WEIGHT
+        if char.isalpha() and char.swapcase() != char:
+            seed[char.swapcase()] = CORRECTION_SEED_WEIGHT
+        return seed
+    
+    def candidates(self, char: str) -> List[Tuple[str, float]]:
+        """Варианты верного символа с вероятностями P(верный | распознан)"""
+        cached = self._candidates_cache.get(char)
+        if cached is not None:
+            return cached
+        
+        counts = self._seed(char)
+        counts[char] = counts.get(char, 0.0) + CORRECTION_SELF_WEIGHT
+        for true, count in self.confusions.get(char, {}).items():
+            counts[true] = counts.get(true, 0.0) + count
+        
+        total = sum(counts.values())
+        options = [
+            (true, count / total) for true, count in counts.items()
+            if not self.charset or true in self.charset
+        ]
+        options.sort(key=lambda option: -option[1])
+        options = options[:CORRECTION_CANDIDATES]
+        
+        self._candidates_cache[char] = options
+        return options
+    
+    def correct(self, text: str, confidences: Optional[List[float]] = None) -> str:
+        """
+        Самая вероятная допустимая строка. confidences - уверенность
+        Tesseract в каждом символе (0-100); без нее - типичная
+        """
+        if not text:
+            return text
+        if confidences is None or len(confidences) != len(text):
+            confidences = [CORRECTION_MEAN_CONFIDENCE] * len(text)
+        
+        # P(верный | распознан) - средняя по всем уверенностям, поэтому
+        # уверенность в символе сравнивается с типичной
+        mean = min(max(CORRECTION_MEAN_CONFIDENCE / 100.0, 0.01), 0.99)
+        
+        # Лучшая строка для каждой длины префикса: {длина: (log-вероятность, строка)}
+        states: Dict[int, Tuple[float, str]] = {0: (0.0, '')}
+        for char, confidence in zip(text, confidences):
+            certainty = min(max(confidence / 100.0, 0.01), 0.99)
+            keep, swap = certainty / mean, (1 - certainty) / (1 - mean)
+            weights = [
+                (p * (keep if true == char else swap), true)
+                for true, p in self.candidates(char)
+            ]
+            norm = sum(weight for weight, _ in weights)
+            options = [(math.log(weight / norm), true) for weight, true in weights]
+            # Символ вне алфавита без вариантов - точно лишний
+            delete = math.log((1 - certainty) * CORRECTION_DELETE_WEIGHT) if options else 0.0
+            
+            updated: Dict[int, Tuple[float, str]] = {}
+            for length, (score, prefix) in states.items():
+                best = updated.get(length)
+                if best is None or score + delete > best[0]:
+                    updated[length] = (score + delete, prefix)
+                
+                if length + 1 > self.max_length:
+                    continue
+                for log_p, true in options:
+                    best = updated.get(length + 1)
+                    if best is None or score + log_p > best[0]:
+                        updated[length + 1] = (score + log_p, prefix + true)
+            states = updated
+        
+        scored = [
+            (score + self._length_log[length], prefix)
+            for length, (score, prefix) in states.items()
+            if length in self._length_log
+        ]
+        if not scored:
+            return text
+        return max(scored)[1]
+    
+    @classmethod
+    def learn(cls, pairs: Iterable[Tuple[str, str]], charset: str = OCR_SITE_CHARSET) -> 'TextCorrector':
+        """Модель по парам (текст OCR, верный текст)"""
+        confusions: Dict[str, Dict[str, int]] = {}
+        lengths: Dict[int, int] = {}
+        labels_charset = set()
+        samples = 0
+        
+        for observed, truth in pairs:
+            samples += 1
+            lengths[len(truth)] = lengths.get(len(truth), 0) + 1
+            labels_charset.update(truth)
+            for seen, true in align(observed, truth):
+                row = confusions.setdefault(seen, {})
+                row[true] = row.get(true, 0) + 1
+        
+        if not charset and samples >= MIN_LABELS_FOR_CHARSET:
+            charset = ''.join(sorted(labels_charset))
+        return cls(charset, lengths, confusions, samples)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'created_at': datetime.now().isoformat(),
+            'samples': self.samples,
+            'charset': ''.join(sorted(self.charset)),
+            'lengths': {str(length): count for length, count in sorted(self.lengths.items())},
+            'confusions': self.confusions
+        }
+    
+    def save(self, path: str = CONFUSION_MODEL_FILE) -> bool:
+        """Сохранение модели"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения модели путаниц: {e}")
+            return False
+    
+    @classmethod
+    def load(cls, path: str = CONFUSION_MODEL_FILE) -> 'TextCorrector':
+        """Модель из файла; без файла - только известные путаницы и OCR_SITE_CHARSET"""
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return cls(
+                    OCR_SITE_CHARSET or data.get('charset', ''),
+                    data.get('lengths'), data.get('confusions'), data.get('samples', 0)
+                )
+        except Exception as e:
+            logger.error(f"Ошибка загрузки модели путаниц: {e}")
+        return cls(OCR_SITE_CHARSET)
+
+def corpus_pairs(directory: str = CORPUS_DIR) -> List[Tuple[str, str]]:
+    """
+    Пары (текст OCR, разметка) из корпуса: для импортированных
+    скриншотов в имени файла записан текст решателя - уже после
+    коррекции, поэтому это лишь запасной вариант без Tesseract
+    """
+    from corpus import load_labels
+    from thumbnail_cache import CAPTURE_PATTERN
+    
+    pairs = []
+    for name, label in sorted(load_labels(directory).items()):
+        match = CAPTURE_PATTERN.match(name)
+        if match and match.group(4):
+            pairs.append((match.group(4), label))
+    return pairs
+
+def ocr_samples(directory: str = CORPUS_DIR) -> List[Tuple[str, List[float], str]]:
+    """
+    (текст OCR, уверенность символов, разметка) для капч корпуса: тот же
+    путь, что у решателя, но без коррекции. Пусто без Tesseract
+    """
+    import numpy as np
+    from PIL import Image
+    from corpus import load_corpus
+    from image_processor import ImageProcessor, tesseract_available
+    
+    if not tesseract_available():
+        return []
+    
+    logging.getLogger('ImageProcessor').setLevel(logging.WARNING)
+    processor = ImageProcessor()
+    processor.corrector = None
+    
+    samples = []
+    for path, label in load_corpus(directory):
+        frame = np.asarray(Image.open(path).convert('RGB'))
+        processor._text_heights.clear()
+        processor.recognize_text(processor.preprocess_array(frame))
+        samples.append((processor.last_raw_text or '', list(processor.last_char_confidences), label))
+    return samples
+
+def evaluate(corrector: TextCorrector,
+             samples: List[Tuple[str, Optional[List[float]], str]]) -> Dict[str, Any]:
+    """
+    Точность до и после коррекции и время одного вызова. samples -
+    (текст OCR, уверенность символов или None, верный текст)
+    """
+    before = sum(observed == truth for observed, _, truth in samples)
+    after = 0
+    started = time.perf_counter()
+    for observed, confidences, truth in samples:
+        after += corrector.correct(observed, confidences) == truth
+    elapsed = time.perf_counter() - started
+    
+    total = max(len(samples), 1)
+    return {
+        'samples': len(samples),
+        'accuracy_before': before / total,
+        'accuracy_after': after / total,
+        'mean_us': elapsed / total * 1e6
+    }
+
+def main(argv: List[str]) -> int:
+    """
+    python3 text_corrector.py build       - модель путаниц по корпусу
+    python3 text_corrector.py eval        - точность с коррекцией (каждая 5-я капча отложена)
+    python3 text_corrector.py fix ТЕКСТ   - коррекция одной строки текущей моделью
+    """
+    command = argv[0] if argv else 'eval'
+    
+    if command == 'fix' and len(argv) > 1:
+        print(TextCorrector.load().correct(argv[1]))
+        return 0
+    if command not in ('eval', 'build'):
+        print(main.__doc__)
+        return 1
+    
+    # Как у решателя: свежий OCR корпуса без коррекции, с уверенностью символов.
+    # В именах скриншотов текст уже после коррекции - только запасной вариант
+    samples = ocr_samples()
+    if not samples:
+        samples = [(observed, None, truth) for observed, truth in corpus_pairs()]
+        if samples:
+            print("⚠️ Tesseract недоступен: текст OCR из имен файлов (уже после коррекции, "
+                  "без уверенности символов), модель приблизительная")
+    if not samples:
+        print("❌ Корпус пуст: python3 corpus.py import")
+        return 1
+    
+    if command == 'eval':
+        train = [(observed, truth) for i, (observed, _, truth) in enumerate(samples) if i % 5]
+        held_out = [sample for i, sample in enumerate(samples) if not i % 5]
+        result = evaluate(TextCorrector.learn(train), held_out)
+        print(f"Отложено капч: {result['samples']}")
+        print(f"Точность без коррекции: {result['accuracy_before'] * 100:.1f}%")
+        print(f"Точность с коррекцией:  {result['accuracy_after'] * 100:.1f}%")
+        print(f"Время коррекции: {result['mean_us']:.0f} мкс")
+        return 0
+    
+    corrector = TextCorrector.learn((observed, truth) for observed, _, truth in samples)
+    if not corrector.save():
+        return 1
+    print(f"✅ Модель путаниц: {len(samples)} капч, алфавит "
+          f"'{''.join(sorted(corrector.charset)) or 'без ограничений'}' -> {CONFUSION_MODEL_FILE}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+🖼️ Кэш уменьшенных превью скриншотов капч для Telegram
+"""
+
+import io
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Union, List, Dict, Any, Tuple
+
+from PIL import Image
+
+from config import (
+    SCREENSHOTS_DIR, THUMBS_DIR, THUMB_SIZE, THUMB_QUALITY,
+    THUMB_CACHE_MAX_BYTES, THUMB_DISK_MAX_FILES, THUMB_PRUNE_EVERY
+)
+
+# Библиотечный модуль: обработчики настраивает точка входа
+logger = logging.getLogger('ThumbnailCache')
+
+# success_20240101_120000_TEXT.png / rejected_20240101_120000_TEXT.png / error_20240101_120000.png
+CAPTURE_PATTERN = re.compile(r'^(success|rejected|error)_(\d{8})_(\d{6})(?:_(.+))?\.png$')
+
+def list_captures(kind: Union[str, Tuple[str, ...], None] = None, limit: int = 10,
+                  directory: str = SCREENSHOTS_DIR) -> List[Dict[str, Any]]:
+    """Последние сохраненные капчи (новые первыми); kind - вид или несколько видов"""
+    kinds = (kind,) if isinstance(kind, str) else kind
+    captures = []
+    
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return captures
+    
+    for name in names:
+        match = CAPTURE_PATTERN.match(name)
+        if not match:
+            continue
+        
+        capture_kind, date, clock, text = match.groups()
+        if kinds and capture_kind not in kinds:
+            continue
+        
+        captures.append({
+            'path': os.path.join(directory, name),
+            'kind': capture_kind,
+            'timestamp': f"{date}_{clock}",
+            'text': text
+        })
+    
+    # Имя содержит время, сортировка по нему не требует stat() каждого файла
+    captures.sort(key=lambda c: c['timestamp'], reverse=True)
+    return captures[:limit]
+
+class ThumbnailCache:
+    """Ограниченный по размеру кэш превью (JPEG) с фоновой генерацией"""
+    
+    def __init__(self, max_bytes: int = THUMB_CACHE_MAX_BYTES,
+                 thumb_dir: str = THUMBS_DIR):
+        self.max_bytes = max_bytes
+        self.thumb_dir = thumb_dir
+        
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._submitted = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbs')
+    
+    def thumb_path(self, path: str) -> str:
+        """Путь к превью на диске"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.thumb_dir, f"{name}.jpg")
+    
+    def submit(self, path: str, image: Optional[Image.Image] = None) -> Future:
+        """Сгенерировать превью в фоне (один раз на скриншот)"""
+        future = self._executor.submit(self._generate, path, image)
+        
+        # Бот работает неделями - чистим диск по ходу записи, а не только при старте
+        with self._lock:
+            self._submitted += 1
+            prune = self._submitted % THUMB_PRUNE_EVERY == 0
+        if prune:
+            self._executor.submit(self._prune_disk)
+        
+        return future
+    
+    def warm(self, paths: List[str]) -> None:
+        """Подготовить превью для уже сохраненных скриншотов"""
+        for path in paths:
+            if path not in self._cache and not os.path.exists(self.thumb_path(path)):
+                self.submit(path)
+        self._executor.submit(self._prune_disk)
+    
+    def get(self, path: str) -> Optional[bytes]:
+        """
+        Превью скриншота: из памяти, с диска или сгенерированное.
+        Блокирующий вызов - из асинхронного кода вызывать через executor.
+        """
+        with self._lock:
+            data = self._cache.get(path)
+            if data is not None:
+                self._cache.move_to_end(path)
+                return data
+        
+        thumb_path = self.thumb_path(path)
+        if os.path.exists(thumb_path):
+            try:
+                with open(thumb_path, 'rb') as f:
+                    data = f.read()
+                self._put(path, data)
+                return data
+            except OSError as e:
+                logger.warning(f"Не удалось прочитать превью {thumb_path}: {e}")
+        
+        return self._generate(path)
+    
+    def get_many(self, paths: List[str]) -> List[Optional[bytes]]:
+        """Превью для нескольких скриншотов"""
+        return [self.get(path) for path in paths]
+    
+    def _generate(self, path: str, image: Optional[Image.Image] = None) -> Optional[bytes]:
+        """Уменьшение, сжатие в JPEG и сохранение превью"""
+        try:
+            # Файл закрывается сразу: поток превью работает все время жизни бота
+            if image is None:
+                with Image.open(path) as source:
+                    thumb = source.convert('RGB')
+            else:
+                thumb = image.convert('RGB')
+            thumb.thumbnail(THUMB_SIZE)
+            
+            buffer = io.BytesIO()
+            thumb.save(buffer, format='JPEG', quality=THUMB_QUALITY, optimize=True)
+            data = buffer.getvalue()
+            
+            os.makedirs(self.thumb_dir, exist_ok=True)
+            with open(self.thumb_path(path), 'wb') as f:
+                f.write(data)
+            
+            self._put(path, data)
+            return data
+        
+        except Exception as e:
+            logger.error(f"Ошибка создания превью {path}: {e}")
+            return None
+    
+    def _put(self, path: str, data: bytes) -> None:
+        """Добавление в память с вытеснением самых старых превью"""
+        with self._lock:
+            old = self._cache.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old)
+            
+            self._cache[path] = data
+            self._bytes += len(data)
+            
+            while self._bytes > self.max_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
+    
+    def _prune_disk(self) -> None:
+        """Ограничение количества превью на диске"""
+        try:
+            names = os.listdir(self.thumb_dir)
+        except OSError:
+            return
+        
+        # Имена начинаются с типа, поэтому сортируем по времени в имени
+        names.sort(key=lambda name: name.split('_', 1)[-1])
+        for name in names[:-THUMB_DISK_MAX_FILES]:
+            try:
+                os.remove(os.path.join(self.thumb_dir, name))
+            except OSError:
+                pass
+    
+    def stats(self) -> Dict[str, int]:
+        """Состояние кэша в памяти"""
+        with self._lock:
+            return {'items': len(self._cache), 'bytes': self._bytes}
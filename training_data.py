@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+🎓 Данные для дообучения Tesseract на шрифте капч сайта
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import logging
+import multiprocessing
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    TRAINING_DIR, TRAINING_MODEL_NAME, TRAINING_BASE_LANG,
+    TRAINING_EVAL_SHARE, TRAINING_WORKERS, PREPROCESS_CONFIG
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('TrainingData')
+
+MANIFEST_FILE = "manifest.json"
+REPORT_FILE = "eval_report.json"
+
+# Процессор в каждом рабочем процессе создается один раз
+_processor = None
+
+def collect_samples(include_unverified: bool = False) -> List[Tuple[str, str]]:
+    """
+    Размеченные капчи: (путь к исходному кадру, текст). Разметка корпуса
+    проверена вручную; скриншоты success_* берутся, только если сайт
+    принял ответ (outcomes.jsonl), с include_unverified - и без проверки
+    или со сменой капчи без шаблона ошибки ('changed')
+    """
+    from corpus import load_corpus
+    from thumbnail_cache import list_captures
+    from outcome_detector import load_outcomes
+    
+    samples = load_corpus()
+    seen = {os.path.basename(path) for path, _ in samples}
+    outcomes = load_outcomes()
+    
+    for capture in list_captures(kind='success', limit=10 ** 6):
+        name = os.path.basename(capture['path'])
+        if name in seen or not capture['text']:
+            continue
+        outcome = outcomes.get(name)
+        if outcome == 'accepted' or (outcome in (None, 'changed') and include_unverified):
+            samples.append((capture['path'], capture['text']))
+            seen.add(name)
+    
+    return [(path, text.strip()) for path, text in samples if text.strip()]
+
+def split_of(name: str, eval_share: float = TRAINING_EVAL_SHARE) -> str:
+    """
+    Выборка по хэшу имени: капча не переходит из проверочной
+    в обучающую при пересборке с новыми данными
+    """
+    return 'eval' if zlib.crc32(name.encode('utf-8')) % 1000 < eval_share * 1000 else 'train'
+
+def _init_worker() -> None:
+    """Процессор изображений рабочего процесса"""
+    global _processor
+    from image_processor import ImageProcessor
+    
+    logging.getLogger('ImageProcessor').setLevel(logging.WARNING)
+    _processor = ImageProcessor()
+
+def _render(task: Tuple[str, str, str]) -> Tuple[str, Optional[str]]:
+    """
+    Предобработка одной капчи тем же преобразованием, что у решателя
+    (preprocess_image), и запись пары .png + .gt.txt. Возвращает
+    (путь, ошибка или None)
+    """
+    source, target, text = task
+    try:
+        frame = np.asarray(Image.open(source).convert('RGB'))
+        # Масштаб текста по самой капче, а не по истории других кадров
+        _processor._text_heights.clear()
+        Image.fromarray(_processor.preprocess_array(frame).copy()).save(f"{target}.png")
+        with open(f"{target}.gt.txt", 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        return source, None
+    except Exception as e:
+        return source, str(e)
+
+def build(samples: List[Tuple[str, str]], model: str = TRAINING_MODEL_NAME,
+          workers: int = TRAINING_WORKERS) -> Dict[str, Any]:
+    """Пары для tesstrain в TRAINING_DIR/<модель>/{train,eval} и манифест"""
+    directory = os.path.join(TRAINING_DIR, model)
+    # Пересборка с нуля: удаленные из корпуса капчи не должны остаться
+    shutil.rmtree(directory, ignore_errors=True)
+    for split in ('train', 'eval'):
+        os.makedirs(os.path.join(directory, split), exist_ok=True)
+    
+    tasks, splits = [], {'train': [], 'eval': []}
+    for source, text in samples:
+        name = os.path.splitext(os.path.basename(source))[0]
+        split = split_of(name)
+        tasks.append((source, os.path.join(directory, split, name), text))
+        splits[split].append({'source': source, 'text': text})
+    
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    failed = []
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for source, error in pool.imap_unordered(_render, tasks, chunksize=16):
+            if error:
+                logger.warning(f"⚠️ {source}: {error}")
+                failed.append(source)
+    elapsed = time.perf_counter() - started
+    
+    for split in splits:
+        splits[split] = [item for item in splits[split] if item['source'] not in failed]
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'model': model,
+        'base_lang': TRAINING_BASE_LANG,
+        'preprocess': PREPROCESS_CONFIG,
+        'workers': workers,
+        'seconds': round(elapsed, 2),
+        'failed': failed,
+        **splits
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+def load_manifest(model: str = TRAINING_MODEL_NAME) -> Dict[str, Any]:
+    """Манифест собранных данных модели"""
+    path = os.path.join(TRAINING_DIR, model, MANIFEST_FILE)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки манифеста: {e}")
+    return {}
+
+def installed_models() -> List[str]:
+    """Модели *.traineddata, доступные Tesseract"""
+    try:
+        from image_processor import tesserocr
+        if tesserocr is not None:
+            return list(tesserocr.get_languages()[1])
+        import pytesseract
+        return list(pytesseract.get_languages())
+    except Exception as e:
+        logger.error(f"Ошибка получения списка моделей: {e}")
+        return []
+
+def compare_models(samples: List[Tuple[str, str]], models: List[str]) -> List[Dict[str, Any]]:
+    """Точность каждой модели на проверочной выборке (режим fixed)"""
+    from corpus import evaluate
+    
+    results = []
+    for lang in models:
+        result = evaluate(samples, lang_mode='fixed', lang=lang)
+        result['model'] = lang
+        results.append(result)
+        print(f"  {lang:<16} точность {result['accuracy'] * 100:>5.1f}%  "
+              f"символы {result['char_accuracy'] * 100:>5.1f}%  {result['mean_ms']:>7.1f} мс")
+    
+    return results
+
+def main(argv: List[str]) -> int:
+    """
+    python3 training_data.py build [--unverified]  - пары .png + .gt.txt и разбиение train/eval
+    python3 training_data.py eval [МОДЕЛЬ]         - дообученная модель против eng на eval
+    """
+    command = argv[0] if argv else 'build'
+    model = TRAINING_MODEL_NAME
+    
+    if command == 'build':
+        samples = collect_samples(include_unverified='--unverified' in argv)
+        if not samples:
+            print("❌ Нет размеченных капч: python3 corpus.py import или принятые сайтом скриншоты")
+            return 1
+        
+        manifest = build(samples, model)
+        directory = os.path.join(TRAINING_DIR, model)
+        print(f"✅ Обучающих: {len(manifest['train'])}, проверочных: {len(manifest['eval'])}, "
+              f"ошибок: {len(manifest['failed'])} ({manifest['seconds']:.1f} с, "
+              f"процессов: {manifest['workers']})")
+        print("\nДообучение (tesstrain):")
+        print(f"  make training MODEL_NAME={model} START_MODEL={TRAINING_BASE_LANG} "
+              f"GROUND_TRUTH_DIR={os.path.join(directory, 'train')}")
+        print(f"Затем {model}.traineddata - в каталог tessdata и TESSERACT_LANG={model}")
+        return 0
+    
+    if command == 'eval':
+        model = argv[1] if len(argv) > 1 else model
+        manifest = load_manifest(model)
+        samples = [(item['source'], item['text']) for item in manifest.get('eval', [])
+                   if os.path.exists(item['source'])]
+        if not samples:
+            print("❌ Проверочная выборка пуста: python3 training_data.py build")
+            return 1
+        
+        from image_processor import tesseract_available
+        if not tesseract_available():
+            print("❌ Tesseract не установлен, оценка невозможна")
+            return 1
+        
+        available = installed_models()
+        models = [lang for lang in (TRAINING_BASE_LANG, model) if lang in available]
+        missing = [lang for lang in (TRAINING_BASE_LANG, model) if lang not in available]
+        if missing:
+            print(f"⚠️ Модели не установлены: {', '.join(missing)}")
+        if not models:
+            return 1
+        
+        print("\n" + "="*60)
+        print(f"🎓 ПРОВЕРОЧНАЯ ВЫБОРКА: {len(samples)} капч")
+        print("="*60)
+        results = compare_models(samples, models)
+        
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'samples': len(samples),
+            'results': results
+        }
+        path = os.path.join(TRAINING_DIR, model, REPORT_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        
+        if len(results) == 2:
+            change = (results[1]['accuracy'] - results[0]['accuracy']) * 100
+            print(f"\n{'🏆' if change > 0 else '⚠️'} {model} против {TRAINING_BASE_LANG}: "
+                  f"{change:+.1f} п.п. точности")
+        print(f"💾 Отчет: {path}")
+        return 0
+    
+    print(main.__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))